@@ -1,6 +1,8 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import Profile
+from .models import AccountDeletion, Follow, Profile
 
 admin.site.register(Profile)
+admin.site.register(Follow)
+admin.site.register(AccountDeletion)
@@ -1,25 +1,40 @@
+from django.http import HttpResponse
 from ninja import File, PatchDict
 from ninja.files import UploadedFile
 from ninja.router import Router
+from ninja_jwt.schema_control import SchemaControl
+from ninja_jwt.settings import api_settings
 
 from accounts.schemas import (
+    TokenObtainIn,
+    TokenObtainOut,
     UserPatch,
     UserPrivate,
     UserPublic,
     UserRegisterIn,
     UserRegisterOut,
 )
+from murmur.conditional import not_modified
 from murmur.security import AsyncTokenBasedAuth
+from murmur.streaming import streaming_response
 from accounts.services import AccountService
 
 router = Router()
+# Replaces ninja_jwt's obtain_pair_router, whose login hashes on the request
+# thread
+token_router = Router()
+token_schema = SchemaControl(api_settings)
 
 
-@router.get("/me", auth=AsyncTokenBasedAuth(), response=UserPrivate)
-async def get_user_profile(request):
+@router.get("/me", auth=AsyncTokenBasedAuth(), response={200: UserPrivate, 304: None})
+async def get_user_profile(request, response: HttpResponse):
     """
     Get private version of a user's profile.
+    Supports If-None-Match with the returned ETag.
     """
+    etag = await AccountService.get_user_etag(request, pk=request.auth.pk)
+    if cached := not_modified(request, response, etag):
+        return cached
     return await AccountService.get_user_profile(request)
 
 
@@ -39,6 +54,21 @@ async def delete_user(request):
     return 204, await AccountService.delete_user(request)
 
 
+@router.get("/me/export", auth=AsyncTokenBasedAuth())
+async def export_user_data(request):
+    """
+    Download everything you have posted: your profile, posts, comments and
+    reactions, streamed as newline-delimited JSON with one `type`-tagged
+    record per line. Sent gzipped when the client accepts it.
+    """
+    return streaming_response(
+        request,
+        AccountService.export_user_data(request),
+        content_type="application/x-ndjson",
+        filename=f"{request.auth.username}.ndjson",
+    )
+
+
 @router.post("/me/photo", auth=AsyncTokenBasedAuth(), response={205: None})
 async def upload_user_photo(request, file: File[UploadedFile]):
     """
@@ -63,9 +93,58 @@ async def create_user(request, payload: UserRegisterIn):
     return 201, await AccountService.create_user(request, payload)
 
 
-@router.get("/{username}", response=UserPublic)
-async def get_public_user(request, username: str):
+@router.post("/{username}/follow", auth=AsyncTokenBasedAuth(), response={204: None})
+async def follow_user(request, username: str):
+    """
+    Follow a user. Their posts will show up on your timeline.
+    """
+    return 204, await AccountService.follow_user(request, username)
+
+
+@router.delete("/{username}/follow", auth=AsyncTokenBasedAuth(), response={204: None})
+async def unfollow_user(request, username: str):
+    """
+    Unfollow a user.
+    """
+    return 204, await AccountService.unfollow_user(request, username)
+
+
+@router.get("/{username}", response={200: UserPublic, 304: None})
+async def get_public_user(request, username: str, response: HttpResponse):
     """
     See public version of a user's profile.
+    Supports If-None-Match with the returned ETag.
     """
+    etag = await AccountService.get_user_etag(
+        request, username=username, is_active=True
+    )
+    if cached := not_modified(request, response, etag):
+        return cached
     return await AccountService.get_public_user(request, username)
+
+
+@token_router.post(
+    "/pair",
+    response=TokenObtainOut,
+    url_name="token_obtain_pair",
+    operation_id="token_obtain_pair",
+)
+async def obtain_token(request, payload: TokenObtainIn):
+    """
+    Log in: get a refresh and access token pair. The password is checked in
+    the password hashing process pool.
+    """
+    return await AccountService.obtain_token_pair(request, payload)
+
+
+@token_router.post(
+    "/refresh",
+    response=token_schema.obtain_pair_refresh_schema.get_response_schema(),
+    url_name="token_refresh",
+    operation_id="token_refresh",
+)
+def refresh_token(request, refresh_token: token_schema.obtain_pair_refresh_schema):
+    """
+    Get a new access token for a refresh token.
+    """
+    return refresh_token.to_response_schema()
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """
+    Django's Argon2 hasher with its costs from the PASSWORD_ARGON2_* settings
+    instead of hard-coded. Hashes made with other costs still verify and are
+    rehashed at the next login.
+    """
+
+    def __init__(self) -> None:
+        self.time_cost = settings.PASSWORD_ARGON2_TIME_COST
+        self.memory_cost = settings.PASSWORD_ARGON2_MEMORY_COST
+        self.parallelism = settings.PASSWORD_ARGON2_PARALLELISM
+
+
+def configure_worker(password_settings: dict) -> None:
+    """
+    Initializer of the password hashing processes, see accounts.passwords.
+    They don't set Django up: hashing needs the PASSWORD_* settings only.
+    Keep this module free of model imports, which need the app registry.
+    """
+    settings.configure(**password_settings)
@@ -0,0 +1,85 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+import multiprocessing
+from typing import Iterable, Optional
+
+from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+class InvalidPhoto(ValueError):
+    """The upload could not be decoded as a usable image."""
+
+
+def render_photo_variants(
+    data: bytes, sizes: Iterable[int], max_pixels: int, quality: int
+) -> dict[int, bytes]:
+    """
+    Decode an uploaded photo and encode a square WebP variant per size.
+
+    The EXIF orientation is applied to the pixels and no metadata is written
+    back, so variants never carry location or device data. Runs in the
+    photo process pool; must not touch Django.
+    """
+    try:
+        image = Image.open(BytesIO(data))
+        width, height = image.size
+        if width * height > max_pixels:
+            raise InvalidPhoto(f"Photo is too large: {width}x{height} pixels")
+        # Let JPEG decode at a reduced scale when the largest variant allows it
+        largest = max(sizes)
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise InvalidPhoto(f"Invalid image: {e}")
+
+    variants = {}
+    for size in sorted(sizes, reverse=True):
+        # Scale down from the previous (larger) variant to save work
+        image = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, "WEBP", quality=quality, method=4)
+        variants[size] = buffer.getvalue()
+    return variants
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Spawned, not forked: the ASGI process has threads and DB connections
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.PROFILE_PHOTO_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+async def process_photo(data: bytes) -> dict[int, bytes]:
+    """
+    Render the PROFILE_PHOTO_SIZES variants of an upload in the process pool,
+    keeping Pillow's CPU work off the event loop.
+
+    Raises:
+        InvalidPhoto: If the upload isn't a usable image
+    """
+    global _pool
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            _get_pool(),
+            render_photo_variants,
+            data,
+            tuple(settings.PROFILE_PHOTO_SIZES),
+            settings.PROFILE_PHOTO_MAX_PIXELS,
+            settings.PROFILE_PHOTO_QUALITY,
+        )
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM on a hostile image); start fresh next time
+        _pool = None
+        raise
@@ -0,0 +1,39 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.models import AccountDeletion
+from accounts.purge import purge_account
+
+
+class Command(BaseCommand):
+    help = (
+        "Purge deleted accounts whose background purge didn't finish, e.g. "
+        "because the worker restarted. Each purge resumes from its last "
+        "committed batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.ACCOUNT_PURGE_BATCH_SIZE,
+            help="Rows deleted per transaction (default: ACCOUNT_PURGE_BATCH_SIZE).",
+        )
+
+    def handle(self, *args, **options):
+        pending = list(
+            AccountDeletion.objects.filter(completed_at__isnull=True)
+            .order_by("requested_at")
+            .values_list("user_id", flat=True)
+        )
+        for user_id in pending:
+            asyncio.run(purge_account(user_id, options["batch_size"]))
+            deletion = AccountDeletion.objects.get(user_id=user_id)
+            deleted = ", ".join(
+                f"{count} {name}" for name, count in deletion.progress.items()
+            )
+            self.stdout.write(f"Purged user {user_id}: {deleted or 'no rows'}")
+
+        self.stdout.write(self.style.SUCCESS(f"Purged {len(pending)} accounts"))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-17 08:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0005_profile_followers_count_profile_following_count_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="photo_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -1,7 +1,10 @@
 from django.contrib.auth.models import User
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+
+from accounts.cache import user_cache
+from murmur import tracking
 # Create your models here.
 
 
@@ -13,12 +16,82 @@ class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
     bio = models.TextField(max_length=100, blank=True, null=True)
     photo = models.ImageField(upload_to=user_directory_path, blank=True, null=True)
+    # Storage names of the resized WebP renditions, keyed by size in pixels.
+    # `photo` points at the largest one, see AccountService.upload_user_photo
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Denormalized follow counters, maintained by AccountService
+    followers_count = models.IntegerField(default=0, editable=False)
+    following_count = models.IntegerField(default=0, editable=False)
+
     def __str__(self):
         return f"{self.user.username}'s profile"
 
+    def save(self, *args, **kwargs):
+        # Without explicit update_fields, write only what changed, if anything
+        if not (self._state.adding or args or kwargs.get("update_fields") is not None):
+            kwargs["update_fields"] = tracking.update_fields(self)
+        super().save(*args, **kwargs)
+
+
+class Follow(models.Model):
+    """
+    A directed follow edge: `follower` sees `followee`'s posts on their timeline.
+    """
+
+    follower = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="following"
+    )
+    followee = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="followers"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("follower", "followee")
+        indexes = [
+            # Fan-out reads every follower of an author
+            models.Index(fields=["followee", "follower"]),
+        ]
+
+    def __str__(self):
+        return f"{self.follower.username} follows {self.followee.username}"
+
+
+class AccountDeletion(models.Model):
+    """
+    A deactivated account whose rows are being purged in batches, see
+    accounts.purge. Kept once the purge completes, as a record of it.
+    """
+
+    # Not a foreign key: the row outlives the user
+    user_id = models.IntegerField(unique=True)
+    requested_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    # Rows deleted so far, by purge step
+    progress = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        indexes = [
+            # Purges still to run or resume
+            models.Index(
+                fields=["requested_at"],
+                condition=models.Q(completed_at__isnull=True),
+                name="accountdeletion_pending",
+            ),
+        ]
+
+    def __str__(self):
+        state = "purged" if self.completed_at else "pending"
+        return f"Deletion of user {self.user_id} ({state})"
+
+
+tracking.track(User)
+tracking.track(Profile)
+
 
 # Signals
 @receiver(post_save, sender=User)
@@ -29,4 +102,12 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
+    # Only a profile loaded along with the user, which saves just its changes
+    if User.profile.is_cached(instance):
+        instance.profile.save()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
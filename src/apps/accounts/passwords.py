@@ -0,0 +1,103 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+from typing import Awaitable, Callable, Optional
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.models import User
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from accounts.hashers import configure_worker
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Spawned, not forked: the ASGI process has threads and DB connections
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.PASSWORD_HASHING_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=configure_worker,
+            initargs=(
+                {
+                    name: getattr(settings, name)
+                    for name in dir(settings)
+                    if name.startswith("PASSWORD_")
+                },
+            ),
+        )
+    return _pool
+
+
+@receiver(setting_changed)
+def _discard_pool(setting, **kwargs) -> None:
+    # Workers keep the settings they started with, e.g. across tests
+    global _pool
+    if setting.startswith("PASSWORD_") and _pool is not None:
+        _pool.shutdown(wait=False)
+        _pool = None
+
+
+async def _run(func, *args):
+    global _pool
+    if not settings.PASSWORD_HASHING_WORKERS:
+        return func(*args)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_pool(), func, *args)
+    except BrokenProcessPool:
+        # A worker died; start fresh next time
+        _pool = None
+        raise
+
+
+async def make_password(password: Optional[str]) -> str:
+    """
+    Hash a password for storage with the first of PASSWORD_HASHERS, in the
+    process pool. Like Django's make_password, None makes an unusable one.
+    """
+    if password is None:
+        return hashers.make_password(None)
+    return await _run(hashers.make_password, password)
+
+
+async def check_password(
+    password: Optional[str],
+    encoded: str,
+    setter: Optional[Callable[[str], Awaitable[None]]] = None,
+) -> bool:
+    """
+    Whether `password` matches the `encoded` hash, checked in the process
+    pool with the same timing protections as Django's check_password. When
+    it matches but the hash is outdated, `setter` is awaited with the
+    password to store it again.
+    """
+    is_correct, must_update = await _run(hashers.verify_password, password, encoded)
+    if setter and is_correct and must_update:
+        await setter(password)
+    return is_correct
+
+
+async def authenticate(username: str, password: str) -> Optional[User]:
+    """
+    The active user with these credentials, or None. Works like Django's
+    ModelBackend, but hashes off the event loop.
+    """
+    user = await User.objects.filter(username=username).afirst()
+    if user is None:
+        # Hash anyway so unknown usernames take as long as wrong passwords
+        await make_password(password)
+        return None
+
+    async def rehash(raw_password: str) -> None:
+        user.password = await make_password(raw_password)
+        await user.asave(update_fields=["password"])
+
+    if await check_password(password, user.password, rehash) and user.is_active:
+        return user
+    return None
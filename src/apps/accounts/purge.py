@@ -0,0 +1,194 @@
+from collections import Counter
+from functools import partial
+from typing import Callable, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.utils import timezone
+
+from accounts.models import AccountDeletion, Follow, Profile
+from murmur import querycache
+from comments.models import Comment
+from posts.models import Post, TimelineEntry
+from posts.trending import take_back
+from reactions.models import Reaction, ReactionType
+
+
+def _unfollowed(rows: list[dict]) -> None:
+    Profile.objects.filter(user__in=[row["followee"] for row in rows]).update(
+        followers_count=F("followers_count") - 1
+    )
+
+
+def _lost_follower(rows: list[dict]) -> None:
+    Profile.objects.filter(user__in=[row["follower"] for row in rows]).update(
+        following_count=F("following_count") - 1
+    )
+
+
+def _unreacted(rows: list[dict]) -> None:
+    # A user reacts at most once per post, so each post loses one reaction
+    take_back(
+        (row["post"], settings.TRENDING_REACTION_WEIGHT, row["created_at"])
+        for row in rows
+    )
+    for reaction_type, field in (
+        (ReactionType.LIKE, "like_count"),
+        (ReactionType.DISLIKE, "dislike_count"),
+    ):
+        posts = [row["post"] for row in rows if row["reaction_type"] == reaction_type]
+        if posts:
+            Post.objects.filter(pk__in=posts).update(**{field: F(field) - 1})
+
+
+def _uncommented(rows: list[dict]) -> None:
+    take_back(
+        (row["post"], settings.TRENDING_COMMENT_WEIGHT, row["created_at"])
+        for row in rows
+    )
+    # Parents deleted in the same batch don't need their count fixed
+    deleted = {row["pk"] for row in rows}
+    replies = Counter(
+        row["parent"]
+        for row in rows
+        if row["parent"] is not None and row["parent"] not in deleted
+    )
+    by_count: dict[int, list[int]] = {}
+    for parent, count in replies.items():
+        by_count.setdefault(count, []).append(parent)
+    for count, parents in by_count.items():
+        Comment.objects.filter(pk__in=parents).update(
+            reply_count=F("reply_count") - count
+        )
+
+
+# (name, rows to delete, columns read before deleting, counter fix-up).
+# Run in order, each until it finds nothing left. The user's own rows go
+# first, keeping the counters of other accounts' posts, comments and
+# profiles exact. Then the rows others made on the user's posts, so that
+# deleting the posts themselves doesn't cascade. Comments go deepest first
+# for the same reason; replies others made to the user's comments are
+# still cascaded, as when a comment is deleted through the API.
+STEPS: list[
+    tuple[
+        str,
+        Callable[[int], QuerySet],
+        tuple[str, ...],
+        Optional[Callable[[list[dict]], None]],
+    ]
+] = [
+    ("timeline", lambda user_id: TimelineEntry.objects.filter(owner=user_id), (), None),
+    (
+        "following",
+        lambda user_id: Follow.objects.filter(follower=user_id),
+        ("followee",),
+        _unfollowed,
+    ),
+    (
+        "followers",
+        lambda user_id: Follow.objects.filter(followee=user_id),
+        ("follower",),
+        _lost_follower,
+    ),
+    (
+        "reactions",
+        lambda user_id: Reaction.objects.filter(user=user_id),
+        ("post", "reaction_type", "created_at"),
+        _unreacted,
+    ),
+    (
+        "comments",
+        lambda user_id: Comment.objects.filter(author=user_id).order_by("-depth"),
+        ("parent", "post", "created_at"),
+        _uncommented,
+    ),
+    (
+        "post_reactions",
+        lambda user_id: Reaction.objects.filter(post__author=user_id),
+        (),
+        None,
+    ),
+    (
+        "post_comments",
+        lambda user_id: Comment.objects.filter(post__author=user_id).order_by("-depth"),
+        (),
+        None,
+    ),
+    (
+        "post_timelines",
+        lambda user_id: TimelineEntry.objects.filter(post__author=user_id),
+        (),
+        None,
+    ),
+    ("posts", lambda user_id: Post.objects.filter(author=user_id), (), None),
+]
+
+
+def _delete_user(user_id: int) -> None:
+    # Imported here, accounts.services schedules purges from this module
+    from accounts.services import AccountService
+
+    profile = Profile.objects.filter(user=user_id).first()
+    if profile is not None:
+        # Only once the user is gone for good: after a rollback, the profile
+        # would point at missing files
+        transaction.on_commit(partial(AccountService._delete_photo_files, profile))
+    # Cascades to the profile and anything created since the purge started
+    User.objects.filter(pk=user_id).delete()
+
+
+@transaction.atomic
+def purge_batch(user_id: int, batch_size: int) -> bool:
+    """
+    Delete the next batch of at most `batch_size` rows of the first purge
+    step with rows left, fix the counters they contributed to and record
+    progress, all in one transaction. Once every step is done, delete the
+    user itself. Returns whether there is more to do.
+
+    The deletion row is locked first, so concurrent purgers of one account
+    take turns instead of counting the same rows twice.
+    """
+    deletion = AccountDeletion.objects.select_for_update().get(user_id=user_id)
+    if deletion.completed_at is not None:
+        return False
+
+    for name, rows, columns, fix in STEPS:
+        # Locked, so a concurrent unfollow or delete can't fix counters twice
+        batch = list(
+            rows(user_id)
+            .select_for_update(of=("self",))
+            .values("pk", *columns)[:batch_size]
+        )
+        if not batch:
+            continue
+        if fix is not None:
+            fix(batch)
+        model = rows(user_id).model
+        model.objects.filter(pk__in=[row["pk"] for row in batch]).delete()
+        deletion.progress[name] = deletion.progress.get(name, 0) + len(batch)
+        deletion.save(update_fields=["progress", "updated_at"])
+        return True
+
+    _delete_user(user_id)
+    deletion.completed_at = timezone.now()
+    deletion.save(update_fields=["completed_at", "updated_at"])
+    return False
+
+
+async def purge_account(user_id: int, batch_size: Optional[int] = None) -> None:
+    """
+    Purge a deactivated account batch by batch. Every batch is its own trip
+    to a worker thread, so requests are served in between. As a background
+    task, the purge has a connection of its own until it ends. Interrupted
+    purges resume where they stopped, see `manage.py purge_accounts`.
+    """
+    batch_size = batch_size or settings.ACCOUNT_PURGE_BATCH_SIZE
+    more = True
+    while more:
+        more = await sync_to_async(purge_batch)(user_id, batch_size)
+        # The batch may have touched the lists of any post
+        for model in (Post, Comment, Reaction):
+            await querycache.changed(model)
@@ -31,21 +31,52 @@ class UserRegisterIn(Schema):
         return v
 
 
+class TokenObtainIn(Schema):
+    username: str
+    password: SecretStr
+
+
+class TokenObtainOut(Schema):
+    username: str
+    refresh: str
+    access: str
+
+
+def photo_variant_urls(profile: Profile) -> dict[str, str]:
+    storage = Profile._meta.get_field("photo").storage  # type: ignore
+    return {size: storage.url(name) for size, name in profile.photo_variants.items()}
+
+
 class ProfilePublic(ModelSchema):
+    # Size in pixels -> URL of the square WebP rendition
+    photo_variants: dict[str, str]
+
     class Meta:
         model = Profile
         fields = [
             "bio",
             "photo",
             "created_at",
+            "followers_count",
+            "following_count",
         ]
 
+    @staticmethod
+    def resolve_photo_variants(obj: Profile) -> dict[str, str]:
+        return photo_variant_urls(obj)
+
 
 class ProfilePrivate(ModelSchema):
+    photo_variants: dict[str, str]
+
     class Meta:
         model = Profile
         exclude = ["id", "user"]
 
+    @staticmethod
+    def resolve_photo_variants(obj: Profile) -> dict[str, str]:
+        return photo_variant_urls(obj)
+
 
 class UserPrivate(ModelSchema):
     profile: ProfilePrivate
@@ -1,10 +1,32 @@
+from asgiref.sync import sync_to_async
+import json
+import secrets
+from typing import AsyncIterator
+
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
 from django.shortcuts import aget_object_or_404
 from ninja import File, UploadedFile
 from ninja.errors import HttpError
 from ninja_jwt.tokens import RefreshToken
 
-from accounts.schemas import UserRegisterOut
+from accounts import passwords
+from accounts.cache import user_cache
+from accounts.images import InvalidPhoto, process_photo
+from accounts.models import AccountDeletion, Follow, Profile, user_directory_path
+from accounts.purge import purge_account
+from accounts.schemas import TokenObtainOut, UserPrivate, UserRegisterOut
+from comments.models import Comment
+from murmur import tracking
+from murmur.conditional import make_etag
+from murmur.tasks import run_in_background
+from posts.models import Post, TimelineEntry
+from posts.services import PostService
+from reactions.models import Reaction
 
 
 class AccountService:
@@ -17,6 +39,30 @@ class AccountService:
             User.objects.select_related("profile"), username=request.auth.username
         )
 
+    @staticmethod
+    async def get_user_etag(request, **lookup) -> str:
+        """
+        ETag for a user's profile, built from a narrow read of the columns
+        the profile schemas expose and the profile's `updated_at` version.
+        """
+        version = (
+            await User.objects.filter(**lookup)
+            .values_list(
+                "pk",
+                "username",
+                "email",
+                "first_name",
+                "last_name",
+                "profile__updated_at",
+                "profile__followers_count",
+                "profile__following_count",
+            )
+            .afirst()
+        )
+        if version is None:
+            raise HttpError(404, "Not Found")
+        return make_etag("user", *version)
+
     @staticmethod
     async def update_user_profile(request, payload):
         """
@@ -25,22 +71,86 @@ class AccountService:
         user = await aget_object_or_404(
             User.objects.select_related("profile"), username=request.auth.username
         )
+        profile_changes = payload.pop("profile", None) or {}
         for field, value in payload.items():
             if hasattr(user, field) and value is not None:
                 setattr(user, field, value)
-        await user.asave()
+        for field, value in profile_changes.items():
+            if hasattr(user.profile, field) and value is not None:  # type: ignore
+                setattr(user.profile, field, value)  # type: ignore
+        # UPDATEs of the changed columns only, none if nothing changed
+        await tracking.asave_changes(user)
         await user.profile.asave()  # type: ignore
         return user
 
+    @staticmethod
+    @transaction.atomic
+    def _deactivate(user: User) -> None:
+        """
+        Lock the account out and queue it for purging in one transaction.
+        """
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        AccountDeletion.objects.get_or_create(user_id=user.pk)
+
     @staticmethod
     async def delete_user(request) -> None:
         """
-        Delete a user.
+        Delete a user. The account is deactivated right away, which rejects
+        its tokens and logins; its posts, comments, reactions and follows
+        are purged in the background, see accounts.purge.
         """
         user = request.auth
-        await user.adelete()
+        await sync_to_async(AccountService._deactivate)(user)
+        # `update()` skips the signals that evict it
+        user_cache.invalidate(user.pk)
+        run_in_background(purge_account(user.pk))
         return None
 
+    @staticmethod
+    def _export_line(record_type: str, data: dict) -> bytes:
+        record = {"type": record_type, **data}
+        line = json.dumps(record, cls=DjangoJSONEncoder, separators=(",", ":"))
+        return line.encode() + b"\n"
+
+    @staticmethod
+    async def export_user_data(request) -> AsyncIterator[bytes]:
+        """
+        The user's profile, posts, comments and reactions as NDJSON lines,
+        each tagged with its `type`. Rows are read through server-side
+        cursors ACCOUNT_EXPORT_CHUNK_SIZE at a time, so memory use doesn't
+        grow with the size of the account.
+        """
+        user = await aget_object_or_404(
+            User.objects.select_related("profile"), pk=request.auth.pk
+        )
+        profile = UserPrivate.from_orm(user).model_dump(mode="json")
+        yield AccountService._export_line("profile", profile)
+
+        chunk_size = settings.ACCOUNT_EXPORT_CHUNK_SIZE
+        sources = [
+            (
+                "post",
+                Post.objects.filter(author=user).values(
+                    "id", "content", "created_at", "like_count", "dislike_count"
+                ),
+            ),
+            (
+                "comment",
+                Comment.objects.filter(author=user).values(
+                    "id", "post_id", "parent_id", "content", "created_at"
+                ),
+            ),
+            (
+                "reaction",
+                Reaction.objects.filter(user=user).values(
+                    "post_id", "reaction_type", "created_at", "updated_at"
+                ),
+            ),
+        ]
+        for record_type, rows in sources:
+            async for row in rows.order_by("pk").aiterator(chunk_size=chunk_size):
+                yield AccountService._export_line(record_type, row)
+
     @staticmethod
     async def create_user(request, payload):
         """
@@ -50,13 +160,17 @@ class AccountService:
             raise HttpError(409, "An account already exists under this username")
 
         try:
-            new_user = await User.objects.acreate_user(
-                username=payload.username,
-                email=payload.email,
-                password=payload.password.get_secret_value(),
+            # As UserManager.create_user does, with the hashing off the event loop
+            new_user = User(
+                username=User.normalize_username(payload.username),
+                email=User.objects.normalize_email(payload.email),
+                password=await passwords.make_password(
+                    payload.password.get_secret_value()
+                ),
                 first_name=payload.first_name,
                 last_name=payload.last_name,
             )
+            await new_user.asave()
             refresh = RefreshToken.for_user(new_user)
             data = {
                 "user": new_user,
@@ -67,6 +181,23 @@ class AccountService:
         except Exception as e:
             raise HttpError(500, f"Failed to create user: {e}")
 
+    @staticmethod
+    async def obtain_token_pair(request, payload):
+        """
+        Log in: a refresh and access token pair for valid credentials.
+        """
+        user = await passwords.authenticate(
+            payload.username, payload.password.get_secret_value()
+        )
+        if user is None:
+            raise HttpError(401, "No active account found with the given credentials")
+        refresh = RefreshToken.for_user(user)
+        return TokenObtainOut(
+            username=user.username,
+            refresh=str(refresh),
+            access=str(refresh.access_token),  # type: ignore
+        )
+
     @staticmethod
     async def get_public_user(request, username):
         """
@@ -74,31 +205,157 @@ class AccountService:
         """
         try:
             res = await aget_object_or_404(
-                User.objects.select_related("profile"), username=username
+                User.objects.select_related("profile"),
+                username=username,
+                is_active=True,
             )
             return res
         except Exception as e:
             raise HttpError(500, f"Failed to retrieve user: {e}")
 
+    @staticmethod
+    def _photo_files(profile: Profile) -> set[str]:
+        names = set(profile.photo_variants.values())
+        if profile.photo:
+            names.add(profile.photo.name)
+        return names
+
+    @staticmethod
+    def _delete_photo_files(profile: Profile) -> None:
+        storage = profile.photo.storage
+        for name in AccountService._photo_files(profile):
+            storage.delete(name)
+        profile.photo = None  # type: ignore
+        profile.photo_variants = {}
+
+    @staticmethod
+    def _store_photo_variants(profile: Profile, variants: dict[int, bytes]) -> None:
+        """
+        Replace the profile's photo files with the rendered variants. The old
+        files are deleted only once the profile points at the new ones, so a
+        failed upload leaves the current photo in place.
+        """
+        storage = profile.photo.storage
+        old_names = AccountService._photo_files(profile)
+        # A fresh token per upload, so cached URLs of the old photo go stale
+        token = secrets.token_hex(4)
+        new_variants: dict[str, str] = {}
+        try:
+            for size, data in variants.items():
+                name = user_directory_path(profile, f"{token}_{size}.webp")
+                new_variants[str(size)] = storage.save(name, ContentFile(data))
+            profile.photo_variants = new_variants
+            profile.photo = new_variants[str(max(variants))]  # type: ignore
+            profile.save(update_fields=["photo", "photo_variants", "updated_at"])
+        except Exception:
+            for name in new_variants.values():
+                storage.delete(name)
+            raise
+        for name in old_names:
+            storage.delete(name)
+
     @staticmethod
     async def upload_user_photo(request, photo: File[UploadedFile]) -> None:
         """
         Upload a photo for a user's profile.
+        The upload is decoded, stripped of metadata and re-encoded into the
+        PROFILE_PHOTO_SIZES WebP variants in a process pool; the original
+        isn't kept.
         """
         user = await aget_object_or_404(
             User.objects.select_related("profile"), pk=request.auth.pk
         )
-        user.profile.photo = photo  # type: ignore
-        await user.profile.asave()  # type: ignore
+        data = await sync_to_async(photo.read)()
+        try:
+            variants = await process_photo(data)
+        except InvalidPhoto as e:
+            raise HttpError(422, str(e))
+        await sync_to_async(AccountService._store_photo_variants)(
+            user.profile,  # type: ignore
+            variants,
+        )
         return None
 
     @staticmethod
     async def delete_user_photo(request) -> None:
         """
-        Delete a user's profile photo.
+        Delete a user's profile photo and all of its variants.
         """
         user = await aget_object_or_404(
             User.objects.select_related("profile"), pk=request.auth.pk
         )
-        user.profile.photo.delete()  # type: ignore
+        profile = user.profile  # type: ignore
+        await sync_to_async(AccountService._delete_photo_files)(profile)
+        await profile.asave(update_fields=["photo", "photo_variants", "updated_at"])
+        return None
+
+    @staticmethod
+    @transaction.atomic
+    def _save_follow(follower: User, followee: User) -> bool:
+        """
+        Create the follow edge and bump both profile counters in one transaction.
+        """
+        _, created = Follow.objects.get_or_create(follower=follower, followee=followee)
+        if created:
+            Profile.objects.filter(user=follower).update(
+                following_count=F("following_count") + 1
+            )
+            Profile.objects.filter(user=followee).update(
+                followers_count=F("followers_count") + 1
+            )
+        return created
+
+    @staticmethod
+    @transaction.atomic
+    def _remove_follow(follower: User, followee: User) -> bool:
+        """
+        Delete the follow edge, its counters and the followee's posts from the
+        follower's materialized timeline in one transaction.
+        """
+        deleted, _ = Follow.objects.filter(
+            follower=follower, followee=followee
+        ).delete()
+        if deleted:
+            Profile.objects.filter(user=follower).update(
+                following_count=F("following_count") - 1
+            )
+            Profile.objects.filter(user=followee).update(
+                followers_count=F("followers_count") - 1
+            )
+            TimelineEntry.objects.filter(owner=follower, post__author=followee).delete()
+        return bool(deleted)
+
+    @staticmethod
+    async def follow_user(request, username: str) -> None:
+        """
+        Follow another user.
+        """
+        # Deleted accounts stay deactivated until they are purged
+        followee = await aget_object_or_404(
+            User.objects.select_related("profile"), username=username, is_active=True
+        )
+        if followee.pk == request.auth.pk:
+            raise HttpError(422, "You cannot follow yourself")
+
+        created = await sync_to_async(AccountService._save_follow)(
+            request.auth, followee
+        )
+        # High-follower accounts are pulled on read, not copied into timelines
+        followers = followee.profile.followers_count + 1  # type: ignore
+        if created and followers <= settings.TIMELINE_FANOUT_MAX_FOLLOWERS:
+            run_in_background(
+                PostService.backfill_timeline(request.auth.pk, followee.pk)
+            )
+        return None
+
+    @staticmethod
+    async def unfollow_user(request, username: str) -> None:
+        """
+        Stop following a user.
+        """
+        followee = await aget_object_or_404(User.objects, username=username)
+        if not await sync_to_async(AccountService._remove_follow)(
+            request.auth, followee
+        ):
+            raise HttpError(404, "You are not following this user")
         return None
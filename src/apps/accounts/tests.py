@@ -1,17 +1,50 @@
+import gzip
+import json
+from importlib.util import find_spec
+from io import BytesIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import skipUnless
+from unittest.mock import Mock, patch
+
 from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import make_password
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
 from ninja.testing import TestAsyncClient
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
 from ninja.testing.client import NinjaResponse
 from ninja_jwt.tokens import RefreshToken
+from PIL import Image
+
+from accounts import passwords
+from accounts.cache import AuthenticatedUserCache, user_cache
+from accounts.models import AccountDeletion, Follow, Profile
+from accounts.purge import purge_account, purge_batch
+from accounts.services import AccountService
+from comments.models import Comment
+from core.loadtest import ASGIClient, Request
+from murmur.tasks import wait_for_background_tasks
+from murmur.testing import (
+    pooled_connections_in_use,
+    query_budget,
+    run_like_a_server,
+)
+from posts.models import Post, TimelineEntry
+from posts.trending import Engaged
+from reactions.models import Reaction, ReactionType
+
+from .apis import router, token_router
 
-from .apis import router
+# Build the project API before the routers are attached to test clients
+import murmur.urls  # noqa: F401
 
 
 class AccountsTest(TestCase):
     def setUp(self) -> None:
         self.tclient = TestAsyncClient(router)
+        user_cache.clear()
 
     async def test_register_user(self):
         payload = {
@@ -66,6 +99,24 @@ class AccountsTest(TestCase):
         self.assertEqual(res.status_code, 200, res.json())
         self.assertIn("profile", res.data)
 
+    async def test_profile_etag_changes_with_the_profile(self):
+        user = await User.objects.acreate_user(username="etagged")
+        headers = {
+            "Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"
+        }  # type: ignore
+
+        res = await self.tclient.get("/me", headers=headers)  # type: ignore
+        etag = res["ETag"]
+        res = await self.tclient.get("/me", headers={**headers, "If-None-Match": etag})  # type: ignore
+        self.assertEqual(res.status_code, 304)
+        res = await self.tclient.get("/etagged", headers={"If-None-Match": etag})  # type: ignore
+        self.assertEqual(res.status_code, 304)
+
+        await self.tclient.patch("/me", headers=headers, json={"first_name": "Changed"})  # type: ignore
+        res = await self.tclient.get("/me", headers={**headers, "If-None-Match": etag})  # type: ignore
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res["ETag"], etag)
+
     async def test_unauthorized_access_to_profile(self):
         res = await self.tclient.get("/me")  # type: ignore
         self.assertEqual(res.status_code, 401, res.json())
@@ -109,51 +160,182 @@ class AccountsTest(TestCase):
         # Depending on your intended design, 200 or 204 might be appropriate
         self.assertIn(res.status_code, [200, 204], res.json())
 
+    async def test_registration_inserts_each_row_once(self):
+        payload = {
+            "username": "tracked",
+            "email": "tracked@email.com",
+            "password": "12345678",
+            "password_confirm": "12345678",
+            "first_name": "tracked",
+            "last_name": "user",
+        }
+        with query_budget(4) as budget:
+            res = await self.tclient.post("/register", json=payload)  # type: ignore
+        self.assertEqual(res.status_code, 201, res.json())
+        writes = [
+            sql.split(" ", 3)[:3]
+            for sql in budget.stats.queries or []
+            if sql.startswith(("INSERT", "UPDATE"))
+        ]
+        self.assertEqual(
+            writes,
+            [
+                ["INSERT", "INTO", '"auth_user"'],
+                ["INSERT", "INTO", '"accounts_profile"'],
+            ],
+        )
+
+    async def test_update_writes_only_changed_columns(self):
+        user = await User.objects.acreate_user(username="partial", first_name="Old")
+        headers = {
+            "Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"
+        }
+        patch = {"first_name": "New", "profile": {"bio": "Hello"}}
+
+        with query_budget(5) as budget:
+            res = await self.tclient.patch("/me", headers=headers, json=patch)  # type: ignore
+        self.assertEqual(res.status_code, 200, res.json())
+        self.assertEqual(res.data["profile"]["bio"], "Hello")
+        updates = [
+            sql for sql in budget.stats.queries or [] if sql.startswith("UPDATE")
+        ]
+        self.assertEqual(len(updates), 2, updates)
+        self.assertRegex(
+            updates[0], r'^UPDATE "auth_user" SET "first_name" = \S+ WHERE'
+        )
+        self.assertRegex(
+            updates[1],
+            r'^UPDATE "accounts_profile" SET "bio" = \S+, "updated_at" = \S+ WHERE',
+        )
+        profile = await Profile.objects.aget(user=user)
+        self.assertEqual(profile.bio, "Hello")
+
+        # The same values again change nothing, so nothing is written
+        user_cache.clear()
+        with query_budget(2) as budget:
+            res = await self.tclient.patch("/me", headers=headers, json=patch)  # type: ignore
+        self.assertEqual(res.status_code, 200, res.json())
+        self.assertFalse(
+            [sql for sql in budget.stats.queries or [] if sql.startswith("UPDATE")]
+        )
+
     async def test_delete_user_account(self):
         # Create a user and log in
         user = await User.objects.acreate_user(username="deleter", password="123456")
         refresh = RefreshToken.for_user(user)
+        auth = {"Authorization": f"Bearer {refresh.access_token}"}
+        await Post.objects.acreate(content="Bye", author=user)
 
         # Send delete request
-        res = await self.tclient.delete(
-            "/me",
-            headers={"Authorization": f"Bearer {refresh.access_token}"},  # type: ignore
-        )  # type: ignore
-
-        # Expect user deletion – you might choose 204 or 200 as well
+        res = await self.tclient.delete("/me", headers=auth)  # type: ignore
         self.assertEqual(res.status_code, 204)
 
-        # Confirm user has been removed from the database
+        # Deactivated at once: the token and the public profile stop working
+        user = await User.objects.aget(pk=user.pk)
+        self.assertFalse(user.is_active)
+        res = await self.tclient.get("/me", headers=auth)  # type: ignore
+        self.assertEqual(res.status_code, 401)
+        res = await self.tclient.get("/deleter")
+        self.assertEqual(res.status_code, 404)
+
+        # Then purged in the background
+        await wait_for_background_tasks()
         user_exists = await User.objects.filter(username="deleter").aexists()
         self.assertFalse(user_exists, "User was not successfully deleted")
+        self.assertFalse(await Post.objects.filter(content="Bye").aexists())
+        deletion = await AccountDeletion.objects.aget(user_id=user.pk)
+        self.assertIsNotNone(deletion.completed_at)
+        self.assertEqual(deletion.progress, {"posts": 1})
 
     async def test_upload_user_photo(self):
-        from io import BytesIO
+        user = await User.objects.acreate_user(
+            username="photo_tester", password="12345678"
+        )
+        refresh = RefreshToken.for_user(user)
+
+        # A landscape JPEG carrying EXIF metadata
+        exif = Image.Exif()
+        exif[0x010F] = "CameraMaker"
+        upload = BytesIO()
+        Image.new("RGB", (800, 600), "red").save(upload, "JPEG", exif=exif)
+
+        with TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            res = await self.tclient.post(
+                "/me/photo",
+                headers={"Authorization": f"Bearer {refresh.access_token}"},  # type: ignore
+                FILES={
+                    "file": SimpleUploadedFile(
+                        "test_image.jpg", upload.getvalue(), "image/jpeg"
+                    )
+                },
+            )  # type: ignore
+            self.assertEqual(res.status_code, 205)
+
+            profile = await Profile.objects.aget(user=user)
+            self.assertEqual(set(profile.photo_variants), {"48", "128", "512"})
+            self.assertEqual(profile.photo.name, profile.photo_variants["512"])
+            for size, name in profile.photo_variants.items():
+                with Image.open(Path(media_root) / name) as variant:
+                    self.assertEqual(variant.format, "WEBP")
+                    self.assertEqual(variant.size, (int(size), int(size)))
+                    self.assertNotIn("exif", variant.info)
 
+            res = await self.tclient.get("/photo_tester")  # type: ignore
+            urls = res.json()["profile"]["photo_variants"]
+            self.assertEqual(urls["48"], f"/media/{profile.photo_variants['48']}")
+
+            res = await self.tclient.delete(
+                "/me/photo",
+                headers={"Authorization": f"Bearer {refresh.access_token}"},  # type: ignore
+            )
+            self.assertEqual(res.status_code, 204)
+            for name in profile.photo_variants.values():
+                self.assertFalse((Path(media_root) / name).exists())
+
+    def test_replace_user_photo(self):
+        user = User.objects.create_user(username="photo_replacer")
+        profile = user.profile  # type: ignore
+
+        with TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            AccountService._store_photo_variants(profile, {48: b"old"})
+            old = profile.photo.name
+
+            # A failed save keeps the current photo and drops the new files
+            with patch.object(Profile, "save", side_effect=OSError):
+                with self.assertRaises(OSError):
+                    AccountService._store_photo_variants(profile, {48: b"new"})
+            profile = Profile.objects.get(user=user)
+            self.assertEqual(profile.photo.name, old)
+            self.assertEqual(
+                [path.name for path in Path(media_root).rglob("*.webp")],
+                [Path(old).name],
+            )
+
+            # The old files go only once the new ones are saved
+            AccountService._store_photo_variants(profile, {48: b"new"})
+            new = Profile.objects.get(user=user).photo.name
+            self.assertNotEqual(new, old)
+            self.assertFalse((Path(media_root) / old).exists())
+            self.assertEqual((Path(media_root) / new).read_bytes(), b"new")
+
+    async def test_upload_invalid_user_photo(self):
         user = await User.objects.acreate_user(
             username="photo_tester", password="12345678"
         )
         refresh = RefreshToken.for_user(user)
 
-        fake_image = BytesIO(b"fakejpegdata")
         res = await self.tclient.post(
             "/me/photo",
             headers={"Authorization": f"Bearer {refresh.access_token}"},  # type: ignore
             FILES={
                 "file": SimpleUploadedFile(
-                    "test_image.jpg", fake_image.getvalue(), "image/jpeg"
+                    "test_image.jpg", b"fakejpegdata", "image/jpeg"
                 )
             },
         )  # type: ignore
-        self.assertEqual(res.status_code, 205)
-
-        # Confirm photo has been uploaded
-        user = await User.objects.select_related("profile").aget(
-            username="photo_tester"
-        )
-        self.assertIsNotNone(user.profile.photo)  # type: ignore
-
-        await sync_to_async(user.profile.photo.delete)()  # type: ignore
+        self.assertEqual(res.status_code, 422)
+        profile = await Profile.objects.aget(user=user)
+        self.assertFalse(profile.photo)
 
     async def test_delete_user_photo(self):
         user = await User.objects.acreate_user(
@@ -166,3 +348,459 @@ class AccountsTest(TestCase):
             headers={"Authorization": f"Bearer {refresh.access_token}"},  # type: ignore
         )
         self.assertEqual(res.status_code, 204)
+
+    async def test_follow_and_unfollow_user(self):
+        follower = await User.objects.acreate_user(username="follower")
+        followee = await User.objects.acreate_user(username="followee")
+        await Post.objects.acreate(content="Old post", author=followee)
+        headers = {
+            "Authorization": f"Bearer {RefreshToken.for_user(follower).access_token}"
+        }  # type: ignore
+
+        res = await self.tclient.post("/followee/follow", headers=headers)  # type: ignore
+        self.assertEqual(res.status_code, 204)
+        # Following twice is a no-op
+        res = await self.tclient.post("/followee/follow", headers=headers)  # type: ignore
+        self.assertEqual(res.status_code, 204)
+        await wait_for_background_tasks()
+
+        self.assertEqual(await Follow.objects.acount(), 1)
+        followee_profile = await Profile.objects.aget(user=followee)
+        follower_profile = await Profile.objects.aget(user=follower)
+        self.assertEqual(followee_profile.followers_count, 1)
+        self.assertEqual(follower_profile.following_count, 1)
+        # Recent posts are backfilled into the new follower's timeline
+        self.assertTrue(await TimelineEntry.objects.filter(owner=follower).aexists())
+
+        res = await self.tclient.delete("/followee/follow", headers=headers)  # type: ignore
+        self.assertEqual(res.status_code, 204)
+        self.assertFalse(await Follow.objects.aexists())
+        self.assertFalse(await TimelineEntry.objects.filter(owner=follower).aexists())
+        followee_profile = await Profile.objects.aget(user=followee)
+        self.assertEqual(followee_profile.followers_count, 0)
+
+        res = await self.tclient.delete("/followee/follow", headers=headers)  # type: ignore
+        self.assertEqual(res.status_code, 404)
+
+    async def test_cannot_follow_yourself(self):
+        user = await User.objects.acreate_user(username="narcissus")
+        res = await self.tclient.post(
+            "/narcissus/follow",
+            headers={
+                "Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"
+            },  # type: ignore
+        )
+        self.assertEqual(res.status_code, 422)
+
+    async def test_authenticated_user_is_cached_until_saved(self):
+        user = await User.objects.acreate_user(username="cached", first_name="Old")
+        headers = {
+            "Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"
+        }  # type: ignore
+
+        await self.tclient.get("/me", headers=headers)  # type: ignore
+        await self.tclient.get("/me", headers=headers)  # type: ignore
+        stats = user_cache.stats()
+        self.assertEqual((stats["misses"], stats["hits"]), (1, 1))
+
+        # Saving the user evicts it, so the next request reloads it
+        user.first_name = "New"
+        await user.asave()
+        await self.tclient.get("/me", headers=headers)  # type: ignore
+        self.assertEqual(user_cache.stats()["misses"], 2)
+
+    def test_user_cache_is_bounded_and_expires(self):
+        cache = AuthenticatedUserCache(maxsize=2, ttl=60)
+        for user_id in range(3):
+            cache.set(user_id, User(pk=user_id, username=f"u{user_id}"))
+        self.assertIsNone(cache.get(0))  # least recently used, evicted
+        self.assertEqual(cache.get(2).username, "u2")  # type: ignore
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+        expired = AuthenticatedUserCache(maxsize=2, ttl=0)
+        expired.set(1, User(pk=1))
+        self.assertIsNone(expired.get(1))
+
+    async def test_query_budgets(self):
+        user = await User.objects.acreate_user(username="budget", password="12345678")
+        await User.objects.acreate_user(username="other")
+        auth = {"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+        registration = {
+            "username": "newcomer",
+            "email": "newcomer@email.com",
+            "password": "12345678",
+            "password_confirm": "12345678",
+            "first_name": "new",
+            "last_name": "comer",
+        }
+        routes = [
+            ("get", "/me", {"headers": auth}, 3),
+            ("patch", "/me", {"headers": auth, "json": {"first_name": "Budget"}}, 5),
+            ("get", "/other", {}, 2),
+            ("post", "/other/follow", {"headers": auth}, 10),
+            ("delete", "/other/follow", {"headers": auth}, 8),
+            ("delete", "/me/photo", {"headers": auth}, 3),
+            ("post", "/register", {"json": registration}, 4),
+            ("delete", "/me", {"headers": auth}, 8),
+        ]
+        for method, path, kwargs, budget in routes:
+            # Worst case: the token's user isn't cached yet
+            user_cache.clear()
+            with self.subTest(f"{method.upper()} {path}"), query_budget(budget):
+                response = await getattr(self.tclient, method)(path, **kwargs)
+                self.assertLess(response.status_code, 400)
+            await wait_for_background_tasks()
+
+
+class AccountPurgeTest(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username="leaving")
+        cls.other = User.objects.create_user(username="staying")
+        cls.third = User.objects.create_user(username="watching")
+        for follower, followee in [
+            (cls.user, cls.other),
+            (cls.other, cls.user),
+            (cls.third, cls.other),
+        ]:
+            Follow.objects.create(follower=follower, followee=followee)
+        Profile.objects.filter(user=cls.other).update(
+            followers_count=2, following_count=1
+        )
+        Profile.objects.filter(user=cls.third).update(following_count=1)
+
+        cls.others_posts = [
+            Post.objects.create(content=f"Staying {i}", author=cls.other)
+            for i in range(3)
+        ]
+        for post, reaction_type in zip(
+            cls.others_posts,
+            [ReactionType.LIKE, ReactionType.DISLIKE, ReactionType.LIKE],
+        ):
+            Reaction.objects.create(
+                user=cls.user, post=post, reaction_type=reaction_type
+            )
+            Reaction.objects.create(user=cls.third, post=post)
+        Post.objects.filter(pk__in=[p.pk for p in cls.others_posts]).update(
+            like_count=2
+        )
+        Post.objects.filter(pk=cls.others_posts[1].pk).update(
+            like_count=1, dislike_count=1
+        )
+
+        # A thread on the other user's post: top -> leaving's reply -> their
+        # own reply, and a second reply to top
+        post = cls.others_posts[0]
+        cls.top = Comment.objects.create(content="Top", author=cls.other, post=post)
+        reply = Comment.objects.create(
+            content="Reply",
+            author=cls.user,
+            post=post,
+            parent=cls.top,
+            depth=1,
+            ancestry=cls.top.path,
+        )
+        reply.refresh_from_db()
+        Comment.objects.create(
+            content="Nested",
+            author=cls.user,
+            post=post,
+            parent=reply,
+            depth=2,
+            ancestry=reply.path,
+        )
+        Comment.objects.create(
+            content="Kept",
+            author=cls.third,
+            post=post,
+            parent=cls.top,
+            depth=1,
+            ancestry=cls.top.path,
+        )
+        Comment.objects.filter(pk=cls.top.pk).update(reply_count=2)
+        Comment.objects.filter(pk=reply.pk).update(reply_count=1)
+
+        # The leaving user's own posts, with what others did on them
+        for i in range(5):
+            own = Post.objects.create(content=f"Leaving {i}", author=cls.user)
+            Reaction.objects.create(user=cls.other, post=own)
+            Comment.objects.create(content="Nice", author=cls.other, post=own)
+            TimelineEntry.objects.create(
+                owner=cls.other, post=own, created_at=own.created_at
+            )
+
+        User.objects.filter(pk=cls.user.pk).update(is_active=False)
+        AccountDeletion.objects.create(user_id=cls.user.pk)
+
+    async def test_purge_deletes_in_batches_and_keeps_counters(self):
+        await purge_account(self.user.pk, batch_size=2)
+
+        self.assertFalse(await User.objects.filter(pk=self.user.pk).aexists())
+        deletion = await AccountDeletion.objects.aget(user_id=self.user.pk)
+        self.assertIsNotNone(deletion.completed_at)
+        self.assertEqual(
+            deletion.progress,
+            {
+                "following": 1,
+                "followers": 1,
+                "reactions": 3,
+                "comments": 2,
+                "post_reactions": 5,
+                "post_comments": 5,
+                "post_timelines": 5,
+                "posts": 5,
+            },
+        )
+
+        counts = {
+            p.pk: (p.like_count, p.dislike_count)
+            async for p in Post.objects.filter(author=self.other)
+        }
+        self.assertEqual(
+            counts,
+            {
+                self.others_posts[0].pk: (1, 0),
+                self.others_posts[1].pk: (1, 0),
+                self.others_posts[2].pk: (1, 0),
+            },
+        )
+        other = await Profile.objects.aget(user=self.other)
+        self.assertEqual((other.followers_count, other.following_count), (1, 0))
+        top = await Comment.objects.aget(pk=self.top.pk)
+        self.assertEqual(top.reply_count, 1)
+        self.assertEqual(
+            [c.content async for c in Comment.objects.order_by("pk")],
+            ["Top", "Kept"],
+        )
+
+    @staticmethod
+    def score_engagement() -> dict[int, float]:
+        """Score every post from the reactions and comments left on it."""
+        Post.objects.update(trending_score=None)
+        for weight, rows in [
+            (settings.TRENDING_REACTION_WEIGHT, Reaction.objects.all()),
+            (settings.TRENDING_COMMENT_WEIGHT, Comment.objects.all()),
+        ]:
+            for row in rows:
+                Post.objects.filter(pk=row.post_id).update(
+                    trending_score=Engaged(weight, row.created_at)
+                )
+        return dict(Post.objects.values_list("pk", "trending_score"))
+
+    async def test_purge_takes_engagement_out_of_trending_scores(self):
+        await sync_to_async(self.score_engagement)()
+        await purge_account(self.user.pk, batch_size=2)
+
+        purged = {
+            pk: score
+            async for pk, score in Post.objects.values_list("pk", "trending_score")
+        }
+        expected = await sync_to_async(self.score_engagement)()
+        self.assertEqual(purged.keys(), expected.keys())
+        for pk, score in expected.items():
+            self.assertAlmostEqual(purged[pk], score, places=6)
+
+    def test_purge_deletes_photo_files_once_committed(self):
+        with TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            profile = Profile.objects.get(user=self.user)
+            AccountService._store_photo_variants(profile, {48: b"photo"})
+            photo = Path(media_root) / profile.photo.name
+
+            # The last batch fails after deleting the user, and rolls back
+            failing = Mock(now=Mock(side_effect=RuntimeError))
+            with (
+                patch("accounts.purge.timezone", failing),
+                self.assertRaises(RuntimeError),
+                self.captureOnCommitCallbacks() as callbacks,
+            ):
+                while purge_batch(self.user.pk, 100):
+                    pass
+            self.assertEqual(callbacks, [])
+            self.assertTrue(photo.exists())
+
+            with self.captureOnCommitCallbacks(execute=True):
+                while purge_batch(self.user.pk, 100):
+                    pass
+            self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+            self.assertFalse(photo.exists())
+
+    async def test_purge_resumes_where_it_stopped(self):
+        for _ in range(3):
+            self.assertTrue(await sync_to_async(purge_batch)(self.user.pk, 1))
+        deletion = await AccountDeletion.objects.aget(user_id=self.user.pk)
+        self.assertEqual(
+            deletion.progress, {"following": 1, "followers": 1, "reactions": 1}
+        )
+
+        await purge_account(self.user.pk)
+        deletion = await AccountDeletion.objects.aget(user_id=self.user.pk)
+        self.assertEqual(deletion.progress["reactions"], 3)
+        self.assertFalse(await Reaction.objects.filter(user=self.user).aexists())
+        # Finished purges are no-ops
+        self.assertFalse(await sync_to_async(purge_batch)(self.user.pk, 1))
+
+
+@skipUnless(settings.DATABASE_POOL, "needs the connection pool")
+class AccountPurgeConnectionTest(TransactionTestCase):
+    # A batch per row, so purges outlive their requests
+    @override_settings(ACCOUNT_PURGE_BATCH_SIZE=1)
+    def test_purges_return_their_pooled_connections(self):
+        from murmur.asgi import application
+
+        # More deletions than the pool has connections: a leaked connection
+        # per purge would exhaust it
+        users = [
+            User.objects.create_user(username=f"leaving{i}")
+            for i in range(
+                settings.DATABASES["default"]["OPTIONS"]["pool"]["max_size"] + 1
+            )
+        ]
+        for user in users:
+            Post.objects.create(content="Bye", author=user)
+            Post.objects.create(content="Bye again", author=user)
+        client = ASGIClient(application)
+        statuses = []
+
+        async def serve() -> None:
+            for user in users:
+                token = str(RefreshToken.for_user(user).access_token)
+                request = Request(
+                    "DELETE /api/accounts/me", "DELETE", "/api/accounts/me", token=token
+                )
+                status, _, _ = await client.request(request)
+                statuses.append(status)
+            await wait_for_background_tasks()
+
+        in_use = pooled_connections_in_use()
+        run_like_a_server(serve)
+
+        self.assertEqual(set(statuses), {204})
+        self.assertEqual(pooled_connections_in_use(), in_use)
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(Post.objects.exists())
+
+
+class PasswordHashingTest(TestCase):
+    def setUp(self) -> None:
+        self.tclient = TestAsyncClient(token_router)
+
+    async def login(self, username: str, password: str) -> NinjaResponse:
+        return await self.tclient.post(
+            "/pair", json={"username": username, "password": password}
+        )  # type: ignore
+
+    async def test_obtain_token_pair(self):
+        await User.objects.acreate_user(username="hashed", password="12345678")
+        await User.objects.acreate_user(
+            username="inactive", password="12345678", is_active=False
+        )
+
+        res = await self.login("hashed", "12345678")
+        self.assertEqual(res.status_code, 200, res.json())
+        self.assertEqual(res.data["username"], "hashed")
+        self.assertIn("access", res.data)
+        self.assertIn("refresh", res.data)
+
+        for username, password in [
+            ("hashed", "wrong-password"),
+            ("inactive", "12345678"),
+            ("nobody", "12345678"),
+        ]:
+            with self.subTest(username=username):
+                res = await self.login(username, password)
+                self.assertEqual(res.status_code, 401, res.json())
+
+    async def test_make_and_check_password(self):
+        encoded = await passwords.make_password("12345678")
+        # With the first of PASSWORD_HASHERS
+        self.assertTrue(encoded.startswith("pbkdf2_sha256$"))
+        self.assertTrue(await passwords.check_password("12345678", encoded))
+        self.assertFalse(await passwords.check_password("87654321", encoded))
+
+    async def test_outdated_hash_is_rehashed_at_login(self):
+        user = await User.objects.acreate_user(username="outdated")
+        user.password = make_password("12345678", hasher="pbkdf2_sha1")
+        await user.asave(update_fields=["password"])
+
+        res = await self.login("outdated", "12345678")
+        self.assertEqual(res.status_code, 200, res.json())
+        await user.arefresh_from_db()
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$"))
+
+    @override_settings(PASSWORD_HASHING_WORKERS=0)
+    async def test_hashing_without_a_pool(self):
+        encoded = await passwords.make_password("12345678")
+        self.assertTrue(await passwords.check_password("12345678", encoded))
+
+    @skipUnless(find_spec("argon2"), "argon2-cffi is not installed")
+    @override_settings(
+        PASSWORD_HASHERS=["accounts.hashers.Argon2PasswordHasher"],
+        PASSWORD_ARGON2_TIME_COST=1,
+        PASSWORD_ARGON2_MEMORY_COST=8192,
+        PASSWORD_ARGON2_PARALLELISM=1,
+    )
+    async def test_argon2_costs_from_settings(self):
+        encoded = await passwords.make_password("12345678")
+        self.assertIn("$m=8192,t=1,p=1$", encoded)
+        self.assertTrue(await passwords.check_password("12345678", encoded))
+
+
+class AccountExportTest(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(
+            username="exporter", first_name="Ex", last_name="Porter"
+        )
+        other = User.objects.create_user(username="other")
+        self.posts = [
+            Post.objects.create(content=f"Post {i}", author=self.user) for i in range(3)
+        ]
+        other_post = Post.objects.create(content="Not mine", author=other)
+        Comment.objects.create(content="Nice", author=self.user, post=other_post)
+        Comment.objects.create(content="Not mine", author=other, post=other_post)
+        Reaction.objects.create(
+            user=self.user, post=other_post, reaction_type=ReactionType.DISLIKE
+        )
+        self.headers = {
+            "Authorization": f"Bearer {RefreshToken.for_user(self.user).access_token}"
+        }
+
+    async def _export(self, **headers) -> tuple:
+        response = await self.async_client.get(
+            "/api/accounts/me/export", headers={**self.headers, **headers}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        return response, body
+
+    @override_settings(ACCOUNT_EXPORT_CHUNK_SIZE=2, STREAMING_CHUNK_SIZE=100)
+    async def test_export_streams_ndjson(self):
+        response, body = await self._export()
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertIn('filename="exporter.ndjson"', response["Content-Disposition"])
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+        records = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual(
+            [record["type"] for record in records],
+            ["profile", "post", "post", "post", "comment", "reaction"],
+        )
+        self.assertEqual(records[0]["username"], "exporter")
+        self.assertIn("profile", records[0])
+        self.assertEqual(
+            [record["content"] for record in records[1:4]],
+            ["Post 0", "Post 1", "Post 2"],
+        )
+        self.assertEqual(records[4]["content"], "Nice")
+        self.assertEqual(records[5]["reaction_type"], "dislike")
+
+    async def test_export_is_gzipped_when_accepted(self):
+        _, plain = await self._export()
+        response, body = await self._export(**{"Accept-Encoding": "gzip, br"})
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(gzip.decompress(body), plain)
+
+    async def test_export_requires_auth(self):
+        response = await self.async_client.get("/api/accounts/me/export")
+        self.assertEqual(response.status_code, 401)
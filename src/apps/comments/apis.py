@@ -1,6 +1,12 @@
 # Create your views here.
+from typing import Optional
+
+from django.http import HttpResponse
 from ninja import Query, Router
 from ninja.pagination import paginate
+from murmur.conditional import not_modified
+from murmur.pagination import CursorPagination
+from murmur.search import SEARCH_ORDERING
 from murmur.security import AsyncTokenBasedAuth
 from comments.schemas import CommentCreate, CommentFilter, CommentPublic
 from comments.services import CommentService
@@ -22,20 +28,83 @@ async def create_comment(request, payload: CommentCreate):
 async def get_list_of_comments(request, filters: CommentFilter = Query(...)):  # type: ignore
     """
     Get a paginated list of comments.
-    Can be filtered by post, author, and creation date.
+    Can be filtered by post, author, parent comment, and creation date.
     """
     return await CommentService.get_all(request, filters)
 
 
-@router.get("/{int:id}", response=CommentPublic)
-async def get_a_single_comment(request, id: int):
+@router.get("/cursor", response=list[CommentPublic])
+@paginate(CursorPagination)
+async def get_list_of_comments_by_cursor(
+    request,
+    filters: CommentFilter = Query(...),  # type: ignore
+):
+    """
+    Get a list of comments, newest first, using cursor pagination.
+    Accepts the same filters as the offset-paginated list, so each level of
+    a thread can be paged on its own with `top_level=true` or `parent`.
+    """
+    return await CommentService.get_all(request, filters)
+
+
+@router.get("/thread", response=list[CommentPublic])
+@paginate(CursorPagination, ordering=("path",))
+async def get_thread(
+    request,
+    post: int,
+    depth: Optional[int] = Query(None, ge=0),  # type: ignore
+):
+    """
+    Get all comments on a post in thread order, using cursor pagination:
+    each comment is followed by its replies, oldest first.
+    With `depth`, only replies up to that many levels deep are included
+    (`depth=0` is top-level comments only).
+    """
+    return await CommentService.get_thread(request, post, depth)
+
+
+@router.get("/search", response=list[CommentPublic])
+@paginate(CursorPagination, ordering=SEARCH_ORDERING)
+async def search_comments(
+    request,
+    q: str = Query(..., min_length=1, max_length=200),
+    filters: CommentFilter = Query(...),  # type: ignore
+):
+    """
+    Full-text search over comments, best matches first, using cursor pagination.
+    `q` accepts web search syntax. Accepts the same filters as the list.
+    """
+    return await CommentService.search(request, q, filters)
+
+
+@router.get("/{int:id}", response={200: CommentPublic, 304: None})
+async def get_a_single_comment(request, id: int, response: HttpResponse):
     """
     Get a single comment by its ID.
-    Returns 404 if the comment doesn't exist.
+    Returns 404 if the comment doesn't exist, or 304 if the ETag sent in
+    If-None-Match still matches.
     """
+    etag = await CommentService.get_comment_etag(request, id)
+    if cached := not_modified(request, response, etag):
+        return cached
     return await CommentService.get_one_comment(request, id)
 
 
+@router.get("/{int:id}/thread", response=list[CommentPublic])
+@paginate(CursorPagination, ordering=("path",))
+async def get_comment_thread(
+    request,
+    id: int,
+    depth: Optional[int] = Query(None, ge=0),  # type: ignore
+):
+    """
+    Get a comment followed by its replies in thread order, using cursor
+    pagination. With `depth`, only replies up to that many levels below the
+    comment are included. Returns 404 if the comment doesn't exist.
+    """
+    return await CommentService.get_subtree(request, id, depth)
+
+
 @router.delete("/{int:id}", auth=AsyncTokenBasedAuth(), response={205: None})
 async def delete_comment(request, id: int):
     """
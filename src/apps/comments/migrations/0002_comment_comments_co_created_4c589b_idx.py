@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-17 07:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("comments", "0001_initial"),
+        ("posts", "0003_post_posts_post_created_b28b11_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["created_at", "id"], name="comments_co_created_4c589b_idx"
+            ),
+        ),
+    ]
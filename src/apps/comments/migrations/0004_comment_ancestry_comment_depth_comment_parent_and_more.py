@@ -0,0 +1,76 @@
+# Generated by Django 5.2.3 on 2026-10-17 08:37
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("comments", "0003_comment_search_vector_and_more"),
+        ("posts", "0005_post_search_vector_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="ancestry",
+            field=models.CharField(default="", editable=False, max_length=240),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="depth",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="parent",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="replies",
+                to="comments.comment",
+            ),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="reply_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="path",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.db.models.functions.text.Concat(
+                    "ancestry",
+                    django.db.models.functions.text.LPad(
+                        django.db.models.functions.comparison.Cast(
+                            "id", models.TextField()
+                        ),
+                        12,
+                        models.Value("0"),
+                    ),
+                ),
+                output_field=models.CharField(db_collation="C", max_length=252),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["post", "path"], name="comments_co_post_id_adad8a_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["parent", "created_at", "id"],
+                name="comments_co_parent__aae4af_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-17 08:46
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without locking out writes to the table
+    atomic = False
+
+    dependencies = [
+        ("comments", "0004_comment_ancestry_comment_depth_comment_parent_and_more"),
+        ("posts", "0006_post_posts_post_author__691f2d_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="comment",
+            index=models.Index(
+                fields=["post", "created_at", "id"],
+                name="comments_co_post_id_815fb8_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="comment",
+            index=models.Index(
+                fields=["author", "created_at", "id"],
+                name="comments_co_author__e8b354_idx",
+            ),
+        ),
+    ]
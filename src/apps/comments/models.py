@@ -1,12 +1,76 @@
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models.functions import Cast, Concat, LPad
 
+from murmur.search import SEARCH_CONFIG, SearchableManager
 from posts.models import Post
 
 
+# Every comment adds its zero-padded ID to its parent's path, so paths
+# sort into render order (depth-first, oldest reply first) as plain strings
+PATH_SEGMENT_WIDTH = 12
+# Replies can be nested this many levels below a top-level comment
+MAX_DEPTH = 20
+
+
 # Create your models here.
 class Comment(models.Model):
     content = models.CharField(max_length=280)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="comments")
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="comments")
     created_at = models.DateTimeField(auto_now_add=True)
+
+    # Reply threads, see CommentService.create_comment. `ancestry` is the
+    # parent's path ("" for top-level comments) and `depth` its length in
+    # segments, both fixed when the comment is created.
+    parent = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="replies",
+        # Covered by the (parent, created_at, id) index
+        db_index=False,
+    )
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    ancestry = models.CharField(
+        max_length=PATH_SEGMENT_WIDTH * MAX_DEPTH, default="", editable=False
+    )
+    # Materialized path: a subtree is a prefix range of (post, path).
+    # The "C" collation makes that range and the render order bytewise.
+    path = models.GeneratedField(
+        expression=Concat(
+            "ancestry",
+            LPad(Cast("id", models.TextField()), PATH_SEGMENT_WIDTH, models.Value("0")),
+        ),
+        output_field=models.CharField(
+            max_length=PATH_SEGMENT_WIDTH * (MAX_DEPTH + 1), db_collation="C"
+        ),
+        db_persist=True,
+    )
+    # Denormalized count of direct replies, maintained by CommentService
+    reply_count = models.IntegerField(default=0, editable=False)
+
+    # Computed by Postgres on every insert/update, see murmur.search
+    search_vector = models.GeneratedField(
+        expression=SearchVector("content", config=SEARCH_CONFIG),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = SearchableManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"]),
+            # The same order for the comments on one post, or by one author
+            models.Index(fields=["post", "created_at", "id"]),
+            models.Index(fields=["author", "created_at", "id"]),
+            GinIndex(fields=["search_vector"]),
+            # Threads and subtrees, in render order
+            models.Index(fields=["post", "path"]),
+            # Cursor pagination over the replies of one comment
+            models.Index(fields=["parent", "created_at", "id"]),
+        ]
@@ -9,29 +9,46 @@ class CommentCreate(Schema):
     """
     Schema for creating a new comment.
     Requires the comment content and the ID of the post being commented on.
+    Set `parent_id` to reply to another comment on the same post.
     """
 
     content: str
     post_id: int
+    parent_id: Optional[int] = None
 
 
 class CommentPublic(ModelSchema):
     """
     Public schema for comment data.
-    Exposes content, author, associated post, and creation timestamp.
+    Exposes content, author, associated post, and creation timestamp, plus
+    the comment's place in its thread: the parent it replies to (null for
+    top-level comments), its nesting depth and its number of direct replies.
     """
 
     class Meta:
         model = Comment
-        fields = ["content", "author", "post", "created_at"]
+        fields = [
+            "id",
+            "content",
+            "author",
+            "post",
+            "parent",
+            "depth",
+            "reply_count",
+            "created_at",
+        ]
 
 
 class CommentFilter(FilterSchema):
     """
     Filter schema for comments.
     Supports filtering by post ID, author ID, and comments created after a specific datetime.
+    Use `parent` to list the replies to one comment, or `top_level=true`
+    to list only comments that aren't replies.
     """
 
     post: Optional[int] = None
+    parent: Optional[int] = None
+    top_level: Optional[bool] = Field(None, q="parent__isnull")  # type: ignore
     author: Optional[int] = None
     created_after: Optional[datetime] = Field(None, q="created_at__gte")  # type: ignore
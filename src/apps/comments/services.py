@@ -1,7 +1,18 @@
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.http import Http404
 from django.shortcuts import aget_object_or_404
 from ninja.errors import HttpError
-from comments.models import Comment
+from comments.models import MAX_DEPTH, Comment
+from murmur import live, querycache
+from murmur.conditional import make_etag
+from murmur.search import ranked_search
 from posts.models import Post
+from posts.trending import Disengaged, Engaged
 from comments.schemas import CommentCreate, CommentFilter
 
 
@@ -29,16 +40,61 @@ class CommentService:
             # Optionally enforce a max length, e.g. 280 chars
             if len(payload.content) > 280:
                 raise HttpError(422, "Content exceeds 280 characters")
-            # Ensure the post exists
-            post = await aget_object_or_404(Post.objects, pk=payload.post_id)
-            comment = Comment(content=payload.content, post=post, author=request.auth)
-            await comment.asave()
+            if payload.parent_id is None:
+                # Ensure the post exists
+                post = await aget_object_or_404(Post.objects, pk=payload.post_id)
+                comment = Comment(
+                    content=payload.content, post=post, author=request.auth
+                )
+                await sync_to_async(CommentService._save_comment)(comment)
+                await querycache.changed(Comment, [post.pk])
+                await live.publish(post.pk, comments=1, comment_ids=[comment.pk])
+                return comment
+
+            parent = await aget_object_or_404(
+                Comment.objects.only("post_id", "depth", "path"), pk=payload.parent_id
+            )
+            if parent.post_id != payload.post_id:  # type: ignore
+                raise HttpError(422, "A reply must be on its parent's post")
+            if parent.depth >= MAX_DEPTH:
+                raise HttpError(422, f"Replies can't be nested deeper than {MAX_DEPTH}")
+            comment = Comment(
+                content=payload.content,
+                post_id=parent.post_id,  # type: ignore
+                author=request.auth,
+                parent=parent,
+                depth=parent.depth + 1,
+                ancestry=parent.path,
+            )
+            await sync_to_async(CommentService._save_comment)(comment)
+            await querycache.changed(Comment, [comment.post_id])  # type: ignore
+            await live.publish(
+                comment.post_id,  # type: ignore
+                comments=1,
+                comment_ids=[comment.pk],
+            )
             return comment
-        except HttpError as e:
+        except (HttpError, Http404) as e:
             raise e
         except Exception as e:
             raise HttpError(500, f"Failed to create comment: {e}")
 
+    @staticmethod
+    @transaction.atomic
+    def _save_comment(comment: Comment) -> None:
+        """
+        Insert a comment and bump the post's trending score and, for a reply,
+        its parent's reply count in one transaction.
+        """
+        comment.save()
+        if comment.parent_id is not None:  # type: ignore
+            Comment.objects.filter(pk=comment.parent_id).update(  # type: ignore
+                reply_count=F("reply_count") + 1
+            )
+        Post.objects.filter(pk=comment.post_id).update(  # type: ignore
+            trending_score=Engaged(settings.TRENDING_COMMENT_WEIGHT, comment.created_at)
+        )
+
     @staticmethod
     async def get_all(request, filters: CommentFilter):
         """
@@ -49,11 +105,114 @@ class CommentService:
             filters: Filter parameters for comments (post, author, created_after)
 
         Returns:
-            Filtered queryset of Comment objects
+            Filtered queryset of Comment objects, newest first, whose pages
+            are served from the queryset cache
+        """
+        comments = Comment.objects.order_by("-created_at", "-id")
+        key = ("comments", filters.model_dump(exclude_none=True))
+        if filters.post is not None:
+            results = querycache.CachedResults(
+                key, post_models=[Comment], post_id=filters.post
+            )
+        else:
+            results = querycache.CachedResults(key, models=[Comment])
+        return querycache.cache_results(filters.filter(comments), results)
+
+    @staticmethod
+    async def get_thread(request, post_id: int, depth: Optional[int] = None):
+        """
+        Get all comments on a post in thread order.
+
+        Args:
+            request: HTTP request object
+            post_id: The ID of the post
+            depth: Only include replies up to this many levels deep
+
+        Returns:
+            Queryset of Comment objects, paginated over `path`, which is the
+            render order: each comment is followed by its replies, oldest first
+
+        Raises:
+            HttpError: If the post doesn't exist
+        """
+        if not await Post.objects.filter(pk=post_id).aexists():
+            raise HttpError(404, "Not Found")
+        comments = Comment.objects.filter(post_id=post_id)
+        if depth is not None:
+            comments = comments.filter(depth__lte=depth)
+        return comments
+
+    @staticmethod
+    async def get_subtree(request, id: int, depth: Optional[int] = None):
+        """
+        Get a comment and its replies in thread order. The subtree is a
+        prefix range of the (post, path) index, so it is read in one scan
+        however deep or wide it is.
+
+        Args:
+            request: HTTP request object
+            id: The ID of the comment at the top of the subtree
+            depth: Only include replies up to this many levels below it
+
+        Returns:
+            Queryset of Comment objects, paginated over `path`
+
+        Raises:
+            HttpError: If the comment doesn't exist
+        """
+        root = await aget_object_or_404(
+            Comment.objects.only("post_id", "depth", "path"), pk=id
+        )
+        comments = Comment.objects.filter(
+            post_id=root.post_id,  # type: ignore
+            path__startswith=root.path,
+        )
+        if depth is not None:
+            comments = comments.filter(depth__lte=root.depth + depth)
+        return comments
+
+    @staticmethod
+    async def search(request, terms: str, filters: CommentFilter):
+        """
+        Full-text search over comments, with optional filtering.
+
+        Args:
+            request: HTTP request object
+            terms: Search terms, in web search syntax
+            filters: Filter parameters for comments (post, author, created_after)
+
+        Returns:
+            Filtered queryset of matching Comment objects, annotated with `rank`
         """
-        comments = Comment.objects.all()
+        comments = ranked_search(Comment.objects.all(), terms)
         return filters.filter(comments)
 
+    @staticmethod
+    async def get_comment_etag(request, id: int) -> str:
+        """
+        Get the ETag of a comment without loading it.
+        Comments are immutable, so it only depends on the comment existing
+        and on its reply count.
+
+        Args:
+            request: HTTP request object
+            id: The ID of the comment
+
+        Returns:
+            The quoted ETag string
+
+        Raises:
+            HttpError: If the comment doesn't exist
+        """
+        reply_count = (
+            await Comment.objects.filter(pk=id)
+            .values_list("reply_count", flat=True)
+            .afirst()
+        )
+        if reply_count is None:
+            raise HttpError(404, "Not Found")
+        return make_etag("comment", id, reply_count)
+
     @staticmethod
     async def get_one_comment(request, id: int) -> Comment:
         """
@@ -97,4 +256,28 @@ class CommentService:
         )
         if request.auth != comment.author:
             raise HttpError(403, "YOU cannot delete comments from another person")
-        await comment.adelete()
+        post_id = comment.post_id  # type: ignore
+        deleted = await sync_to_async(CommentService._delete_with_replies)(comment)
+        await querycache.changed(Comment, [post_id])
+        await live.publish(post_id, comments=-deleted)
+
+    @staticmethod
+    @transaction.atomic
+    def _delete_with_replies(comment: Comment) -> int:
+        """
+        Delete a comment, which cascades to its replies, decrement its
+        parent's reply count and take it back out of the post's trending
+        score in one transaction. The replies' share of the score is left
+        to decay. Returns how many comments were deleted.
+        """
+        if comment.parent_id is not None:  # type: ignore
+            Comment.objects.filter(pk=comment.parent_id).update(  # type: ignore
+                reply_count=F("reply_count") - 1
+            )
+        Post.objects.filter(pk=comment.post_id).update(  # type: ignore
+            trending_score=Disengaged(
+                settings.TRENDING_COMMENT_WEIGHT, comment.created_at
+            )
+        )
+        _, deleted = comment.delete()
+        return deleted[Comment._meta.label]
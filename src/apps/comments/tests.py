@@ -1,8 +1,13 @@
+from unittest.mock import patch
+
 from django.test import TestCase
 from ninja.testing import TestAsyncClient
 from django.contrib.auth.models import User
 
 from ninja_jwt.tokens import RefreshToken
+from accounts.cache import user_cache
+from murmur import querycache
+from murmur.testing import query_budget
 from posts.models import Post
 from comments.models import Comment
 from comments.apis import router
@@ -10,6 +15,7 @@ from comments.apis import router
 
 class CommentsTest(TestCase):
     def setUp(self) -> None:
+        querycache.clear()
         # Create test users
         self.user1 = User.objects.create_user(
             username="testuser1", password="password123"
@@ -49,6 +55,18 @@ class CommentsTest(TestCase):
         self.assertEqual(response.json()["content"], "This is a new test comment")
         self.assertEqual(response.json()["author"], self.user1.pk)
 
+    @patch("comments.services.Engaged", side_effect=RuntimeError("score update failed"))
+    async def test_comment_and_score_are_saved_together(self, engaged):
+        response = await self.tclient.post(
+            "/",
+            json={"content": "Lost with the score", "post_id": self.post.pk},
+            headers={"Authorization": f"Bearer {self.token_user1}"},
+        )  # type: ignore
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(
+            await Comment.objects.filter(content="Lost with the score").aexists()
+        )
+
     async def test_should_fail_create_comment_without_auth(self):
         # Try to create a comment without authentication
         response = await self.tclient.post(
@@ -87,6 +105,21 @@ class CommentsTest(TestCase):
         self.assertEqual(response.json()["content"], self.comment1.content)
         self.assertEqual(response.json()["author"], self.user1.pk)
 
+    async def test_get_a_single_comment_not_modified(self):
+        response = await self.tclient.get(f"/{self.comment1.pk}")  # type: ignore
+        etag = response["ETag"]
+
+        response = await self.tclient.get(
+            f"/{self.comment1.pk}", headers={"If-None-Match": etag}
+        )  # type: ignore
+        self.assertEqual(response.status_code, 304)
+
+        # A different comment has a different ETag
+        response = await self.tclient.get(
+            f"/{self.comment2.pk}", headers={"If-None-Match": etag}
+        )  # type: ignore
+        self.assertEqual(response.status_code, 200)
+
     async def test_delete_comment(self):
         # Delete a comment
         comment = await Comment.objects.filter(author=self.user1).afirst()
@@ -143,3 +176,224 @@ class CommentsTest(TestCase):
 
         # We should have retrieved all comments
         self.assertEqual(len(all_comments), total_comments)
+
+    async def test_get_comments_with_cursor_pagination(self):
+        response = await self.tclient.get(f"/cursor?post={self.post.pk}&limit=1")  # type: ignore
+        self.assertEqual(response.status_code, 200)
+        first_page = response.json()
+        self.assertEqual(len(first_page["items"]), 1)
+        self.assertIsNone(first_page["prev"])
+        # Newest first
+        self.assertEqual(first_page["items"][0]["content"], self.comment2.content)
+
+        response = await self.tclient.get(
+            f"/cursor?post={self.post.pk}&limit=1&cursor={first_page['next']}"
+        )  # type: ignore
+        second_page = response.json()
+        self.assertEqual(second_page["items"][0]["content"], self.comment1.content)
+        self.assertIsNone(second_page["next"])
+        self.assertIsNotNone(second_page["prev"])
+
+    async def test_search_comments(self):
+        other_post = await Post.objects.acreate(content="Other post", author=self.user2)
+        await Comment.objects.acreate(
+            content="Loved these photos!", post=other_post, author=self.user1
+        )
+        await Comment.objects.acreate(
+            content="Photo of the day", post=self.post, author=self.user2
+        )
+
+        response = await self.tclient.get("/search?q=photo")  # type: ignore
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["items"]), 2)
+
+        response = await self.tclient.get(f"/search?q=photo&post={self.post.pk}")  # type: ignore
+        contents = [item["content"] for item in response.json()["items"]]
+        self.assertEqual(contents, ["Photo of the day"])
+
+    async def _reply(self, parent_id: int, content: str, token=None) -> dict:
+        response = await self.tclient.post(
+            "/",
+            json={"content": content, "post_id": self.post.pk, "parent_id": parent_id},
+            headers={"Authorization": f"Bearer {token or self.token_user2}"},
+        )  # type: ignore
+        self.assertEqual(response.status_code, 201, response.json())
+        return response.json()
+
+    async def _thread(self, path: str) -> list[str]:
+        response = await self.tclient.get(path)  # type: ignore
+        self.assertEqual(response.status_code, 200)
+        return [item["content"] for item in response.json()["items"]]
+
+    async def test_reply_to_comment(self):
+        reply = await self._reply(self.comment1.pk, "A reply")
+        self.assertEqual(reply["parent"], self.comment1.pk)
+        self.assertEqual(reply["depth"], 1)
+        nested = await self._reply(reply["id"], "A nested reply")
+        self.assertEqual(nested["depth"], 2)
+
+        response = await self.tclient.get(f"/{self.comment1.pk}")  # type: ignore
+        self.assertEqual(response.json()["reply_count"], 1)
+        self.assertIsNone(response.json()["parent"])
+
+    async def test_reply_must_be_on_parents_post(self):
+        other_post = await Post.objects.acreate(content="Other", author=self.user1)
+        response = await self.tclient.post(
+            "/",
+            json={
+                "content": "Wrong post",
+                "post_id": other_post.pk,
+                "parent_id": self.comment1.pk,
+            },
+            headers={"Authorization": f"Bearer {self.token_user2}"},
+        )  # type: ignore
+        self.assertEqual(response.status_code, 422)
+
+        response = await self.tclient.post(
+            "/",
+            json={"content": "No parent", "post_id": self.post.pk, "parent_id": 0},
+            headers={"Authorization": f"Bearer {self.token_user2}"},
+        )  # type: ignore
+        self.assertEqual(response.status_code, 404)
+
+    @patch("comments.services.MAX_DEPTH", 2)
+    async def test_replies_are_nested_at_most_max_depth(self):
+        reply = await self._reply(self.comment1.pk, "Depth 1")
+        reply = await self._reply(reply["id"], "Depth 2")
+        response = await self.tclient.post(
+            "/",
+            json={
+                "content": "Too deep",
+                "post_id": self.post.pk,
+                "parent_id": reply["id"],
+            },
+            headers={"Authorization": f"Bearer {self.token_user2}"},
+        )  # type: ignore
+        self.assertEqual(response.status_code, 422)
+
+    async def test_thread_in_render_order(self):
+        a = await self._reply(self.comment1.pk, "1.a")
+        await self._reply(self.comment2.pk, "2.a")
+        b = await self._reply(self.comment1.pk, "1.b")
+        await self._reply(a["id"], "1.a.i")
+        await self._reply(b["id"], "1.b.i")
+
+        self.assertEqual(
+            await self._thread(f"/thread?post={self.post.pk}"),
+            [
+                "User1's comment 1",
+                "1.a",
+                "1.a.i",
+                "1.b",
+                "1.b.i",
+                "User2's comment 1",
+                "2.a",
+            ],
+        )
+        self.assertEqual(
+            await self._thread(f"/thread?post={self.post.pk}&depth=0"),
+            ["User1's comment 1", "User2's comment 1"],
+        )
+        self.assertEqual(
+            await self._thread(f"/{self.comment1.pk}/thread"),
+            ["User1's comment 1", "1.a", "1.a.i", "1.b", "1.b.i"],
+        )
+        self.assertEqual(
+            await self._thread(f"/{a['id']}/thread?depth=0"),
+            ["1.a"],
+        )
+        self.assertEqual(
+            await self._thread(f"/{self.comment1.pk}/thread?depth=1"),
+            ["User1's comment 1", "1.a", "1.b"],
+        )
+
+    async def test_thread_with_cursor_pagination(self):
+        parent = self.comment1.pk
+        for i in range(4):
+            parent = (await self._reply(parent, f"Reply {i}"))["id"]
+
+        contents = []
+        path = f"/thread?post={self.post.pk}&limit=2"
+        while path:
+            response = await self.tclient.get(path)  # type: ignore
+            page = response.json()
+            contents += [item["content"] for item in page["items"]]
+            path = (
+                f"/thread?post={self.post.pk}&limit=2&cursor={page['next']}"
+                if page["next"]
+                else None
+            )
+        self.assertEqual(
+            contents,
+            ["User1's comment 1"]
+            + [f"Reply {i}" for i in range(4)]
+            + ["User2's comment 1"],
+        )
+
+    async def test_thread_of_missing_post(self):
+        response = await self.tclient.get("/thread?post=0")  # type: ignore
+        self.assertEqual(response.status_code, 404)
+
+    async def test_subtree_of_missing_comment(self):
+        response = await self.tclient.get("/0/thread")  # type: ignore
+        self.assertEqual(response.status_code, 404)
+
+    async def test_list_one_level_of_a_thread(self):
+        await self._reply(self.comment1.pk, "First reply")
+        await self._reply(self.comment1.pk, "Second reply")
+
+        self.assertEqual(
+            await self._thread(f"/cursor?parent={self.comment1.pk}"),
+            ["Second reply", "First reply"],
+        )
+        self.assertEqual(
+            await self._thread(f"/cursor?post={self.post.pk}&top_level=true"),
+            ["User2's comment 1", "User1's comment 1"],
+        )
+
+    async def test_reply_changes_parents_etag(self):
+        response = await self.tclient.get(f"/{self.comment1.pk}")  # type: ignore
+        etag = response["ETag"]
+        await self._reply(self.comment1.pk, "A reply")
+
+        response = await self.tclient.get(
+            f"/{self.comment1.pk}", headers={"If-None-Match": etag}
+        )  # type: ignore
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["reply_count"], 1)
+
+    async def test_delete_reply(self):
+        reply = await self._reply(self.comment1.pk, "A reply", token=self.token_user1)
+        await self._reply(reply["id"], "A nested reply")
+
+        response = await self.tclient.delete(
+            f"/{reply['id']}", headers={"Authorization": f"Bearer {self.token_user1}"}
+        )  # type: ignore
+        self.assertEqual(response.status_code, 205)
+        # Its replies go with it
+        self.assertFalse(await Comment.objects.filter(parent=self.comment1).aexists())
+        self.assertEqual(await Comment.objects.filter(post=self.post).acount(), 2)
+        await self.comment1.arefresh_from_db()
+        self.assertEqual(self.comment1.reply_count, 0)
+
+    async def test_query_budgets(self):
+        auth = {"Authorization": f"Bearer {self.token_user1}"}
+        payload = {"content": "Budget", "post_id": self.post.pk}
+        reply = {**payload, "parent_id": self.comment2.pk}
+        routes = [
+            ("get", f"/?post={self.post.pk}", {}, 2),
+            ("get", f"/cursor?post={self.post.pk}", {}, 1),
+            ("get", "/search?q=comment", {}, 1),
+            ("get", f"/{self.comment1.pk}", {}, 2),
+            ("get", f"/thread?post={self.post.pk}", {}, 2),
+            ("get", f"/{self.comment1.pk}/thread", {}, 2),
+            ("post", "/", {"headers": auth, "json": payload}, 6),
+            ("post", "/", {"headers": auth, "json": reply}, 7),
+            ("delete", f"/{self.comment1.pk}", {"headers": auth}, 7),
+        ]
+        for method, path, kwargs, budget in routes:
+            # Worst case: the token's user isn't cached yet
+            user_cache.clear()
+            with self.subTest(f"{method.upper()} {path}"), query_budget(budget):
+                response = await getattr(self.tclient, method)(path, **kwargs)
+                self.assertLess(response.status_code, 400)
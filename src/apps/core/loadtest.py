@@ -0,0 +1,378 @@
+import asyncio
+import json
+import random
+import time
+from bisect import bisect
+from collections import defaultdict
+from dataclasses import dataclass, field
+from itertools import accumulate
+from typing import Any, Callable, Optional
+from urllib.parse import urlencode
+
+# Tries per user at logging in while admission control sheds the logins
+LOGIN_ATTEMPTS = 10
+# Seconds to back off after a 503 that doesn't say with Retry-After
+DEFAULT_RETRY_AFTER = 1.0
+
+
+class PowerLaw:
+    """
+    Draws ranks 0..n-1 with probability proportional to 1 / (rank + 1) ** s,
+    so a few ranks (hot posts, popular accounts) get most of the draws.
+    """
+
+    def __init__(self, n: int, s: float, rng: random.Random) -> None:
+        self.rng = rng
+        self.cum_weights = list(accumulate((rank + 1) ** -s for rank in range(n)))
+
+    def draw(self) -> int:
+        return bisect(self.cum_weights, self.rng.random() * self.cum_weights[-1])
+
+
+@dataclass
+class Request:
+    # Name the results are grouped under, e.g. "GET /api/posts/{id}"
+    label: str
+    method: str
+    path: str
+    query: dict = field(default_factory=dict)
+    json: Any = None
+    token: Optional[str] = None
+
+
+class ASGIClient:
+    """
+    Minimal HTTP client that calls an ASGI application in-process, so a load
+    run exercises the full middleware and routing stack without a server.
+    """
+
+    def __init__(self, app, host: str = "localhost") -> None:
+        self.app = app
+        self.host = host
+
+    async def request(self, request: Request) -> tuple[int, dict[str, str], bytes]:
+        body = b"" if request.json is None else json.dumps(request.json).encode()
+        headers = [(b"host", self.host.encode())]
+        if body:
+            headers.append((b"content-type", b"application/json"))
+            headers.append((b"content-length", str(len(body)).encode()))
+        if request.token:
+            headers.append((b"authorization", f"Bearer {request.token}".encode()))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": "1.1",
+            "method": request.method,
+            "scheme": "http",
+            "path": request.path,
+            "raw_path": request.path.encode(),
+            "query_string": urlencode(request.query, doseq=True).encode(),
+            "root_path": "",
+            "headers": headers,
+            "client": ("127.0.0.1", 0),
+            "server": (self.host, 80),
+        }
+
+        status = 0
+        response_headers: dict[str, str] = {}
+        chunks: list[bytes] = []
+        finished = asyncio.Event()
+        sent_body = False
+
+        async def receive() -> dict:
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Django watches for disconnects while it responds; only hang up
+            # once the whole response has been read
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers.update(
+                    (name.decode().lower(), value.decode())
+                    for name, value in message.get("headers", [])
+                )
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    finished.set()
+
+        await self.app(scope, receive, send)
+        finished.set()
+        return status, response_headers, b"".join(chunks)
+
+
+@dataclass
+class Scenario:
+    weight: int
+    # Builds the next request for a virtual user
+    build: Callable[["LoadRunner", random.Random, dict], Request]
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(q / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class LoadRunner:
+    """
+    Drives weighted scenarios against the API from `concurrency` virtual
+    users for `duration` seconds and aggregates latency per endpoint label.
+    """
+
+    def __init__(
+        self,
+        client: ASGIClient,
+        users: list[dict],
+        post_ids: list[int],
+        search_terms: list[str],
+        scenarios: list[Scenario],
+        skew: float = 1.1,
+        seed: int = 42,
+    ) -> None:
+        self.client = client
+        self.users = users
+        # post_ids is ordered hottest first
+        self.post_ids = post_ids
+        self.hot_posts = PowerLaw(len(post_ids), skew, random.Random(seed))
+        self.search_terms = search_terms
+        self.scenarios = scenarios
+        self.cum_weights = list(accumulate(s.weight for s in scenarios))
+        self.seed = seed
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.recording = False
+
+    def hot_post(self) -> int:
+        return self.post_ids[self.hot_posts.draw()]
+
+    async def call(self, request: Request) -> tuple[int, bytes]:
+        start = time.perf_counter()
+        status, headers, body = await self.client.request(request)
+        elapsed = (time.perf_counter() - start) * 1000
+        if self.recording:
+            self.latencies[request.label].append(elapsed)
+            self.statuses[request.label][status] += 1
+        if status == 503:
+            # Back off like a well-behaved client when load is shed
+            await asyncio.sleep(float(headers.get("retry-after", DEFAULT_RETRY_AFTER)))
+        return status, body
+
+    async def login(self, user: dict) -> None:
+        request = Request(
+            "POST /api/token/pair",
+            "POST",
+            "/api/token/pair",
+            json={"username": user["username"], "password": user["password"]},
+        )
+        # Logging everyone in at once may be shed by admission control
+        for _ in range(LOGIN_ATTEMPTS):
+            status, body = await self.call(request)
+            if status != 503:
+                break
+        if status != 200:
+            raise RuntimeError(f"Could not log in as {user['username']}: {status}")
+        user["token"] = json.loads(body)["access"]
+
+    async def worker(self, index: int, deadline: float) -> None:
+        rng = random.Random(self.seed + index)
+        user = self.users[index % len(self.users)]
+        while time.perf_counter() < deadline:
+            scenario = rng.choices(self.scenarios, cum_weights=self.cum_weights)[0]
+            await self.call(scenario.build(self, rng, user))
+
+    async def run(self, duration: float, concurrency: int, warmup: float) -> dict:
+        await asyncio.gather(*(self.login(user) for user in self.users))
+
+        start = time.perf_counter()
+        deadline = start + warmup + duration
+
+        async def start_recording() -> None:
+            await asyncio.sleep(warmup)
+            self.recording = True
+
+        recorder = asyncio.ensure_future(start_recording())
+        await asyncio.gather(*(self.worker(i, deadline) for i in range(concurrency)))
+        await recorder
+        return self.report(duration, concurrency, warmup)
+
+    def report(self, duration: float, concurrency: int, warmup: float) -> dict:
+        endpoints = {}
+        for label, latencies in sorted(self.latencies.items()):
+            latencies.sort()
+            statuses = self.statuses[label]
+            endpoints[label] = {
+                "requests": len(latencies),
+                "errors": sum(n for status, n in statuses.items() if status >= 400),
+                "throughput_rps": round(len(latencies) / duration, 2),
+                "latency_ms": {
+                    "mean": round(sum(latencies) / len(latencies), 2),
+                    "p50": round(percentile(latencies, 50), 2),
+                    "p95": round(percentile(latencies, 95), 2),
+                    "p99": round(percentile(latencies, 99), 2),
+                    "max": round(latencies[-1], 2),
+                },
+                "statuses": {str(s): n for s, n in sorted(statuses.items())},
+            }
+        total = sum(e["requests"] for e in endpoints.values())
+        return {
+            "config": {
+                "duration_s": duration,
+                "warmup_s": warmup,
+                "concurrency": concurrency,
+                "users": len(self.users),
+                "seed": self.seed,
+            },
+            "total": {
+                "requests": total,
+                "errors": sum(e["errors"] for e in endpoints.values()),
+                "throughput_rps": round(total / duration, 2),
+            },
+            "endpoints": endpoints,
+        }
+
+
+# Default request mix over every router, weighted to a read-heavy feed app
+
+
+def _list_posts(runner, rng, user):
+    return Request(
+        "GET /api/posts/cursor",
+        "GET",
+        "/api/posts/cursor",
+        {"enriched": "true"},
+        token=user["token"],
+    )
+
+
+def _timeline(runner, rng, user):
+    return Request(
+        "GET /api/posts/timeline", "GET", "/api/posts/timeline", token=user["token"]
+    )
+
+
+def _get_post(runner, rng, user):
+    return Request(
+        "GET /api/posts/{id}",
+        "GET",
+        f"/api/posts/{runner.hot_post()}",
+        token=user["token"],
+    )
+
+
+def _search_posts(runner, rng, user):
+    return Request(
+        "GET /api/posts/search",
+        "GET",
+        "/api/posts/search",
+        {"q": rng.choice(runner.search_terms)},
+    )
+
+
+def _create_post(runner, rng, user):
+    return Request(
+        "POST /api/posts/",
+        "POST",
+        "/api/posts/",
+        json={"content": f"Load test post {rng.getrandbits(32)}"},
+        token=user["token"],
+    )
+
+
+def _list_comments(runner, rng, user):
+    return Request(
+        "GET /api/comments/cursor",
+        "GET",
+        "/api/comments/cursor",
+        {"post": runner.hot_post()},
+    )
+
+
+def _create_comment(runner, rng, user):
+    return Request(
+        "POST /api/comments/",
+        "POST",
+        "/api/comments/",
+        json={"content": "Load test comment", "post_id": runner.hot_post()},
+        token=user["token"],
+    )
+
+
+def _react(runner, rng, user):
+    return Request(
+        "POST /api/reactions/",
+        "POST",
+        "/api/reactions/",
+        json={
+            "post_id": runner.hot_post(),
+            "reaction_type": "like" if rng.random() < 0.8 else "dislike",
+        },
+        token=user["token"],
+    )
+
+
+def _reaction_counts(runner, rng, user):
+    ids = {runner.hot_post() for _ in range(20)}
+    return Request(
+        "GET /api/reactions/posts/counts",
+        "GET",
+        "/api/reactions/posts/counts",
+        {"ids": sorted(ids)},
+    )
+
+
+def _my_profile(runner, rng, user):
+    return Request(
+        "GET /api/accounts/me", "GET", "/api/accounts/me", token=user["token"]
+    )
+
+
+def _public_profile(runner, rng, user):
+    other = rng.choice(runner.users)["username"]
+    return Request("GET /api/accounts/{username}", "GET", f"/api/accounts/{other}")
+
+
+def _token(runner, rng, user):
+    return Request(
+        "POST /api/token/pair",
+        "POST",
+        "/api/token/pair",
+        json={"username": user["username"], "password": user["password"]},
+    )
+
+
+def _checkhealth(runner, rng, user):
+    return Request("GET /api/", "GET", "/api/")
+
+
+DEFAULT_SCENARIOS = [
+    Scenario(15, _timeline),
+    Scenario(10, _list_posts),
+    Scenario(10, _get_post),
+    Scenario(3, _search_posts),
+    Scenario(3, _create_post),
+    Scenario(8, _list_comments),
+    Scenario(2, _create_comment),
+    Scenario(5, _react),
+    Scenario(5, _reaction_counts),
+    Scenario(3, _my_profile),
+    Scenario(3, _public_profile),
+    Scenario(1, _token),
+]
+
+# Logins next to a request that does no work, whose latency shows how long
+# the logins keep the event loop busy
+LOGIN_SCENARIOS = [
+    Scenario(1, _token),
+    Scenario(1, _checkhealth),
+]
+
+SCENARIOS = {"default": DEFAULT_SCENARIOS, "login": LOGIN_SCENARIOS}
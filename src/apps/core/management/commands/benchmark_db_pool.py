@@ -0,0 +1,80 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Settings are read once per process, so each mode runs `loadtest` in its own
+MODES = {"direct": "false", "pooled": "true"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run `loadtest` once with a new database connection per request and "
+        "once through the psycopg connection pool, and compare throughput and "
+        "p50/p95/p99 latency per endpoint. Needs the data created by "
+        "`seed_data`; run it against a dedicated database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--duration", type=float, default=30, help="Measured seconds per mode."
+        )
+        parser.add_argument("--warmup", type=float, default=5)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--users", type=int, default=32)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--output", help="Also write both loadtest reports here as JSON."
+        )
+
+    def handle(self, *args, **options):
+        reports = {
+            mode: self.run_loadtest(pool, options) for mode, pool in MODES.items()
+        }
+        self.stdout.write(self.compare(reports["direct"], reports["pooled"]))
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(json.dumps(reports, indent=2, sort_keys=True) + "\n")
+
+    def run_loadtest(self, pool: str, options: dict) -> dict:
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / "report.json"
+            command = [
+                sys.executable,
+                str(settings.BASE_DIR / "manage.py"),
+                "loadtest",
+                f"--duration={options['duration']}",
+                f"--warmup={options['warmup']}",
+                f"--concurrency={options['concurrency']}",
+                f"--users={options['users']}",
+                f"--seed={options['seed']}",
+                f"--output={output}",
+            ]
+            result = subprocess.run(command, env={**os.environ, "DATABASE_POOL": pool})
+            if result.returncode:
+                raise CommandError(f"loadtest with DATABASE_POOL={pool} failed")
+            return json.loads(output.read_text())
+
+    def compare(self, direct: dict, pooled: dict) -> str:
+        lines = [
+            f"{'':40} {'direct':>10} {'pooled':>10}",
+            f"{'total req/s':40} {direct['total']['throughput_rps']:>10} "
+            f"{pooled['total']['throughput_rps']:>10}",
+            f"{'total errors':40} {direct['total']['errors']:>10} "
+            f"{pooled['total']['errors']:>10}",
+        ]
+        for label, before in direct["endpoints"].items():
+            after = pooled["endpoints"].get(label)
+            if after is None:
+                continue
+            for q in ("p50", "p95", "p99"):
+                lines.append(
+                    f"{label + ' ' + q + ' ms':40} {before['latency_ms'][q]:>10} "
+                    f"{after['latency_ms'][q]:>10}"
+                )
+        return "\n".join(lines)
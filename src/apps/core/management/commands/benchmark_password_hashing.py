@@ -0,0 +1,100 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+LOGIN = "POST /api/token/pair"
+HEALTH = "GET /api/"
+
+
+class Command(BaseCommand):
+    help = (
+        "Run `loadtest --scenarios login` once hashing passwords on the event "
+        "loop and once in the password hashing process pool, and compare the "
+        "login throughput of the worker and the p50/p95/p99 latency of logins "
+        "and of a health check served next to them. Needs the data created by "
+        "`seed_data`. Admission control is off so no request is shed; hashers "
+        "are taken from PASSWORD_HASHERS as usual."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--duration", type=float, default=30, help="Measured seconds per mode."
+        )
+        parser.add_argument("--warmup", type=float, default=5)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--users", type=int, default=32)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.PASSWORD_HASHING_WORKERS or 2,
+            help="Hashing processes of the pooled mode.",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--output", help="Also write both loadtest reports here as JSON."
+        )
+
+    def handle(self, *args, **options):
+        # Settings are read once per process, so each mode runs in its own
+        modes = {"event loop": 0, "pool": options["workers"]}
+        reports = {
+            mode: self.run_loadtest(workers, options) for mode, workers in modes.items()
+        }
+        self.stdout.write(self.compare(reports["event loop"], reports["pool"]))
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(json.dumps(reports, indent=2, sort_keys=True) + "\n")
+
+    def run_loadtest(self, workers: int, options: dict) -> dict:
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / "report.json"
+            command = [
+                sys.executable,
+                str(settings.BASE_DIR / "manage.py"),
+                "loadtest",
+                "--scenarios=login",
+                f"--duration={options['duration']}",
+                f"--warmup={options['warmup']}",
+                f"--concurrency={options['concurrency']}",
+                f"--users={options['users']}",
+                f"--seed={options['seed']}",
+                f"--output={output}",
+            ]
+            env = {
+                **os.environ,
+                "PASSWORD_HASHING_WORKERS": str(workers),
+                "ADMISSION_CONTROL": "false",
+            }
+            result = subprocess.run(command, env=env)
+            if result.returncode:
+                raise CommandError(
+                    f"loadtest with PASSWORD_HASHING_WORKERS={workers} failed"
+                )
+            return json.loads(output.read_text())
+
+    def compare(self, inline: dict, pooled: dict) -> str:
+        lines = [f"{'':40} {'loop':>10} {'pool':>10}"]
+        for label, name in ((LOGIN, "logins"), (HEALTH, "health checks")):
+            before = inline["endpoints"].get(label)
+            after = pooled["endpoints"].get(label)
+            if before is None or after is None:
+                continue
+            lines.append(
+                f"{name + ' req/s':40} {before['throughput_rps']:>10} "
+                f"{after['throughput_rps']:>10}"
+            )
+            lines.append(
+                f"{name + ' errors':40} {before['errors']:>10} {after['errors']:>10}"
+            )
+            for q in ("p50", "p95", "p99"):
+                lines.append(
+                    f"{name + ' ' + q + ' ms':40} {before['latency_ms'][q]:>10} "
+                    f"{after['latency_ms'][q]:>10}"
+                )
+        return "\n".join(lines)
@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.loadtest import SCENARIOS, ASGIClient, LoadRunner
+from core.management.commands.seed_data import DEFAULT_PASSWORD, USERNAME_PREFIX
+from posts.models import Post
+
+SEARCH_TERMS = ["coffee", "music", "python django", "weekend trip", "sunset"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the accounts, posts, comments, reactions and token routers "
+        "through the ASGI application with users created by `seed_data`, and "
+        "report per-endpoint throughput and p50/p95/p99 latency as JSON. "
+        "Requests are made in-process, so run it against a dedicated database: "
+        "it creates posts, comments and reactions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--duration", type=float, default=30, help="Measured seconds (default: 30)."
+        )
+        parser.add_argument(
+            "--warmup",
+            type=float,
+            default=5,
+            help="Seconds run before measuring starts (default: 5).",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=32,
+            help="Concurrent virtual users (default: 32).",
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=32,
+            help="Seeded accounts the virtual users log in as (default: 32).",
+        )
+        parser.add_argument(
+            "--hot-posts",
+            type=int,
+            default=10_000,
+            help="Most-liked posts the requests target, power-law skewed.",
+        )
+        parser.add_argument(
+            "--scenarios",
+            choices=SCENARIOS,
+            default="default",
+            help="Request mix: every router, or logins only (default: default).",
+        )
+        parser.add_argument("--skew", type=float, default=1.1)
+        parser.add_argument("--password", default=DEFAULT_PASSWORD)
+        parser.add_argument("--seed", type=int, default=42, help="Random seed.")
+        parser.add_argument(
+            "--output", help="Write the JSON report here instead of stdout."
+        )
+
+    def handle(self, *args, **options):
+        # Imported here, it builds the whole Django application
+        from murmur.asgi import application
+
+        usernames = list(
+            User.objects.filter(username__startswith=USERNAME_PREFIX)
+            .order_by("pk")
+            .values_list("username", flat=True)[: options["users"]]
+        )
+        post_ids = list(
+            Post.objects.order_by("-like_count", "-id").values_list("pk", flat=True)[
+                : options["hot_posts"]
+            ]
+        )
+        if not usernames or not post_ids:
+            raise CommandError("No seeded data found, run `manage.py seed_data` first")
+
+        hosts = [host for host in settings.ALLOWED_HOSTS if "*" not in host]
+        client = ASGIClient(application, host=hosts[0] if hosts else "localhost")
+        runner = LoadRunner(
+            client,
+            users=[
+                {"username": username, "password": options["password"]}
+                for username in usernames
+            ],
+            post_ids=post_ids,
+            search_terms=SEARCH_TERMS,
+            scenarios=SCENARIOS[options["scenarios"]],
+            skew=options["skew"],
+            seed=options["seed"],
+        )
+        report = asyncio.run(
+            runner.run(options["duration"], options["concurrency"], options["warmup"])
+        )
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{report['total']['requests']} requests, "
+                    f"{report['total']['throughput_rps']} req/s, "
+                    f"{report['total']['errors']} errors: {options['output']}"
+                )
+            )
+        else:
+            self.stdout.write(output)
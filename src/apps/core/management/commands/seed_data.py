@@ -0,0 +1,305 @@
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.models import Follow, Profile
+from comments.models import Comment
+from core.loadtest import PowerLaw
+from posts.models import Post, TimelineEntry
+from reactions.models import Reaction, ReactionType
+
+# Every seeded account is named USERNAME_PREFIX + index, so runs can be
+# cleared and the load runner can log in as them
+USERNAME_PREFIX = "load_user_"
+DEFAULT_PASSWORD = "load-test-password"
+
+WORDS = (
+    "the a to of and in is it you that for on was with this my so but just "
+    "have not be are at me what all like about today love time good new day "
+    "people really know think going great work week home game music coffee "
+    "morning night weekend friends team city movie book photo trip food "
+    "python django release bug deploy weather rain sunset concert football"
+).split()
+
+FOLLOW_COUNTERS_SQL = """
+UPDATE {profile_table} p SET
+    followers_count = (SELECT count(*) FROM {follow_table} WHERE followee_id = p.user_id),
+    following_count = (SELECT count(*) FROM {follow_table} WHERE follower_id = p.user_id)
+WHERE p.user_id = ANY(%(user_ids)s)
+"""
+
+# Materialize the timelines following would have backfilled: the newest
+# TIMELINE_BACKFILL_SIZE posts of every followed author that is fanned out
+# on write (at most TIMELINE_FANOUT_MAX_FOLLOWERS followers)
+TIMELINES_SQL = """
+INSERT INTO {timeline_table} (owner_id, post_id, created_at)
+SELECT f.follower_id, p.id, p.created_at
+FROM {follow_table} f
+JOIN {profile_table} pr ON pr.user_id = f.followee_id
+CROSS JOIN LATERAL (
+    SELECT id, created_at FROM {post_table}
+    WHERE author_id = f.followee_id
+    ORDER BY created_at DESC
+    LIMIT %(backfill)s
+) p
+WHERE f.follower_id = ANY(%(user_ids)s) AND pr.followers_count <= %(max_followers)s
+ON CONFLICT DO NOTHING
+"""
+
+# `created_at` is auto_now_add, so bulk_create stamps now(); the spread-out
+# timestamps are written afterwards, one VALUES list per batch
+CREATED_AT_SQL = """
+UPDATE {table} t SET created_at = v.created_at
+FROM (VALUES {values}) AS v (id, created_at)
+WHERE t.id = v.id
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a load-test dataset: users, follows, posts, comments and "
+        "reactions, with power-law skew on popular accounts and hot posts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1_000)
+        parser.add_argument("--posts", type=int, default=20_000)
+        parser.add_argument("--comments", type=int, default=50_000)
+        parser.add_argument("--reactions", type=int, default=100_000)
+        parser.add_argument(
+            "--follows-per-user",
+            type=int,
+            default=20,
+            help="Accounts each user follows, skewed to popular ones (default: 20).",
+        )
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=1.1,
+            help="Power-law exponent of account and post popularity (default: 1.1).",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=30,
+            help="Spread post and comment timestamps over this many days.",
+        )
+        parser.add_argument("--password", default=DEFAULT_PASSWORD)
+        parser.add_argument("--seed", type=int, default=42, help="Random seed.")
+        parser.add_argument("--batch-size", type=int, default=5_000)
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete previously seeded users (and all their data) first.",
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.now = timezone.now()
+        self.span = timedelta(days=options["days"]).total_seconds()
+
+        if options["clear"]:
+            deleted, _ = User.objects.filter(
+                username__startswith=USERNAME_PREFIX
+            ).delete()
+            self.stdout.write(f"Deleted {deleted} seeded rows")
+
+        user_ids = self.seed_users(options["users"], options["password"])
+        # Popularity ranks: user_ids[0] is the most followed and most active
+        popular_users = PowerLaw(len(user_ids), options["skew"], self.rng)
+        self.seed_follows(user_ids, popular_users, options["follows_per_user"])
+        post_ids = self.seed_posts(user_ids, popular_users, options["posts"])
+
+        # Hot posts are spread over time, not just the newest ones
+        hot_post_ids = post_ids[:]
+        self.rng.shuffle(hot_post_ids)
+        hot_posts = PowerLaw(len(hot_post_ids), options["skew"], self.rng)
+        self.seed_comments(user_ids, hot_post_ids, hot_posts, options["comments"])
+        reactions = self.seed_reactions(
+            user_ids, hot_post_ids, hot_posts, options["reactions"]
+        )
+
+        self.stdout.write("Rebuilding counters and timelines")
+        call_command("rebuild_reaction_counts", batch_size=10_000, stdout=self.stdout)
+        call_command("rebuild_trending_scores", batch_size=10_000, stdout=self.stdout)
+        self.rebuild_follow_graph(user_ids)
+        with connection.cursor() as cursor:
+            for model in (User, Follow, Post, Comment, Reaction, TimelineEntry):
+                cursor.execute(f"ANALYZE {model._meta.db_table}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {len(user_ids)} users, {len(post_ids)} posts, "
+                f"{options['comments']} comments and {reactions} reactions"
+            )
+        )
+
+    def _timestamp(self):
+        return self.now - timedelta(seconds=self.rng.random() * self.span)
+
+    def _text(self, min_words: int, max_words: int) -> str:
+        words = self.rng.choices(WORDS, k=self.rng.randint(min_words, max_words))
+        return " ".join(words).capitalize()[:280]
+
+    def _insert(self, model, objs) -> list:
+        return model.objects.bulk_create(objs, batch_size=self.batch_size)
+
+    def _set_created_at(self, model, ids: list[int], timestamps: list) -> None:
+        rows = list(zip(ids, timestamps))
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start : start + self.batch_size]
+                cursor.execute(
+                    CREATED_AT_SQL.format(
+                        table=model._meta.db_table,
+                        values=", ".join(
+                            ["(%s::bigint, %s::timestamptz)"] * len(batch)
+                        ),
+                    ),
+                    [param for row in batch for param in row],
+                )
+
+    def seed_users(self, count: int, password: str) -> list[int]:
+        start = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+        # Hash once, PBKDF2 on every row would dominate the run
+        password_hash = make_password(password)
+        users = self._insert(
+            User,
+            (
+                User(
+                    username=f"{USERNAME_PREFIX}{i}",
+                    email=f"{USERNAME_PREFIX}{i}@example.com",
+                    first_name="Load",
+                    last_name=f"User {i}",
+                    password=password_hash,
+                )
+                for i in range(start, start + count)
+            ),
+        )
+        # bulk_create skips the post_save signal that creates profiles
+        self._insert(
+            Profile, (Profile(user_id=user.pk, bio=self._text(3, 10)) for user in users)
+        )
+        self.stdout.write(f"Seeded {len(users)} users")
+        return [user.pk for user in users]
+
+    def seed_follows(
+        self, user_ids: list[int], popular_users: PowerLaw, per_user: int
+    ) -> None:
+        per_user = min(per_user, len(user_ids) - 1)
+        follows = []
+        for follower_id in user_ids:
+            followees = set()
+            # Bounded retries, the most popular ranks collide often
+            for _ in range(per_user * 4):
+                if len(followees) == per_user:
+                    break
+                followee_id = user_ids[popular_users.draw()]
+                if followee_id != follower_id:
+                    followees.add(followee_id)
+            follows.extend(
+                Follow(follower_id=follower_id, followee_id=followee_id)
+                for followee_id in followees
+            )
+        self._insert(Follow, follows)
+        self.stdout.write(f"Seeded {len(follows)} follows")
+
+    def seed_posts(
+        self, user_ids: list[int], popular_users: PowerLaw, count: int
+    ) -> list[int]:
+        timestamps = sorted(self._timestamp() for _ in range(count))
+        posts = self._insert(
+            Post,
+            (
+                Post(
+                    content=self._text(5, 30),
+                    author_id=user_ids[popular_users.draw()],
+                )
+                for _ in timestamps
+            ),
+        )
+        post_ids = [post.pk for post in posts]
+        self._set_created_at(Post, post_ids, timestamps)
+        self.stdout.write(f"Seeded {len(posts)} posts")
+        return post_ids
+
+    def seed_comments(
+        self,
+        user_ids: list[int],
+        hot_post_ids: list[int],
+        hot_posts: PowerLaw,
+        count: int,
+    ) -> None:
+        comments = self._insert(
+            Comment,
+            (
+                Comment(
+                    content=self._text(3, 20),
+                    author_id=self.rng.choice(user_ids),
+                    post_id=hot_post_ids[hot_posts.draw()],
+                )
+                for _ in range(count)
+            ),
+        )
+        self._set_created_at(
+            Comment,
+            [comment.pk for comment in comments],
+            [self._timestamp() for _ in comments],
+        )
+        self.stdout.write(f"Seeded {count} comments")
+
+    def seed_reactions(
+        self,
+        user_ids: list[int],
+        hot_post_ids: list[int],
+        hot_posts: PowerLaw,
+        count: int,
+    ) -> int:
+        # (user, post) is unique, so duplicate draws are dropped. Bounded
+        # retries, in case `count` is close to what the dataset can hold
+        pairs: set[tuple[int, int]] = set()
+        for _ in range(count * 10):
+            if len(pairs) == count:
+                break
+            pairs.add((self.rng.choice(user_ids), hot_post_ids[hot_posts.draw()]))
+        self._insert(
+            Reaction,
+            (
+                Reaction(
+                    user_id=user_id,
+                    post_id=post_id,
+                    reaction_type=(
+                        ReactionType.LIKE
+                        if self.rng.random() < 0.8
+                        else ReactionType.DISLIKE
+                    ),
+                )
+                for user_id, post_id in pairs
+            ),
+        )
+        self.stdout.write(f"Seeded {len(pairs)} reactions")
+        return len(pairs)
+
+    def rebuild_follow_graph(self, user_ids: list[int]) -> None:
+        tables = {
+            "profile_table": Profile._meta.db_table,
+            "follow_table": Follow._meta.db_table,
+            "post_table": Post._meta.db_table,
+            "timeline_table": TimelineEntry._meta.db_table,
+        }
+        params = {
+            "user_ids": user_ids,
+            "max_followers": settings.TIMELINE_FANOUT_MAX_FOLLOWERS,
+            "backfill": settings.TIMELINE_BACKFILL_SIZE,
+        }
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(FOLLOW_COUNTERS_SQL.format(**tables), params)
+            cursor.execute(TIMELINES_SQL.format(**tables), params)
@@ -0,0 +1,722 @@
+import asyncio
+import json
+import threading
+from datetime import timedelta
+from io import StringIO
+from itertools import combinations
+from tempfile import NamedTemporaryFile
+from types import SimpleNamespace
+from unittest import skipUnless
+from unittest.mock import AsyncMock, patch
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count, Min, Sum
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.utils import timezone
+from ninja.conf import settings as ninja_settings
+from ninja_jwt.tokens import RefreshToken
+from murmur import admission, querycache
+from murmur.instrumentation import track_queries
+from murmur.metrics import Histogram, REGISTRY
+from murmur.pagination import CursorPagination
+from murmur.tasks import (
+    close_connections,
+    run_in_background,
+    wait_for_background_tasks,
+)
+from murmur.testing import (
+    pooled_connections_in_use,
+    query_budget,
+    query_plan_problems,
+    run_like_a_server,
+)
+
+from accounts.models import Follow, Profile
+from core.loadtest import (
+    DEFAULT_RETRY_AFTER,
+    LOGIN_ATTEMPTS,
+    ASGIClient,
+    LoadRunner,
+    Request,
+)
+from comments.models import Comment
+from comments.schemas import CommentFilter
+from comments.services import CommentService
+from posts.models import Post, TimelineEntry
+from posts.schemas import PostFilter
+from posts.services import PostService
+from posts.trending import TrendingPosts, trending_posts
+from reactions.models import Reaction, ReactionType
+from reactions.schemas import ReactionFilter
+from reactions.services import ReactionService
+
+# Build the project API before the per-app tests attach their routers to
+# test clients, which would make building it later fail
+import murmur.urls  # noqa: F401
+
+
+class LoadTestHarnessTest(TransactionTestCase):
+    def setUp(self) -> None:
+        call_command(
+            "seed_data",
+            users=8,
+            posts=60,
+            comments=40,
+            reactions=100,
+            follows_per_user=3,
+            stdout=StringIO(),
+        )
+
+    def test_seed_data(self):
+        self.assertEqual(User.objects.count(), 8)
+        self.assertEqual(Profile.objects.count(), 8)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertEqual(Reaction.objects.count(), 100)
+        self.assertEqual(Follow.objects.count(), 24)
+        self.assertTrue(TimelineEntry.objects.exists())
+
+        # Denormalized counters match the seeded rows
+        totals = Post.objects.aggregate(likes=Sum("like_count"))
+        self.assertEqual(
+            totals["likes"],
+            Reaction.objects.filter(reaction_type=ReactionType.LIKE).count(),
+        )
+        self.assertEqual(
+            Profile.objects.aggregate(total=Sum("followers_count"))["total"], 24
+        )
+
+        # Timestamps are spread over --days, without touching auto_now_add
+        for model in (Post, Comment):
+            oldest = model.objects.aggregate(oldest=Min("created_at"))["oldest"]
+            self.assertLess(oldest, timezone.now() - timedelta(days=1))
+            self.assertTrue(model._meta.get_field("created_at").auto_now_add)
+
+    def test_loadtest_report(self):
+        with NamedTemporaryFile(suffix=".json") as output:
+            call_command(
+                "loadtest",
+                duration=1,
+                warmup=0,
+                concurrency=2,
+                users=2,
+                output=output.name,
+                stdout=StringIO(),
+            )
+            report = json.load(output)
+
+        self.assertGreater(report["total"]["requests"], 0)
+        self.assertEqual(report["total"]["errors"], 0)
+        for endpoint in report["endpoints"].values():
+            self.assertLessEqual(
+                endpoint["latency_ms"]["p50"], endpoint["latency_ms"]["p99"]
+            )
+
+
+class LoadRunnerTest(SimpleTestCase):
+    async def test_login_gives_up_while_shed(self):
+        client = SimpleNamespace(request=AsyncMock(return_value=(503, {}, b"")))
+        runner = LoadRunner(client, [], [], [], [])  # type: ignore
+
+        with patch("core.loadtest.asyncio.sleep") as sleep:
+            with self.assertRaises(RuntimeError):
+                await runner.login({"username": "shed", "password": "x"})
+        self.assertEqual(client.request.await_count, LOGIN_ATTEMPTS)
+        # No Retry-After, backed off all the same
+        sleep.assert_awaited_with(DEFAULT_RETRY_AFTER)
+
+
+def busiest(queryset, field: str):
+    """The value of `field` with the most rows, the worst case for a filter."""
+    return (
+        queryset.values(field)
+        .annotate(rows=Count("pk"))
+        .order_by("-rows")
+        .values_list(field, flat=True)[0]
+    )
+
+
+class QueryPlanTest(TestCase):
+    """
+    EXPLAIN ANALYZE the page queries of every list endpoint, for every
+    combination of its filters, against a seeded database. Filters take
+    their busiest value (the most prolific author, the hottest post...),
+    which is where a missing index turns into a large scan or sort.
+    COUNT(*) of the offset-paginated lists is inherently a full range scan
+    and isn't checked.
+    """
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        call_command(
+            "seed_data",
+            users=200,
+            posts=10_000,
+            comments=10_000,
+            reactions=20_000,
+            follows_per_user=10,
+            stdout=StringIO(),
+        )
+        user = User.objects.get(pk=busiest(Reaction.objects.all(), "user"))
+        cls.request = SimpleNamespace(auth=user)
+        follower = User.objects.get(pk=busiest(Follow.objects.all(), "follower"))
+        cls.follower_request = SimpleNamespace(auth=follower)
+        week_ago = timezone.now() - timedelta(days=7)
+        cls.filters = {
+            PostFilter: {
+                "author": busiest(Post.objects.all(), "author"),
+                "created_after": week_ago,
+            },
+            CommentFilter: {
+                "post": busiest(Comment.objects.all(), "post"),
+                "author": busiest(Comment.objects.all(), "author"),
+                "parent": Comment.objects.values_list("pk", flat=True)[0],
+                "top_level": True,
+                "created_after": week_ago,
+            },
+            ReactionFilter: {
+                "post": busiest(Reaction.objects.all(), "post"),
+                "user": user.pk,
+                "reaction_type": ReactionType.DISLIKE,
+                "created_after": week_ago,
+            },
+        }
+
+    def combinations(self, schema) -> list:
+        values = self.filters[schema]
+        return [
+            schema(**{name: values[name] for name in names})
+            for size in range(len(values) + 1)
+            for names in combinations(values, size)
+        ]
+
+    async def pages(self, queryset) -> list:
+        """The page queries a list endpoint runs for `queryset`."""
+        pagination = CursorPagination()
+        first, _ = pagination._window(queryset, CursorPagination.Input(limit=20))
+        rows = [row async for row in first]
+        cursor = pagination.encode_cursor(rows[-1], False) if rows else None
+        second, _ = pagination._window(
+            queryset, CursorPagination.Input(cursor=cursor, limit=20)
+        )
+        offset = queryset[: ninja_settings.PAGINATION_PER_PAGE]
+        return [("cursor", first), ("next page", second), ("offset", offset)]
+
+    async def assertScalablePlans(self, label: str, queryset) -> None:
+        for page, query in await self.pages(queryset):
+            with self.subTest(f"{label}, {page}"):
+                self.assertEqual(await query_plan_problems(query), [], str(query.query))
+
+    async def test_post_lists(self):
+        for filters in self.combinations(PostFilter):
+            for enriched in (False, True):
+                posts = await PostService.get_all(self.request, filters, enriched)
+                label = f"posts {filters.model_dump(exclude_none=True)}"
+                await self.assertScalablePlans(f"{label}, enriched={enriched}", posts)
+
+    async def test_comment_lists(self):
+        for filters in self.combinations(CommentFilter):
+            comments = await CommentService.get_all(self.request, filters)
+            label = f"comments {filters.model_dump(exclude_none=True)}"
+            await self.assertScalablePlans(label, comments)
+
+    async def test_reaction_lists(self):
+        for filters in self.combinations(ReactionFilter):
+            reactions = await ReactionService.get_all(self.request, filters)
+            label = f"reactions {filters.model_dump(exclude_none=True)}"
+            await self.assertScalablePlans(label, reactions)
+
+    async def test_timeline(self):
+        for source in await PostService.get_timeline(self.follower_request):
+            pagination = CursorPagination(ordering=("-feed_at", "-id"))
+            window, _ = pagination._window(source, CursorPagination.Input(limit=20))
+            with self.subTest(str(source.query)):
+                self.assertEqual(await query_plan_problems(window), [])
+
+    async def test_trending(self):
+        with self.subTest("top-K snapshot"):
+            self.assertEqual(await query_plan_problems(trending_posts.ranked()), [])
+        trending_posts.clear()
+        for enriched in (False, True):
+            posts = await PostService.get_trending(self.request, enriched)
+            offset = posts[: ninja_settings.PAGINATION_PER_PAGE]
+            with self.subTest(f"page, enriched={enriched}"):
+                self.assertEqual(await query_plan_problems(offset), [])
+
+
+class QuerysetCacheTest(TestCase):
+    def setUp(self) -> None:
+        querycache.clear()
+        self.user = User.objects.create_user(username="reader")
+        self.posts = [
+            Post.objects.create(content=f"Post {i}", author=self.user) for i in range(2)
+        ]
+        for post in self.posts:
+            Comment.objects.create(content="First", author=self.user, post=post)
+        self.auth = {
+            "Authorization": f"Bearer {RefreshToken.for_user(self.user).access_token}"
+        }
+
+    async def get(self, path: str, queries: int) -> dict:
+        with query_budget(queries) as budget:
+            response = await self.async_client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(budget.stats.count, queries, path)
+        return response.json()
+
+    async def post(self, path: str, data: dict) -> None:
+        response = await self.async_client.post(
+            path, data, content_type="application/json", headers=self.auth
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+
+    async def test_pages_are_cached_until_a_write(self):
+        await self.get("/api/posts/?limit=1", 2)
+        page = await self.get("/api/posts/?limit=1", 0)
+        self.assertEqual(page["count"], 2)
+        # Another page is another entry
+        await self.get("/api/posts/?limit=1&offset=1", 2)
+        await self.get("/api/posts/cursor?limit=1", 1)
+
+        await self.post("/api/posts/", {"content": "New"})
+        page = await self.get("/api/posts/?limit=1", 2)
+        self.assertEqual((page["count"], page["items"][0]["content"]), (3, "New"))
+
+    async def test_lists_of_a_post_are_invalidated_on_their_own(self):
+        first, second = self.posts
+        await self.get(f"/api/comments/?post={first.pk}", 2)
+        await self.get(f"/api/comments/?post={second.pk}", 2)
+        await self.get("/api/comments/", 2)
+
+        await self.post("/api/comments/", {"post_id": first.pk, "content": "Again"})
+        page = await self.get(f"/api/comments/?post={first.pk}", 2)
+        self.assertEqual(page["count"], 2)
+        await self.get(f"/api/comments/?post={second.pk}", 0)
+        await self.get("/api/comments/", 2)
+
+    async def test_enriched_posts_follow_reactions(self):
+        post = self.posts[0]
+        await self.get("/api/posts/?enriched=true", 2)
+        await self.get(f"/api/reactions/?post={post.pk}", 2)
+
+        await self.post(
+            "/api/reactions/", {"post_id": post.pk, "reaction_type": "like"}
+        )
+        page = await self.get("/api/posts/?enriched=true", 2)
+        likes = {item["id"]: item["likes"] for item in page["items"]}
+        self.assertEqual(likes[post.pk], 1)
+        page = await self.get(f"/api/reactions/?post={post.pk}", 2)
+        self.assertEqual(page["count"], 1)
+        # Not a list of reactions, so still cached
+        await self.get("/api/posts/", 2)
+        await self.get("/api/posts/", 0)
+
+    async def test_deleting_a_post_invalidates_its_lists(self):
+        post = self.posts[0]
+        await self.get(f"/api/comments/?post={post.pk}", 2)
+        response = await self.async_client.delete(
+            f"/api/posts/{post.pk}", headers=self.auth
+        )
+        self.assertEqual(response.status_code, 205)
+        page = await self.get(f"/api/comments/?post={post.pk}", 2)
+        self.assertEqual(page["count"], 0)
+
+
+class QueryInstrumentationTest(TestCase):
+    def setUp(self) -> None:
+        querycache.clear()
+
+    async def test_server_timing_and_request_log(self):
+        author = await User.objects.acreate_user(username="author")
+        await Post.objects.acreate(content="Hello", author=author)
+
+        with self.assertLogs("murmur.requests", level="INFO") as logs:
+            response = await self.async_client.get("/api/posts/")
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^db;dur=[\d.]+;desc="2 queries", total;dur=[\d.]+$',
+        )
+        (record,) = logs.records
+        self.assertEqual(record.queries, 2)
+        self.assertEqual(record.path, "/api/posts/")
+        self.assertIn("queries=2", record.getMessage())
+
+
+def backend_pid() -> int:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_backend_pid()")
+        return cursor.fetchone()[0]
+
+
+class BackgroundTaskTest(TransactionTestCase):
+    def run_request(self, view) -> None:
+        """
+        Run an async `view` the way the ASGI handler does, in a context of its
+        own, then wait for the background tasks it started.
+        """
+
+        async def serve() -> None:
+            async with ThreadSensitiveContext():
+                await view()
+            await wait_for_background_tasks()
+
+        run_like_a_server(serve)
+
+    @skipUnless(settings.DATABASE_POOL, "needs the connection pool")
+    def test_tasks_outliving_their_request_return_connections(self):
+        async def count_users() -> None:
+            # Once the request is over
+            await asyncio.sleep(0.01)
+            await User.objects.acount()
+
+        async def view() -> None:
+            for _ in range(3):
+                run_in_background(count_users())
+
+        in_use = pooled_connections_in_use()
+        self.run_request(view)
+        self.assertEqual(pooled_connections_in_use(), in_use)
+
+    def test_overlapping_tasks_keep_their_connections(self):
+        User.objects.bulk_create(User(username=f"user{i}") for i in range(20))
+        seen = []
+        reader_pids = []
+        counter_pids = []
+
+        async def read_slowly() -> None:
+            reader_pids.append(await sync_to_async(backend_pid)())
+            # A server-side cursor, read a row per round trip
+            async for user in User.objects.order_by("pk").aiterator(chunk_size=1):
+                seen.append(user.username)
+                await asyncio.sleep(0.001)
+            reader_pids.append(await sync_to_async(backend_pid)())
+
+        async def count_users(delay: float) -> None:
+            await asyncio.sleep(delay)
+            counter_pids.append(await sync_to_async(backend_pid)())
+
+        async def view() -> None:
+            run_in_background(read_slowly())
+            # Short tasks ending while the cursor is still being read
+            for i in range(10):
+                run_in_background(count_users(i * 0.002))
+
+        self.run_request(view)
+        self.assertEqual(seen, [f"user{i}" for i in range(20)])
+        # Nobody closed or borrowed the reader's connection along the way
+        self.assertEqual(reader_pids[0], reader_pids[1])
+        self.assertNotIn(reader_pids[0], counter_pids)
+
+    async def test_task_queries_are_not_counted_against_the_request(self):
+        with track_queries() as stats:
+            run_in_background(User.objects.acount())
+            await wait_for_background_tasks()
+        self.assertEqual(stats.count, 0)
+
+
+@skipUnless(settings.DATABASE_POOL, "needs the connection pool")
+class DatabasePoolTest(TransactionTestCase):
+    # A trip to the database per follower, so fan-out outlives the request
+    @override_settings(TIMELINE_FANOUT_BATCH_SIZE=1)
+    def test_fan_out_after_the_request_returns_its_connection(self):
+        from murmur.asgi import application
+
+        author = User.objects.create_user(username="author")
+        followers = [User.objects.create_user(username=f"f{i}") for i in range(5)]
+        for follower in followers:
+            Follow.objects.create(follower=follower, followee=author)
+        Profile.objects.filter(user=author).update(followers_count=len(followers))
+        token = str(RefreshToken.for_user(author).access_token)
+        client = ASGIClient(application)
+        statuses = []
+
+        async def serve() -> None:
+            # More posts than the pool has connections: a leaked connection
+            # per fan-out would exhaust it
+            for i in range(
+                settings.DATABASES["default"]["OPTIONS"]["pool"]["max_size"] + 1
+            ):
+                request = Request(
+                    "POST /api/posts/",
+                    "POST",
+                    "/api/posts/",
+                    json={"content": f"Post {i}"},
+                    token=token,
+                )
+                status, _, _ = await client.request(request)
+                statuses.append(status)
+            await wait_for_background_tasks()
+
+        in_use = pooled_connections_in_use()
+        run_like_a_server(serve)
+
+        self.assertEqual(set(statuses), {201})
+        self.assertEqual(pooled_connections_in_use(), in_use)
+        self.assertEqual(TimelineEntry.objects.count(), len(followers) * len(statuses))
+
+    def test_trending_refresh_returns_its_connection(self):
+        trending = TrendingPosts(size=10, interval=0)
+        # A stale snapshot, so the next read refreshes it in the background
+        trending._ids = []
+
+        async def serve() -> None:
+            async with ThreadSensitiveContext():
+                self.assertEqual(await trending.get(), [])
+            await wait_for_background_tasks()
+
+        in_use = pooled_connections_in_use()
+        run_like_a_server(serve)
+        self.assertEqual(pooled_connections_in_use(), in_use)
+
+
+class MetricsTest(TestCase):
+    async def test_metrics_endpoint(self):
+        author = await User.objects.acreate_user(username="author")
+        await Post.objects.acreate(content="Hello", author=author)
+        await self.async_client.get("/api/posts/")
+
+        response = await self.async_client.get("/api/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            response["Content-Type"].startswith("text/plain; version=0.0.4")
+        )
+        body = response.content.decode()
+        operation = 'operation="apps_posts_apis_get_list_of_posts"'
+        self.assertRegex(
+            body,
+            rf'murmur_http_requests_total\{{{operation},status="200"\}} [1-9]',
+        )
+        self.assertIn(
+            f'murmur_http_request_duration_seconds_bucket{{{operation},status="200",le="+Inf"}}',
+            body,
+        )
+        self.assertIn(
+            f'murmur_db_queries_per_request_bucket{{{operation},le="2.0"}}', body
+        )
+        # The scrape itself is still in flight while rendering
+        self.assertIn(
+            'murmur_http_requests_in_flight{operation="murmur_api_get_metrics"} 1', body
+        )
+
+    @skipUnless(settings.DATABASE_POOL, "needs the connection pool")
+    async def test_db_pool_metrics(self):
+        await self.async_client.get("/api/posts/")
+
+        response = await self.async_client.get("/api/metrics")
+        body = response.content.decode()
+        self.assertIn(
+            f'murmur_db_pool_connections{{state="max"}} '
+            f"{settings.DATABASES['default']['OPTIONS']['pool']['max_size']}",
+            body,
+        )
+        self.assertRegex(body, r'murmur_db_pool_connections\{state="open"\} [1-9]')
+        self.assertRegex(body, r'murmur_db_pool_events_total\{event="requests"\} [1-9]')
+        self.assertIn("# TYPE murmur_db_pool_events_total counter", body)
+        self.assertRegex(body, r"murmur_db_pool_wait_seconds_total [\d.]+")
+
+    @override_settings(DATABASE_POOL=False)
+    async def test_no_db_pool_metrics_without_a_pool(self):
+        response = await self.async_client.get("/api/metrics")
+        samples = [
+            line
+            for line in response.content.decode().splitlines()
+            if line.startswith("murmur_db_pool_")
+        ]
+        self.assertEqual(samples, [])
+
+    def test_histogram_shards_are_summed(self):
+        histogram = Histogram(
+            "test_seconds", "Test histogram.", ["kind"], buckets=[1, 5]
+        )
+        REGISTRY.remove(histogram)
+        histogram.observe(0.5, "a")
+        thread = threading.Thread(target=histogram.observe, args=(3, "a"))
+        thread.start()
+        thread.join()
+        histogram.observe(7, "a")
+
+        self.assertEqual(
+            histogram.render().splitlines()[2:],
+            [
+                'test_seconds_bucket{kind="a",le="1.0"} 1',
+                'test_seconds_bucket{kind="a",le="5.0"} 2',
+                'test_seconds_bucket{kind="a",le="+Inf"} 3',
+                'test_seconds_sum{kind="a"} 10.5',
+                'test_seconds_count{kind="a"} 3',
+            ],
+        )
+
+
+@skipUnless(settings.DATABASE_POOL, "needs the connection pool")
+@override_settings(ADMISSION_QUEUE_TIMEOUT=0.05)
+class AdmissionPoolHeadroomTest(TransactionTestCase):
+    def setUp(self) -> None:
+        admission.reset()
+        self.addCleanup(admission.reset)
+
+    def test_leaves_pool_connections_to_background_tasks(self):
+        admitted = settings.ADMISSION_MAX_IN_FLIGHT
+        background = settings.BACKGROUND_TASK_MAX_CONCURRENCY
+        done = asyncio.Event()
+        holding = []
+
+        async def hold_a_connection() -> None:
+            await sync_to_async(backend_pid)()
+            holding.append(True)
+            await done.wait()
+
+        async def view(request):
+            await hold_a_connection()
+            return HttpResponse("ok")
+
+        async def get_response(request):
+            response = await middleware.process_view(request, view, (), {})
+            return response or await view(request)
+
+        middleware = admission.AdmissionControlMiddleware(get_response)
+
+        async def serve(i: int) -> int:
+            request = RequestFactory().get("/")
+            request.metrics_operation = f"route{i}"
+            # A thread and connection per request, as under the ASGI handler
+            async with ThreadSensitiveContext():
+                response = await middleware(request)
+                await sync_to_async(close_connections)()
+            return response.status_code
+
+        async def until_holding(count: int) -> None:
+            while len(holding) < count:
+                await asyncio.sleep(0.01)
+
+        async def main() -> None:
+            requests = [asyncio.ensure_future(serve(i)) for i in range(admitted)]
+            await asyncio.wait_for(until_holding(admitted), 5)
+            # The gate is full: one more request is turned away...
+            self.assertEqual(await serve(admitted), 503)
+            # ...while every background task still gets a connection, well
+            # before the pool would time out
+            for _ in range(background):
+                run_in_background(hold_a_connection())
+            try:
+                await asyncio.wait_for(until_holding(admitted + background), 2)
+            finally:
+                done.set()
+                statuses = await asyncio.gather(*requests)
+                await wait_for_background_tasks()
+            self.assertEqual(set(statuses), {200})
+
+        # The test's own connection would take one from the pool
+        connection.close()
+        run_like_a_server(main)
+
+
+@override_settings(
+    ADMISSION_INITIAL_LIMIT=1,
+    ADMISSION_QUEUE_TIMEOUT=0.05,
+    ADMISSION_CRITICAL_QUEUE_TIMEOUT=1,
+    ADMISSION_CRITICAL_OPERATIONS=["cheap"],
+)
+class AdmissionControlTest(TestCase):
+    def setUp(self) -> None:
+        admission.reset()
+        self.addCleanup(admission.reset)
+        self.done = asyncio.Event()
+        self.entered = []
+
+        async def view(request):
+            self.entered.append(request.metrics_operation)
+            if request.GET.get("block"):
+                await self.done.wait()
+            return HttpResponse("ok")
+
+        async def get_response(request):
+            # What Django's handler does between the middleware and the view
+            response = await self.middleware.process_view(request, view, (), {})
+            return response or await view(request)
+
+        self.middleware = admission.AdmissionControlMiddleware(get_response)
+
+    def request(self, operation: str, block: bool = False):
+        request = RequestFactory().get("/", {"block": "1"} if block else {})
+        request.metrics_operation = operation
+        return asyncio.ensure_future(self.middleware(request))
+
+    async def started(self, operation: str, block: bool = True):
+        response = self.request(operation, block)
+        await asyncio.sleep(0.01)
+        return response
+
+    async def test_rejects_requests_waiting_past_their_deadline(self):
+        running = await self.started("list")
+        rejected = await self.request("list")
+        self.assertEqual(rejected.status_code, 503)
+        self.assertEqual(rejected["Retry-After"], "1")
+
+        self.done.set()
+        self.assertEqual((await running).status_code, 200)
+        self.assertEqual((await self.request("list")).status_code, 200)
+        self.assertEqual(admission.limit_for("list").in_flight, 0)
+
+    async def test_hands_freed_slots_to_waiting_requests(self):
+        running = await self.started("cheap")
+        waiting = await self.started("cheap")
+        self.assertEqual(admission.limit_for("cheap").queued, 1)
+        self.done.set()
+        self.assertEqual((await running).status_code, 200)
+        self.assertEqual((await waiting).status_code, 200)
+
+    @override_settings(ADMISSION_MAX_IN_FLIGHT=2, ADMISSION_QUEUE_TIMEOUT=1)
+    async def test_lets_critical_requests_in_first(self):
+        running = [await self.started("list"), await self.started("thread")]
+        later = await self.started("search")
+        first = await self.started("cheap")
+        self.assertEqual(admission.in_flight_gate().queued, 2)
+        self.done.set()
+        await asyncio.gather(*running, later, first)
+        self.assertEqual(self.entered, ["list", "thread", "cheap", "search"])
+        self.assertEqual(admission.in_flight_gate().in_flight, 0)
+
+    def test_limit_follows_latency(self):
+        limit = admission.AdaptiveLimit(10, 2, 12, tolerance=2, backoff=0.5)
+        for _ in range(100):
+            limit.in_flight = 10
+            limit.release(0.01)
+        self.assertEqual(limit.limit, 12)
+
+        # Slow requests finishing together cut the limit once
+        for _ in range(3):
+            limit.in_flight = 1
+            limit.release(0.05)
+        self.assertEqual(limit.limit, 6)
+        limit._decreased_at = 0
+        limit.in_flight = 1
+        limit.release(0.01, failed=True)
+        self.assertEqual(limit.limit, 3)
+
+        # Fast requests don't raise a limit that isn't used
+        limit.in_flight = 0
+        limit.release(0.01)
+        self.assertEqual(limit.limit, 3)
+
+    @override_settings(ADMISSION_INITIAL_LIMIT=0, ADMISSION_QUEUE_TIMEOUT=0)
+    async def test_overloaded_routes_answer_503(self):
+        response = await self.async_client.get("/api/posts/")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertIn(
+            'murmur_admission_rejected_total{operation="apps_posts_apis_get_list_of_posts",'
+            'reason="queue_full"} 1',
+            admission.rejected_total.render(),
+        )
@@ -1,7 +1,21 @@
+from django.http import HttpResponse
 from ninja import Query, Router
 from ninja.pagination import paginate
-from murmur.security import AsyncTokenBasedAuth
-from posts.schemas import PostCreate, PostFilter, PostPrivate, PostPublic
+from murmur.conditional import not_modified
+from murmur.pagination import CursorPagination
+from murmur.search import SEARCH_ORDERING
+from murmur.security import AsyncTokenBasedAuth, OptionalAsyncTokenBasedAuth
+from murmur.streaming import event_stream_response
+from posts.schemas import (
+    PostBulkCreate,
+    PostBulkResponse,
+    PostCreate,
+    PostFilter,
+    PostListItem,
+    PostLiveQuery,
+    PostPrivate,
+    PostPublic,
+)
 from posts.services import PostService
 
 # Create your views here.
@@ -17,20 +31,110 @@ async def create_post(request, payload: PostCreate):
     return 201, await PostService.create_post(request, payload)
 
 
-@router.get("/", response=list[PostPublic])
+@router.post("/bulk", auth=AsyncTokenBasedAuth(), response=PostBulkResponse)
+async def create_posts_in_bulk(request, payload: PostBulkCreate):
+    """
+    Create up to POST_BULK_CREATE_MAX_ITEMS posts at once, e.g. to import an
+    account's history. Each item takes the same fields as a single create and
+    is validated on its own: valid items are created even if others fail, and
+    `results` reports each item's status by its index in the request.
+    """
+    return await PostService.create_posts(request, payload.posts)
+
+
+@router.get("/", auth=OptionalAsyncTokenBasedAuth(), response=list[PostListItem])
 @paginate
-async def get_list_of_posts(request, filters: PostFilter = Query(...)):  # type: ignore
+async def get_list_of_posts(
+    request,
+    filters: PostFilter = Query(...),  # type: ignore
+    enriched: bool = False,
+):
     """
     Get a list of posts with optional filtering.
+    With `enriched=true`, each post also carries its comment and reaction
+    counts and, when authenticated, the caller's own reaction.
+    """
+    return await PostService.get_all(request, filters, enriched)
+
+
+@router.get("/cursor", auth=OptionalAsyncTokenBasedAuth(), response=list[PostListItem])
+@paginate(CursorPagination)
+async def get_list_of_posts_by_cursor(
+    request,
+    filters: PostFilter = Query(...),  # type: ignore
+    enriched: bool = False,
+):
+    """
+    Get a list of posts, newest first, using cursor pagination.
+    Follow the `next`/`prev` tokens instead of an offset.
+    Supports `enriched=true` like the offset-paginated list.
+    """
+    return await PostService.get_all(request, filters, enriched)
+
+
+@router.get("/search", auth=OptionalAsyncTokenBasedAuth(), response=list[PostListItem])
+@paginate(CursorPagination, ordering=SEARCH_ORDERING)
+async def search_posts(
+    request,
+    q: str = Query(..., min_length=1, max_length=200),
+    filters: PostFilter = Query(...),  # type: ignore
+    enriched: bool = False,
+):
+    """
+    Full-text search over posts, best matches first, using cursor pagination.
+    `q` accepts web search syntax: "quoted phrases", `or` and `-excluded`.
+    Combines with the list filters and supports `enriched=true`.
+    """
+    return await PostService.search(request, q, filters, enriched)
+
+
+@router.get(
+    "/trending", auth=OptionalAsyncTokenBasedAuth(), response=list[PostListItem]
+)
+@paginate
+async def get_trending_posts(request, enriched: bool = False):
+    """
+    Get the posts with the most recent engagement, best first. Reactions and
+    comments count for half as much every TRENDING_HALF_LIFE seconds. The
+    ranking covers the top TRENDING_SIZE posts and is refreshed every
+    TRENDING_REFRESH_INTERVAL seconds. Supports `enriched=true`.
+    """
+    return await PostService.get_trending(request, enriched)
+
+
+@router.get("/timeline", auth=AsyncTokenBasedAuth(), response=list[PostPublic])
+@paginate(CursorPagination, ordering=("-feed_at", "-id"))
+async def get_timeline(request):
+    """
+    Get the authenticated user's home timeline: their own posts and posts
+    from the accounts they follow, newest first, using cursor pagination.
+    """
+    return await PostService.get_timeline(request)
+
+
+@router.get("/live")
+async def get_live_updates(request, query: PostLiveQuery = Query(...)):  # type: ignore
+    """
+    Follow up to LIVE_MAX_POSTS posts as server-sent events instead of
+    polling their counts and comments. Each `post` event carries one post's
+    changes since the previous event: `likes`, `dislikes` and `comments`
+    deltas and the IDs of new comments in `comment_ids`. Read the current
+    counts once the stream is open and apply the deltas to them.
     """
-    return await PostService.get_all(request, filters)
+    return event_stream_response(PostService.stream_live_updates(request, query.ids))
 
 
-@router.get("/{int:id}", auth=AsyncTokenBasedAuth(), response=PostPublic)
-async def get_a_single_post(request, id: int):
+@router.get(
+    "/{int:id}", auth=AsyncTokenBasedAuth(), response={200: PostPublic, 304: None}
+)
+async def get_a_single_post(request, id: int, response: HttpResponse):
     """
     Get a single post by its ID.
+    Send the returned ETag back in If-None-Match to get a 304 when unchanged.
     """
+    etag = await PostService.get_post_etag(request, id)
+    if cached := not_modified(request, response, etag):
+        return cached
     return await PostService.get_one_post(request, id)
 
 
@@ -0,0 +1,129 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from murmur.search import SEARCH_ORDERING, ranked_search
+from posts.models import Post
+
+# Synthetic posts are random sentences over this vocabulary, earlier words
+# being picked more often, plus one rare "topicN" tag out of TOPICS.
+VOCABULARY = [
+    "coffee", "morning", "music", "today", "weekend", "friends", "work",
+    "python", "django", "football", "recipe", "travel", "rain", "sunset",
+    "concert", "library", "marathon", "garden", "bicycle", "astronomy",
+    "volcano", "saxophone", "origami", "lighthouse", "quokka",
+]  # fmt: skip
+
+TOPICS = 10_000
+
+SEED_SQL = """
+INSERT INTO {post_table} (content, author_id, created_at, like_count, dislike_count)
+SELECT (
+        SELECT string_agg(
+            (%(words)s::text[])[1 + floor(power(random(), 2) * %(size)s)::int], ' '
+        )
+        FROM generate_series(1, 4 + (i %% 8))
+    ) || ' topic' || (1 + floor(random() * %(topics)s)::int),
+    %(author_id)s,
+    now() - (i * interval '1 second'),
+    0,
+    0
+FROM generate_series(1, %(count)s) AS i
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the first page of /api/posts/search over the posts table, "
+        "optionally seeding synthetic posts up to a target size first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--posts",
+            type=int,
+            default=0,
+            help="Seed synthetic posts until the table holds this many.",
+        )
+        parser.add_argument(
+            "--terms",
+            nargs="+",
+            default=[
+                "coffee",
+                "volcano",
+                "python django",
+                '"morning coffee"',
+                "topic42",
+            ],
+            help="Search terms to benchmark, in web search syntax.",
+        )
+        parser.add_argument(
+            "--limit", type=int, default=20, help="Page size (default: 20)."
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Timed runs per search term (default: 20).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100_000,
+            help="Posts inserted per statement while seeding (default: 100000).",
+        )
+
+    def handle(self, *args, **options):
+        self.seed(options["posts"], options["batch_size"])
+        self.stdout.write(f"Posts: {Post.objects.count()}")
+
+        for terms in options["terms"]:
+            page = ranked_search(Post.objects.all(), terms).order_by(*SEARCH_ORDERING)[
+                : options["limit"]
+            ]
+            matches = ranked_search(Post.objects.all(), terms).count()
+
+            timings = []
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                list(page.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+
+            plan = page.explain()
+            scan = "GIN bitmap scan" if "Bitmap Index Scan" in plan else "seq scan"
+            self.stdout.write(
+                f"{terms!r}: {matches} matches, "
+                f"median {statistics.median(timings):.1f} ms, p95 {p95:.1f} ms, "
+                f"{scan}"
+            )
+            if options["verbosity"] > 1:
+                self.stdout.write(page.explain(analyze=True, buffers=True))
+
+    def seed(self, target: int, batch_size: int) -> None:
+        missing = target - Post.objects.count()
+        if missing <= 0:
+            return
+        author, _ = User.objects.get_or_create(username="search-benchmark")
+        sql = SEED_SQL.format(post_table=Post._meta.db_table)
+        while missing > 0:
+            count = min(batch_size, missing)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    sql,
+                    {
+                        "words": VOCABULARY,
+                        "size": len(VOCABULARY),
+                        "author_id": author.pk,
+                        "topics": TOPICS,
+                        "count": count,
+                    },
+                )
+            missing -= count
+            self.stdout.write(f"Seeded {count} posts, {max(missing, 0)} to go")
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Post._meta.db_table}")
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from comments.models import Comment
+from posts.models import Post
+from reactions.models import Reaction
+
+# The trending score of a range of posts from scratch: log2 of the sum of
+# every reaction's and comment's weight * 2 ** (Unix time / half-life),
+# summed relative to the largest term so nothing overflows, see
+# posts.trending. Posts without engagement get NULL.
+REBUILD_SQL = """
+WITH events AS (
+    SELECT post_id, ln(%(reaction_weight)s) / ln(2::float8)
+        + extract(epoch FROM created_at) / %(half_life)s AS x
+    FROM {reaction_table}
+    WHERE post_id > %(after)s AND post_id <= %(last)s
+    UNION ALL
+    SELECT post_id, ln(%(comment_weight)s) / ln(2::float8)
+        + extract(epoch FROM created_at) / %(half_life)s
+    FROM {comment_table}
+    WHERE post_id > %(after)s AND post_id <= %(last)s
+), top AS (
+    SELECT post_id, max(x) AS x FROM events GROUP BY post_id
+), scores AS (
+    SELECT events.post_id,
+        top.x + ln(sum(power(2::float8, greatest(events.x - top.x, -64))))
+            / ln(2::float8) AS score
+    FROM events JOIN top USING (post_id)
+    GROUP BY events.post_id, top.x
+)
+UPDATE {post_table} AS p
+SET trending_score = scores.score
+FROM {post_table} AS target
+LEFT JOIN scores ON scores.post_id = target.id
+WHERE p.id = target.id AND target.id > %(after)s AND target.id <= %(last)s
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Post.trending_score from every reaction and comment, in "
+        "primary-key batches. Scores are kept up to date on write; this is "
+        "for backfills and repairs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of posts updated per statement (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        sql = REBUILD_SQL.format(
+            post_table=Post._meta.db_table,
+            reaction_table=Reaction._meta.db_table,
+            comment_table=Comment._meta.db_table,
+        )
+        params = {
+            "reaction_weight": settings.TRENDING_REACTION_WEIGHT,
+            "comment_weight": settings.TRENDING_COMMENT_WEIGHT,
+            "half_life": settings.TRENDING_HALF_LIFE,
+        }
+        batch_size = options["batch_size"]
+        last_pk = 0
+        updated = 0
+        while True:
+            pks = list(
+                Post.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            with connection.cursor() as cursor:
+                cursor.execute(sql, {**params, "after": last_pk, "last": pks[-1]})
+                updated += cursor.rowcount
+            last_pk = pks[-1]
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt trending scores for {updated} posts")
+        )
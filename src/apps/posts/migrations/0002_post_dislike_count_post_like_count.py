@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-17 10:12
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_reaction_counts(apps, schema_editor):
+    Post = apps.get_model("posts", "Post")
+    Reaction = apps.get_model("reactions", "Reaction")
+
+    def count_of(reaction_type):
+        counts = (
+            Reaction.objects.filter(post=OuterRef("pk"), reaction_type=reaction_type)
+            .order_by()
+            .values("post")
+            .annotate(total=Count("pk"))
+            .values("total")
+        )
+        return Coalesce(Subquery(counts), Value(0))
+
+    Post.objects.update(like_count=count_of("like"), dislike_count=count_of("dislike"))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0001_initial"),
+        ("reactions", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="dislike_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="like_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_reaction_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.3 on 2026-10-17 07:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0002_post_dislike_count_post_like_count"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["created_at", "id"], name="posts_post_created_b28b11_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-17 08:46
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without locking out writes to the table
+    atomic = False
+
+    dependencies = [
+        ("posts", "0005_post_search_vector_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="post",
+            index=models.Index(
+                fields=["author", "created_at", "id"],
+                name="posts_post_author__691f2d_idx",
+            ),
+        ),
+    ]
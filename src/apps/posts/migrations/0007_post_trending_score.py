@@ -0,0 +1,63 @@
+# Generated by Django 5.2.3 on 2026-10-17 09:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Log-space sums for Post.trending_score, see posts.trending. A term 64
+# halvings below the other can't change a double, and would underflow
+# power(), so it is dropped.
+EVENT = "ln(weight) / ln(2::float8) + extract(epoch FROM at) / half_life"
+
+CREATE_FUNCTIONS = f"""
+CREATE OR REPLACE FUNCTION posts_trending_add(
+    score float8, weight float8, at timestamptz, half_life float8
+) RETURNS float8 LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE
+        WHEN score IS NULL THEN x
+        WHEN abs(score - x) > 64 THEN greatest(score, x)
+        ELSE greatest(score, x) + ln(1 + power(2::float8, -abs(score - x))) / ln(2::float8)
+    END
+    FROM (SELECT {EVENT} AS x) AS event
+$$;
+
+CREATE OR REPLACE FUNCTION posts_trending_remove(
+    score float8, weight float8, at timestamptz, half_life float8
+) RETURNS float8 LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE
+        WHEN score - x > 64 THEN score
+        -- That was all of it, up to rounding
+        WHEN score - x < 1e-9 THEN NULL
+        ELSE score + ln(1 - power(2::float8, x - score)) / ln(2::float8)
+    END
+    FROM (SELECT {EVENT} AS x) AS event
+$$;
+"""
+
+DROP_FUNCTIONS = """
+DROP FUNCTION posts_trending_add(float8, float8, timestamptz, float8);
+DROP FUNCTION posts_trending_remove(float8, float8, timestamptz, float8);
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0006_post_posts_post_author__691f2d_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_FUNCTIONS, DROP_FUNCTIONS),
+        migrations.AddField(
+            model_name="post",
+            name="trending_score",
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("trending_score__isnull", False)),
+                fields=["-trending_score"],
+                name="post_trending",
+            ),
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
 
+from murmur.search import SEARCH_CONFIG, SearchableManager
+
 # Create your models here.
 
 
@@ -9,3 +13,57 @@ class Post(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="posts")
 
     created_at = models.DateTimeField(auto_now_add=True)
+
+    # Denormalized reaction counters, maintained by ReactionService.
+    # Run `manage.py rebuild_reaction_counts` to repair any drift.
+    like_count = models.IntegerField(default=0, editable=False)
+    dislike_count = models.IntegerField(default=0, editable=False)
+    # Time-decayed engagement in log space, see posts.trending. Maintained
+    # by ReactionService and CommentService; null until first engaged with.
+    trending_score = models.FloatField(null=True, blank=True, editable=False)
+
+    # Computed by Postgres on every insert/update, see murmur.search
+    search_vector = models.GeneratedField(
+        expression=SearchVector("content", config=SEARCH_CONFIG),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = SearchableManager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination order, see murmur.pagination.CursorPagination
+            models.Index(fields=["created_at", "id"]),
+            # The same order for one author's posts
+            models.Index(fields=["author", "created_at", "id"]),
+            GinIndex(fields=["search_vector"]),
+            # Top-K reads for GET /api/posts/trending
+            models.Index(
+                fields=["-trending_score"],
+                condition=models.Q(trending_score__isnull=False),
+                name="post_trending",
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """
+    A post materialized into one user's home timeline (fan-out-on-write).
+    `created_at` copies the post's timestamp so a timeline page is a single
+    range scan over (owner, created_at, post).
+    """
+
+    owner = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("owner", "post")
+        indexes = [
+            models.Index(fields=["owner", "created_at", "post"]),
+        ]
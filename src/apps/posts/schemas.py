@@ -1,7 +1,8 @@
 from datetime import datetime
 from typing import Optional
+from django.conf import settings
 from ninja import FilterSchema, Schema, ModelSchema, Field
-from pydantic import field_validator
+from pydantic import SkipValidation, field_validator
 
 from posts.models import Post
 
@@ -19,12 +20,50 @@ class PostCreate(Schema):
         return v
 
 
+class PostBulkCreate(Schema):
+    # Documented as PostCreate items, but validated one by one by
+    # PostService.create_posts so an invalid item doesn't fail the batch
+    posts: list[SkipValidation[PostCreate]] = Field(min_length=1)
+
+
+class PostBulkResult(Schema):
+    index: int
+    # 201 when the post was created, 422 when the item was invalid
+    status: int
+    id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    errors: list[str] = []
+
+
+class PostBulkResponse(Schema):
+    created: int
+    failed: int
+    results: list[PostBulkResult]
+
+
 class PostPublic(ModelSchema):
     class Meta:
         model = Post
         fields = ["content", "author", "created_at"]
 
 
+class PostListItem(ModelSchema):
+    """
+    Post as returned by the list endpoints. The engagement fields are only
+    filled in when the list is requested with `enriched=true`; `my_reaction`
+    additionally needs an authenticated caller.
+    """
+
+    comment_count: Optional[int] = None
+    likes: Optional[int] = None
+    dislikes: Optional[int] = None
+    my_reaction: Optional[str] = None
+
+    class Meta:
+        model = Post
+        fields = ["id", "content", "author", "created_at"]
+
+
 # Only the author can see this info
 class PostPrivate(ModelSchema):
     class Meta:
@@ -35,3 +74,12 @@ class PostPrivate(ModelSchema):
 class PostFilter(FilterSchema):
     author: Optional[int] = None
     created_after: Optional[datetime] = Field(None, q="created_at__gte")  # type: ignore
+
+
+class PostLiveQuery(Schema):
+    """
+    Query schema for following posts live.
+    Pass the post IDs as repeated `ids` parameters.
+    """
+
+    ids: list[int] = Field(..., min_length=1, max_length=settings.LIVE_MAX_POSTS)
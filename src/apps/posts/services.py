@@ -1,7 +1,21 @@
+from typing import AsyncIterator
+
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.shortcuts import aget_object_or_404
 from ninja.errors import HttpError
-from posts.models import Post
+from pydantic import ValidationError
+from accounts.models import Follow, Profile
+from comments.models import Comment
+from murmur import live, querycache
+from murmur.conditional import make_etag
+from murmur.search import ranked_search
+from murmur.tasks import run_in_background
+from posts.models import Post, TimelineEntry
 from posts.schemas import PostCreate, PostFilter
+from posts.trending import trending_posts
+from reactions.models import Reaction
 
 
 class PostService:
@@ -12,6 +26,8 @@ class PostService:
                 raise HttpError(422, "Content cannot be empty")
             post = Post(content=payload.content, author=request.auth)
             await post.asave()
+            await querycache.changed(Post)
+            await PostService.schedule_fan_out([post])
             return post
         except HttpError as e:
             raise e
@@ -19,10 +35,217 @@ class PostService:
             raise HttpError(500, f"Failed to create post: {e}")
 
     @staticmethod
-    async def get_all(request, filters: PostFilter):
-        posts = Post.objects.all()
+    async def create_posts(request, items: list[dict]) -> dict:
+        """
+        Validate every item as a PostCreate on its own and insert the valid
+        ones with a single bulk insert. Invalid items are reported back by
+        their index instead of failing the whole batch.
+        """
+        if len(items) > settings.POST_BULK_CREATE_MAX_ITEMS:
+            raise HttpError(
+                422,
+                f"At most {settings.POST_BULK_CREATE_MAX_ITEMS} posts can be "
+                "created at once",
+            )
+        results = []
+        posts = []
+        for index, item in enumerate(items):
+            try:
+                payload = PostCreate.model_validate(item)
+            except ValidationError as e:
+                errors = [
+                    ".".join(map(str, error["loc"])) + ": " + error["msg"]
+                    if error["loc"]
+                    else error["msg"]
+                    for error in e.errors()
+                ]
+                results.append({"index": index, "status": 422, "errors": errors})
+                continue
+            if payload.content == "":
+                results.append(
+                    {
+                        "index": index,
+                        "status": 422,
+                        "errors": ["Content cannot be empty"],
+                    }
+                )
+                continue
+            post = Post(content=payload.content, author=request.auth)
+            posts.append(post)
+            results.append({"index": index, "status": 201, "post": post})
+
+        if posts:
+            await Post.objects.abulk_create(
+                posts, batch_size=settings.POST_BULK_CREATE_BATCH_SIZE
+            )
+            await querycache.changed(Post)
+            await PostService.schedule_fan_out(posts)
+        for result in results:
+            if post := result.pop("post", None):
+                result["id"] = post.pk
+                result["created_at"] = post.created_at
+        return {
+            "created": len(posts),
+            "failed": len(results) - len(posts),
+            "results": results,
+        }
+
+    @staticmethod
+    async def get_all(request, filters: PostFilter, enriched: bool = False):
+        """
+        Posts matching the list filters, newest first so offset pages are
+        stable and index-ordered. Pages are served from the queryset cache;
+        enriched ones also depend on comments and reactions and, with
+        `my_reaction`, on the caller.
+        """
+        posts = Post.objects.order_by("-created_at", "-id")
+        models = [Post]
+        key = {"filters": filters.model_dump(exclude_none=True)}
+        if enriched:
+            posts = PostService.with_engagement(posts, request.auth)
+            models += [Comment, Reaction]
+            key["enriched_for"] = request.auth.pk
+        results = querycache.CachedResults(("posts", key), models=models)
+        return querycache.cache_results(filters.filter(posts), results)
+
+    @staticmethod
+    async def search(request, terms: str, filters: PostFilter, enriched: bool = False):
+        """
+        Posts matching the full-text search `terms`, annotated with their
+        `rank` and narrowed by the usual list filters.
+        """
+        posts = ranked_search(Post.objects.all(), terms)
+        if enriched:
+            posts = PostService.with_engagement(posts, request.auth)
         return filters.filter(posts)
 
+    @staticmethod
+    async def get_trending(request, enriched: bool = False):
+        """
+        The posts of the current top-K snapshot, best scored first. Only
+        those K rows are read, however many posts and reactions there are.
+        """
+        ids = await trending_posts.get()
+        posts = Post.objects.filter(pk__in=ids).order_by("-trending_score", "-id")
+        if enriched:
+            posts = PostService.with_engagement(posts, request.auth)
+        return posts
+
+    @staticmethod
+    def with_engagement(posts, user=None):
+        """
+        Annotate comment count, like/dislike counts and, for an authenticated
+        user, their own reaction type, so a page is still a single statement.
+        """
+        comment_count = (
+            Comment.objects.filter(post=OuterRef("pk"))
+            .order_by()
+            .values("post")
+            .annotate(total=Count("pk"))
+            .values("total")
+        )
+        posts = posts.annotate(
+            comment_count=Coalesce(Subquery(comment_count), Value(0)),
+            likes=F("like_count"),
+            dislikes=F("dislike_count"),
+        )
+        if user is not None and user.is_authenticated:
+            my_reaction = Reaction.objects.filter(
+                post=OuterRef("pk"), user=user
+            ).values("reaction_type")[:1]
+            posts = posts.annotate(my_reaction=Subquery(my_reaction))
+        return posts
+
+    @staticmethod
+    async def get_timeline(request) -> list:
+        """
+        Sources for the user's home timeline, merged by CursorPagination on
+        (feed_at, id): the materialized entries plus the posts that are read
+        on demand (the user's own and those of high-follower accounts).
+        Each on-demand author is its own source, so every page is a short
+        range scan of the (author, created_at, id) index per author, all of
+        them read in a single UNION ALL statement.
+        """
+        user = request.auth
+        pulled_authors = Follow.objects.filter(
+            follower=user,
+            followee__profile__followers_count__gt=settings.TIMELINE_FANOUT_MAX_FOLLOWERS,
+        ).values_list("followee", flat=True)
+
+        materialized = Post.objects.filter(timeline_entries__owner=user).annotate(
+            feed_at=F("timeline_entries__created_at")
+        )
+        on_read = [
+            Post.objects.filter(author_id=author_id).annotate(feed_at=F("created_at"))
+            for author_id in [user.pk, *[pk async for pk in pulled_authors]]
+        ]
+        return [materialized, *on_read]
+
+    @staticmethod
+    async def schedule_fan_out(posts: list[Post]) -> None:
+        """
+        Queue new posts of one author for their followers' timelines off the
+        request path. Authors above TIMELINE_FANOUT_MAX_FOLLOWERS are read on
+        demand instead. Like a backfill, at most TIMELINE_BACKFILL_SIZE of
+        the newest posts are fanned out.
+        """
+        followers = (
+            await Profile.objects.filter(user_id=posts[0].author_id)  # type: ignore
+            .values_list("followers_count", flat=True)
+            .afirst()
+        )
+        if followers and followers <= settings.TIMELINE_FANOUT_MAX_FOLLOWERS:
+            recent = posts[-settings.TIMELINE_BACKFILL_SIZE :]
+            run_in_background(PostService.fan_out_posts(recent))
+
+    @staticmethod
+    async def fan_out_posts(posts: list[Post]) -> None:
+        """
+        Insert one author's posts into every follower's timeline with bulk
+        inserts.
+        """
+        batch_size = settings.TIMELINE_FANOUT_BATCH_SIZE
+        followers = Follow.objects.filter(
+            followee_id=posts[0].author_id  # type: ignore
+        ).values_list("follower_id", flat=True)
+
+        batch = []
+        async for follower_id in followers.aiterator(chunk_size=batch_size):
+            batch.extend(
+                TimelineEntry(
+                    owner_id=follower_id, post_id=post.pk, created_at=post.created_at
+                )
+                for post in posts
+            )
+            if len(batch) >= batch_size:
+                await TimelineEntry.objects.abulk_create(batch, ignore_conflicts=True)
+                batch = []
+        if batch:
+            await TimelineEntry.objects.abulk_create(batch, ignore_conflicts=True)
+
+    @staticmethod
+    async def backfill_timeline(owner_id: int, author_id: int) -> None:
+        """
+        Copy an author's most recent posts into a new follower's timeline.
+        """
+        recent = Post.objects.filter(author_id=author_id).order_by("-created_at")
+        entries = [
+            TimelineEntry(owner_id=owner_id, post_id=pk, created_at=created_at)
+            async for pk, created_at in recent.values_list("pk", "created_at")[
+                : settings.TIMELINE_BACKFILL_SIZE
+            ]
+        ]
+        await TimelineEntry.objects.abulk_create(entries, ignore_conflicts=True)
+
+    @staticmethod
+    async def get_post_etag(request, id: int) -> str:
+        """
+        Posts are immutable, so the ETag only depends on the post existing.
+        """
+        if not await Post.objects.filter(pk=id).aexists():
+            raise HttpError(404, "Not Found")
+        return make_etag("post", id)
+
     @staticmethod
     async def get_one_post(request, id: int) -> Post:
         try:
@@ -33,9 +256,21 @@ class PostService:
         except Exception:
             raise HttpError(500, "Failed to retrieve the post")
 
+    @staticmethod
+    def stream_live_updates(request, post_ids: list[int]) -> AsyncIterator[bytes]:
+        """
+        Server-sent events of the reactions and comments made on `post_ids`
+        from now on, see murmur.live. Runs no queries.
+        """
+        return live.stream(post_ids)
+
     @staticmethod
     async def delete_post(request, id: int) -> None:
         post = await aget_object_or_404(Post.objects.select_related("author"), pk=id)
         if request.auth != post.author:
             raise HttpError(403, "YOU cannot delete posts from another person")
         await post.adelete()
+        # The post's comments and reactions went with it
+        await querycache.changed(Post)
+        await querycache.changed(Comment, [id])
+        await querycache.changed(Reaction, [id])
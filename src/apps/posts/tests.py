@@ -1,15 +1,33 @@
-from django.test import TestCase
+import asyncio
+import json
+
+from django.conf import settings
+from django.test import TestCase, override_settings
 from ninja.testing import TestAsyncClient
 from django.contrib.auth.models import User
+from django.utils import timezone
 from datetime import datetime, timedelta
 
 from ninja_jwt.tokens import RefreshToken
-from posts.models import Post
-from posts.views import router
+from accounts.models import Follow, Profile
+from comments.models import Comment
+from accounts.cache import user_cache
+from murmur import live, querycache
+from murmur.api import app
+from murmur.tasks import wait_for_background_tasks
+from murmur.testing import query_budget
+from posts.models import Post, TimelineEntry
+from posts.trending import Disengaged, Engaged, trending_posts
+from reactions.models import Reaction, ReactionType
+from posts.apis import router
+
+# Build the project API before the routers are attached to test clients
+import murmur.urls  # noqa: F401
 
 
 class PostsTest(TestCase):
     def setUp(self) -> None:
+        querycache.clear()
         # Create test users
         self.user1 = User.objects.create_user(
             username="testuser1", password="password123"
@@ -79,6 +97,75 @@ class PostsTest(TestCase):
         )  # type: ignore
         self.assertEqual(response.status_code, 422)  # Validation error
 
+    async def test_bulk_create_posts(self):
+        response = await self.tclient.post(
+            "/bulk",
+            json={"posts": [{"content": f"Imported post {i}"} for i in range(3)]},
+            headers={"Authorization": f"Bearer {self.token_user1}"},
+        )  # type: ignore
+        self.assertEqual(response.status_code, 200)
+        json_data = response.json()
+        self.assertEqual((json_data["created"], json_data["failed"]), (3, 0))
+        ids = [result["id"] for result in json_data["results"]]
+        self.assertEqual(
+            [
+                post.content
+                async for post in Post.objects.filter(
+                    pk__in=ids, author=self.user1
+                ).order_by("pk")
+            ],
+            ["Imported post 0", "Imported post 1", "Imported post 2"],
+        )
+
+    async def test_bulk_create_reports_invalid_items(self):
+        response = await self.tclient.post(
+            "/bulk",
+            json={
+                "posts": [
+                    {"content": "Valid"},
+                    {"content": ""},
+                    {"content": "x" * 281},
+                    {},
+                    {"content": "Also valid"},
+                ]
+            },
+            headers={"Authorization": f"Bearer {self.token_user1}"},
+        )  # type: ignore
+        self.assertEqual(response.status_code, 200)
+        json_data = response.json()
+        self.assertEqual((json_data["created"], json_data["failed"]), (2, 3))
+        results = json_data["results"]
+        self.assertEqual([r["index"] for r in results], [0, 1, 2, 3, 4])
+        self.assertEqual([r["status"] for r in results], [201, 422, 422, 422, 201])
+        self.assertIsNone(results[1]["id"])
+        self.assertTrue(results[2]["errors"][0].startswith("content: "))
+        self.assertTrue(await Post.objects.filter(pk=results[4]["id"]).aexists())
+
+    @override_settings(POST_BULK_CREATE_MAX_ITEMS=2)
+    async def test_bulk_create_limits_batch_size(self):
+        response = await self.tclient.post(
+            "/bulk",
+            json={"posts": [{"content": "One"}, {"content": "Two"}, {"content": "3"}]},
+            headers={"Authorization": f"Bearer {self.token_user1}"},
+        )  # type: ignore
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(await Post.objects.filter(content="One").aexists())
+
+    async def test_bulk_create_requires_auth(self):
+        response = await self.tclient.post(
+            "/bulk", json={"posts": [{"content": "Anonymous"}]}
+        )  # type: ignore
+        self.assertEqual(response.status_code, 401)
+
+    def test_bulk_create_documents_its_items(self):
+        schema = app.get_openapi_schema()
+        body = schema["paths"]["/api/posts/bulk"]["post"]["requestBody"]
+        ref = body["content"]["application/json"]["schema"]["$ref"]
+        items = schema["components"]["schemas"][ref.rsplit("/", 1)[-1]]
+        items = items["properties"]["posts"]["items"]
+        self.assertEqual(items["required"], ["content"])
+        self.assertEqual(items["properties"]["content"]["maxLength"], 280)
+
     async def test_get_a_single_post_of_otheruser(self):
         # Get a post from user2 while authenticated as user1
         post = await Post.objects.filter(author=self.user2).afirst()
@@ -105,6 +192,26 @@ class PostsTest(TestCase):
         self.assertEqual(json_data["content"], post.content)
         self.assertEqual(json_data["author"], self.user1.pk)
 
+    async def test_get_a_single_post_not_modified(self):
+        post = await Post.objects.filter(author=self.user2).afirst()
+        assert post
+        headers = {"Authorization": f"Bearer {self.token_user1}"}
+        response = await self.tclient.get(f"/{post.pk}", headers=headers)  # type: ignore
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        response = await self.tclient.get(
+            f"/{post.pk}", headers={**headers, "If-None-Match": etag}
+        )  # type: ignore
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+        response = await self.tclient.get(
+            f"/{post.pk + 1000}", headers={**headers, "If-None-Match": etag}
+        )  # type: ignore
+        self.assertEqual(response.status_code, 404)
+
     async def test_get_post_by_user(self):
         # filter post by different users
         user1_posts_count = await Post.objects.filter(author=self.user1).acount()
@@ -133,6 +240,40 @@ class PostsTest(TestCase):
             # Check that none of the returned posts has the content "Yesterday's post"
             self.assertNotEqual(post["content"], "Yesterday's post")
 
+    async def test_get_enriched_posts(self):
+        post = await Post.objects.filter(author=self.user2).afirst()
+        assert post
+        await Comment.objects.acreate(content="Nice", post=post, author=self.user1)
+        await Reaction.objects.acreate(
+            post=post, user=self.user1, reaction_type=ReactionType.LIKE
+        )
+        await Post.objects.filter(pk=post.pk).aupdate(like_count=1)
+
+        response = await self.tclient.get(
+            f"/?author={self.user2.pk}&enriched=true",
+            headers={"Authorization": f"Bearer {self.token_user1}"},
+        )  # type: ignore
+        self.assertEqual(response.status_code, 200)
+        item = response.json()["items"][0]
+        self.assertEqual(item["id"], post.pk)
+        self.assertEqual(item["comment_count"], 1)
+        self.assertEqual(item["likes"], 1)
+        self.assertEqual(item["dislikes"], 0)
+        self.assertEqual(item["my_reaction"], ReactionType.LIKE)
+
+        # Anonymous callers get the aggregates but no reaction of their own
+        response = await self.tclient.get(f"/?author={self.user2.pk}&enriched=true")  # type: ignore
+        item = response.json()["items"][0]
+        self.assertEqual(item["comment_count"], 1)
+        self.assertIsNone(item["my_reaction"])
+
+    async def test_posts_are_not_enriched_by_default(self):
+        response = await self.tclient.get("/")  # type: ignore
+        self.assertEqual(response.status_code, 200)
+        for item in response.json()["items"]:
+            self.assertIsNone(item["comment_count"])
+            self.assertIsNone(item["likes"])
+
     async def test_get_post_with_pagination(self):
         # Query with pagination
         response = await self.tclient.get("/?limit=2&offset=0")  # type: ignore
@@ -161,6 +302,89 @@ class PostsTest(TestCase):
         # We should have retrieved all posts
         self.assertEqual(len(all_posts), total_posts)
 
+    async def test_get_post_with_cursor_pagination(self):
+        expected = [
+            post.content async for post in Post.objects.order_by("-created_at", "-id")
+        ]
+
+        # Walk forward through every page
+        pages = []
+        response = await self.tclient.get("/cursor?limit=2")  # type: ignore
+        while True:
+            self.assertEqual(response.status_code, 200)
+            json_data = response.json()
+            self.assertNotIn("count", json_data)
+            pages.append(json_data)
+            if json_data["next"] is None:
+                break
+            response = await self.tclient.get(
+                f"/cursor?limit=2&cursor={json_data['next']}"
+            )  # type: ignore
+
+        self.assertIsNone(pages[0]["prev"])
+        contents = [item["content"] for page in pages for item in page["items"]]
+        self.assertEqual(contents, expected)
+        self.assertEqual(contents[-1], "Yesterday's post")
+
+        # Going back from the last page returns the page before it
+        response = await self.tclient.get(f"/cursor?limit=2&cursor={pages[-1]['prev']}")  # type: ignore
+        self.assertEqual(response.json()["items"], pages[-2]["items"])
+
+    async def test_cursor_pagination_respects_filters(self):
+        response = await self.tclient.get(f"/cursor?author={self.user2.pk}")  # type: ignore
+        self.assertEqual(response.status_code, 200)
+        json_data = response.json()
+        self.assertEqual(len(json_data["items"]), 1)
+        self.assertIsNone(json_data["next"])
+
+    async def test_invalid_cursor(self):
+        response = await self.tclient.get("/cursor?cursor=not-a-cursor")  # type: ignore
+        self.assertEqual(response.status_code, 400)
+
+    async def test_search_posts(self):
+        await Post.objects.acreate(
+            content="Running shoes for running", author=self.user2
+        )
+        await Post.objects.acreate(content="I went running today", author=self.user1)
+
+        # Stemmed match, best match first
+        response = await self.tclient.get("/search?q=runs")  # type: ignore
+        self.assertEqual(response.status_code, 200)
+        contents = [item["content"] for item in response.json()["items"]]
+        self.assertEqual(
+            contents, ["Running shoes for running", "I went running today"]
+        )
+
+        response = await self.tclient.get("/search?q=running -shoes")  # type: ignore
+        contents = [item["content"] for item in response.json()["items"]]
+        self.assertEqual(contents, ["I went running today"])
+
+    async def test_search_posts_respects_filters(self):
+        response = await self.tclient.get(f"/search?q=post&author={self.user2.pk}")  # type: ignore
+        self.assertEqual(response.status_code, 200)
+        contents = [item["content"] for item in response.json()["items"]]
+        self.assertEqual(contents, ["User2's post 1"])
+
+    async def test_search_posts_with_cursor_pagination(self):
+        response = await self.tclient.get("/search?q=post&limit=3")  # type: ignore
+        first_page = response.json()
+        self.assertEqual(len(first_page["items"]), 3)
+
+        response = await self.tclient.get(
+            f"/search?q=post&limit=3&cursor={first_page['next']}"
+        )  # type: ignore
+        second_page = response.json()
+        self.assertEqual(len(second_page["items"]), 1)
+        self.assertIsNone(second_page["next"])
+        contents = {
+            item["content"] for item in first_page["items"] + second_page["items"]
+        }
+        self.assertEqual(len(contents), 4)
+
+    async def test_search_requires_terms(self):
+        response = await self.tclient.get("/search")  # type: ignore
+        self.assertEqual(response.status_code, 422)
+
     async def test_delete_post(self):
         # Delete a post
         post = await Post.objects.filter(author=self.user1).afirst()
@@ -190,3 +414,394 @@ class PostsTest(TestCase):
         # Verify the post still exists
         post_exists = await Post.objects.filter(id=post_id).aexists()
         self.assertTrue(post_exists)
+
+    async def _follow(self, follower, followee):
+        await Follow.objects.acreate(follower=follower, followee=followee)
+        await Profile.objects.filter(user=followee).aupdate(followers_count=1)
+
+    async def test_new_post_is_fanned_out_to_followers(self):
+        await self._follow(self.user2, self.user1)
+
+        response = await self.tclient.post(
+            "/",
+            json={"content": "Fresh from user1"},
+            headers={"Authorization": f"Bearer {self.token_user1}"},
+        )  # type: ignore
+        self.assertEqual(response.status_code, 201)
+        await wait_for_background_tasks()
+
+        self.assertTrue(
+            await TimelineEntry.objects.filter(
+                owner=self.user2, post__content="Fresh from user1"
+            ).aexists()
+        )
+        response = await self.tclient.get(
+            "/timeline", headers={"Authorization": f"Bearer {self.token_user2}"}
+        )  # type: ignore
+        self.assertEqual(response.status_code, 200)
+        contents = [item["content"] for item in response.json()["items"]]
+        # Newest first, the follower's own post is read on demand
+        self.assertEqual(contents, ["Fresh from user1", "User2's post 1"])
+
+    @override_settings(TIMELINE_BACKFILL_SIZE=2)
+    async def test_bulk_created_posts_are_fanned_out(self):
+        await self._follow(self.user2, self.user1)
+
+        response = await self.tclient.post(
+            "/bulk",
+            json={"posts": [{"content": f"Bulk {i}"} for i in range(3)]},
+            headers={"Authorization": f"Bearer {self.token_user1}"},
+        )  # type: ignore
+        self.assertEqual(response.status_code, 200)
+        await wait_for_background_tasks()
+
+        # Only the newest TIMELINE_BACKFILL_SIZE of the batch are fanned out
+        self.assertEqual(
+            [
+                entry.post.content
+                async for entry in TimelineEntry.objects.filter(owner=self.user2)
+                .select_related("post")
+                .order_by("post_id")
+            ],
+            ["Bulk 1", "Bulk 2"],
+        )
+
+    @override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=0)
+    async def test_high_follower_accounts_are_pulled_on_read(self):
+        await self._follow(self.user2, self.user1)
+
+        response = await self.tclient.post(
+            "/",
+            json={"content": "Celebrity post"},
+            headers={"Authorization": f"Bearer {self.token_user1}"},
+        )  # type: ignore
+        self.assertEqual(response.status_code, 201)
+        await wait_for_background_tasks()
+        self.assertFalse(await TimelineEntry.objects.aexists())
+
+        user1_posts = await Post.objects.filter(author=self.user1).acount()
+        response = await self.tclient.get(
+            "/timeline?limit=2", headers={"Authorization": f"Bearer {self.token_user2}"}
+        )  # type: ignore
+        first_page = response.json()
+        self.assertEqual(first_page["items"][0]["content"], "Celebrity post")
+
+        response = await self.tclient.get(
+            f"/timeline?limit=100&cursor={first_page['next']}",
+            headers={"Authorization": f"Bearer {self.token_user2}"},
+        )  # type: ignore
+        self.assertEqual(
+            len(first_page["items"]) + len(response.json()["items"]), user1_posts + 1
+        )
+
+    @override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=0)
+    async def test_pulled_authors_are_read_in_one_query(self):
+        for i in range(5):
+            author = await User.objects.acreate_user(username=f"celebrity{i}")
+            await Post.objects.acreate(content=f"Celebrity {i}", author=author)
+            await self._follow(self.user2, author)
+
+        user_cache.clear()
+        # The user, the pulled authors, then every source in one statement
+        with query_budget(3):
+            response = await self.tclient.get(
+                "/timeline", headers={"Authorization": f"Bearer {self.token_user2}"}
+            )  # type: ignore
+        contents = [item["content"] for item in response.json()["items"]]
+        self.assertEqual(contents[:5], [f"Celebrity {i}" for i in reversed(range(5))])
+
+    async def test_timeline_requires_auth(self):
+        response = await self.tclient.get("/timeline")  # type: ignore
+        self.assertEqual(response.status_code, 401)
+
+    async def test_query_budgets(self):
+        post = await Post.objects.filter(author=self.user1).afirst()
+        assert post
+        auth = {"Authorization": f"Bearer {self.token_user1}"}
+        routes = [
+            ("get", "/", {}, 2),
+            ("get", "/?enriched=true", {"headers": auth}, 3),
+            ("get", "/cursor?enriched=true", {"headers": auth}, 2),
+            ("get", "/search?q=post&enriched=true", {"headers": auth}, 2),
+            ("get", "/timeline", {"headers": auth}, 3),
+            ("get", f"/{post.pk}", {"headers": auth}, 3),
+            ("post", "/", {"headers": auth, "json": {"content": "Budget"}}, 3),
+            (
+                "post",
+                "/bulk",
+                {
+                    "headers": auth,
+                    "json": {"posts": [{"content": f"Budget {i}"} for i in range(50)]},
+                },
+                3,
+            ),
+            ("delete", f"/{post.pk}", {"headers": auth}, 6),
+        ]
+        for method, path, kwargs, budget in routes:
+            # Worst case: the token's user isn't cached yet
+            user_cache.clear()
+            with self.subTest(f"{method.upper()} {path}"), query_budget(budget):
+                response = await getattr(self.tclient, method)(path, **kwargs)
+                self.assertLess(response.status_code, 400)
+
+
+class TrendingTest(TestCase):
+    def setUp(self) -> None:
+        self.author = User.objects.create_user(username="author")
+        self.fans = [User.objects.create_user(username=f"fan{i}") for i in range(3)]
+        self.posts = [
+            Post.objects.create(content=f"Post {i}", author=self.author)
+            for i in range(3)
+        ]
+        self.tclient = TestAsyncClient(router)
+        trending_posts.clear()
+        trending_posts.interval = 60
+
+    def auth(self, user: User) -> dict:
+        return {"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+    async def react(self, user: User, post: Post) -> None:
+        response = await self.async_client.post(
+            "/api/reactions/",
+            {"post_id": post.pk, "reaction_type": "like"},
+            content_type="application/json",
+            headers=self.auth(user),
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+
+    async def score(self, post: Post):
+        return (await Post.objects.aget(pk=post.pk)).trending_score
+
+    async def test_reactions_and_comments_rank_posts(self):
+        first, second, _ = self.posts
+        for fan in self.fans[:2]:
+            await self.react(fan, second)
+        await self.react(self.fans[0], first)
+        response = await self.async_client.post(
+            "/api/comments/",
+            {"post_id": first.pk, "content": "Great"},
+            content_type="application/json",
+            headers=self.auth(self.fans[1]),
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+
+        response = await self.tclient.get("/trending?enriched=true")
+        self.assertEqual(response.status_code, 200)
+        items = response.json()["items"]
+        # A comment weighs two reactions; posts without engagement aren't ranked
+        self.assertEqual([item["id"] for item in items], [first.pk, second.pk])
+        self.assertEqual(items[0]["comment_count"], 1)
+
+    async def test_engagement_decays_with_age(self):
+        old, new, _ = self.posts
+        day_ago = timezone.now() - timedelta(days=1)
+        # Ten reactions four half-lives ago are worth 10 / 16 of one now
+        for _ in range(10):
+            await Post.objects.filter(pk=old.pk).aupdate(
+                trending_score=Engaged(1, day_ago)
+            )
+        await Post.objects.filter(pk=new.pk).aupdate(
+            trending_score=Engaged(1, timezone.now())
+        )
+
+        self.assertAlmostEqual(
+            2 ** (await self.score(old) - await self.score(new)), 10 / 16, places=3
+        )
+        response = await self.tclient.get("/trending")
+        self.assertEqual(
+            [item["id"] for item in response.json()["items"]], [new.pk, old.pk]
+        )
+
+    async def test_removed_engagement_is_taken_back(self):
+        post = self.posts[0]
+        await self.react(self.fans[0], post)
+        once = await self.score(post)
+        await self.react(self.fans[1], post)
+        self.assertGreater(await self.score(post), once)
+
+        response = await self.async_client.delete(
+            f"/api/reactions/{post.pk}", headers=self.auth(self.fans[1])
+        )
+        self.assertLess(response.status_code, 300, response.content)
+        self.assertAlmostEqual(await self.score(post), once, places=6)
+
+        # Flipping a reaction isn't new engagement
+        response = await self.async_client.post(
+            "/api/reactions/",
+            {"post_id": post.pk, "reaction_type": "dislike"},
+            content_type="application/json",
+            headers=self.auth(self.fans[0]),
+        )
+        self.assertAlmostEqual(await self.score(post), once, places=6)
+
+        reaction = await Reaction.objects.aget(post=post)
+        await Post.objects.filter(pk=post.pk).aupdate(
+            trending_score=Disengaged(1, reaction.created_at)
+        )
+        self.assertIsNone(await self.score(post))
+
+    async def test_snapshot_is_refreshed_on_interval(self):
+        first, second, _ = self.posts
+        await self.react(self.fans[0], first)
+        self.assertEqual(await trending_posts.get(), [first.pk])
+
+        await self.react(self.fans[0], second)
+        await self.react(self.fans[1], second)
+        # Still fresh: the snapshot isn't read again
+        with query_budget(0):
+            self.assertEqual(await trending_posts.get(), [first.pk])
+
+        # Stale: served once more while the next one is read
+        trending_posts.interval = 0
+        self.assertEqual(await trending_posts.get(), [first.pk])
+        await wait_for_background_tasks()
+        trending_posts.interval = 60
+        self.assertEqual(await trending_posts.get(), [second.pk, first.pk])
+
+    async def test_query_budget(self):
+        await self.react(self.fans[0], self.posts[0])
+        await trending_posts.get()
+        auth = self.auth(self.fans[0])
+        user_cache.clear()
+        # Page count and page, over the snapshot's IDs only
+        with query_budget(3):
+            response = await self.tclient.get("/trending?enriched=true", headers=auth)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(LIVE_COALESCE_INTERVAL=0.05, LIVE_HEARTBEAT_INTERVAL=1)
+class LiveUpdatesTest(TestCase):
+    def setUp(self) -> None:
+        self.author = User.objects.create_user(username="author")
+        self.fan = User.objects.create_user(username="fan")
+        self.posts = [
+            Post.objects.create(content=f"Post {i}", author=self.author)
+            for i in range(2)
+        ]
+        self.headers = {
+            "Authorization": f"Bearer {RefreshToken.for_user(self.fan).access_token}"
+        }
+
+    async def open(self, *posts: Post):
+        ids = "&".join(f"ids={post.pk}" for post in posts)
+        with query_budget(0):
+            response = await self.async_client.get(f"/api/posts/live?{ids}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = aiter(response.streaming_content)
+        self.assertEqual(await anext(events), b"retry: 3000\n\n")
+        return events
+
+    async def next_event(self, events) -> dict:
+        chunk = (await anext(events)).decode()
+        name, data = chunk.removesuffix("\n\n").split("\n")
+        self.assertEqual(name, "event: post")
+        return json.loads(data.removeprefix("data: "))
+
+    async def disconnect(self, events) -> None:
+        # The ASGI handler cancels the response while it waits for changes
+        waiting = asyncio.create_task(anext(events))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+
+    async def send(self, method: str, path: str, data=None) -> dict:
+        response = await getattr(self.async_client, method)(
+            path, data, content_type="application/json", headers=self.headers
+        )
+        self.assertLess(response.status_code, 300, response.content)
+        return response.json() if response.content else {}
+
+    async def test_streams_merged_changes_of_followed_posts(self):
+        followed, other = self.posts
+        events = await self.open(followed)
+        self.assertEqual(live.hub.subscription_count(), 1)
+
+        await self.send("post", "/api/reactions/", {"post_id": other.pk})
+        await self.send("post", "/api/reactions/", {"post_id": followed.pk})
+        await self.send(
+            "post",
+            "/api/reactions/",
+            {"post_id": followed.pk, "reaction_type": "dislike"},
+        )
+        comment = await self.send(
+            "post", "/api/comments/", {"post_id": followed.pk, "content": "Hi"}
+        )
+        self.assertEqual(
+            await self.next_event(events),
+            {
+                "post_id": followed.pk,
+                "likes": 0,
+                "dislikes": 1,
+                "comments": 1,
+                "comment_ids": [comment["id"]],
+            },
+        )
+
+        await self.send("delete", f"/api/comments/{comment['id']}")
+        await self.send("delete", f"/api/reactions/{followed.pk}")
+        event = await self.next_event(events)
+        self.assertEqual((event["dislikes"], event["comments"]), (-1, -1))
+
+        await self.disconnect(events)
+        self.assertEqual(live.hub.subscription_count(), 0)
+
+    async def test_sends_heartbeats_while_idle(self):
+        events = await self.open(self.posts[0])
+        self.assertEqual(await anext(events), b": keep-alive\n\n")
+        await self.disconnect(events)
+
+    async def test_limits_followed_posts(self):
+        ids = "&".join(f"ids={i}" for i in range(settings.LIVE_MAX_POSTS + 1))
+        response = await self.async_client.get(f"/api/posts/live?{ids}")
+        self.assertEqual(response.status_code, 422)
+
+
+class LiveHubTest(TestCase):
+    def test_merges_pending_changes_per_post(self):
+        hub = live.Hub()
+        first = hub.subscribe([1, 2])
+        second = hub.subscribe([2])
+        hub.deliver({"post_id": 1, "likes": 1})
+        hub.deliver({"post_id": 2, "comments": 1, "comment_ids": [7]})
+        hub.deliver({"post_id": 1, "likes": -1})
+        hub.deliver({"post_id": 3, "likes": 1})
+
+        # Changes that cancel out aren't sent
+        self.assertEqual(
+            first.take(),
+            [
+                {
+                    "post_id": 2,
+                    "likes": 0,
+                    "dislikes": 0,
+                    "comments": 1,
+                    "comment_ids": [7],
+                }
+            ],
+        )
+        self.assertEqual(len(second.take()), 1)
+        self.assertEqual(first.take(), [])
+
+        hub.unsubscribe(first)
+        hub.unsubscribe(second)
+        self.assertEqual(hub.subscription_count(), 0)
+        self.assertEqual(hub._subscriptions, {})
+
+    @override_settings(LIVE_CHANNEL="murmur_live_test")
+    async def test_postgres_broadcast_relays_through_notify(self):
+        hub = live.Hub()
+        subscription = hub.subscribe([1])
+        broadcast = live.PostgresBroadcast(hub)
+        await broadcast.start()
+        try:
+            # Until the listener is connected, notifications aren't received
+            for _ in range(50):
+                await broadcast.publish({"post_id": 1, "likes": 1})
+                if await subscription.wait(0.1):
+                    break
+            self.assertGreaterEqual(subscription.take()[0]["likes"], 1)
+        finally:
+            broadcast._listener.cancel()
+            await broadcast._notifier.close()
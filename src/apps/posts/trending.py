@@ -0,0 +1,124 @@
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, FloatField, Func, QuerySet, Value
+
+from murmur.tasks import run_in_background
+from posts.models import Post
+
+# Post.trending_score is log2 of the post's engagement, each reaction or
+# comment weighted by 2 ** (its Unix time / TRENDING_HALF_LIFE). Comparing
+# scores at any moment is comparing engagement decayed to that moment, so a
+# score only changes when engagement is added or taken back, never as time
+# passes. The log-space sums are done by the posts_trending_add and
+# posts_trending_remove SQL functions, see posts/migrations/0007.
+
+
+class _Engagement(Func):
+    output_field = FloatField()
+
+    def __init__(self, weight: float, at: datetime):
+        super().__init__(
+            F("trending_score"),
+            Value(weight),
+            Value(at),
+            Value(settings.TRENDING_HALF_LIFE),
+        )
+
+
+class Engaged(_Engagement):
+    """`trending_score` with engagement of `weight` made at `at` added."""
+
+    function = "posts_trending_add"
+
+
+class Disengaged(_Engagement):
+    """`trending_score` with engagement of `weight` made at `at` taken back."""
+
+    function = "posts_trending_remove"
+
+
+def take_back(engagements: Iterable[tuple[int, float, datetime]]) -> None:
+    """
+    Take engagements, as (post ID, weight, made at), back out of their posts'
+    trending scores in one UPDATE, e.g. those of a purged account. Those of
+    one post are first folded into one engagement at the latest of their
+    times, weighing as much as all of them.
+    """
+    by_post: dict[int, list[tuple[float, datetime]]] = defaultdict(list)
+    for post_id, weight, at in engagements:
+        by_post[post_id].append((weight, at))
+    if not by_post:
+        return
+    half_life = settings.TRENDING_HALF_LIFE
+    params: list = []
+    for post_id, events in by_post.items():
+        latest = max(at for _, at in events)
+        weight = sum(
+            weight * 2 ** ((at - latest).total_seconds() / half_life)
+            for weight, at in events
+        )
+        params += [post_id, weight, latest]
+    values = ", ".join(["(%s::bigint, %s::float8, %s::timestamptz)"] * len(by_post))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {Post._meta.db_table} AS post
+            SET trending_score = posts_trending_remove(
+                post.trending_score, taken.weight, taken.at, %s
+            )
+            FROM (VALUES {values}) AS taken (id, weight, at)
+            WHERE post.id = taken.id
+            """,
+            [half_life, *params],
+        )
+
+
+class TrendingPosts:
+    """
+    IDs of the `size` best scored posts, read through the partial index on
+    trending_score. A snapshot older than `interval` seconds is served once
+    more while a background task reads the next, so requests never wait on
+    it except for the very first.
+    """
+
+    def __init__(self, size: int, interval: float) -> None:
+        self.size = size
+        self.interval = interval
+        self._ids: Optional[list[int]] = None
+        self._read_at = 0.0
+        self._refresh: Optional[asyncio.Task] = None
+
+    def ranked(self) -> QuerySet:
+        return (
+            Post.objects.filter(trending_score__isnull=False)
+            .order_by("-trending_score")
+            .values_list("pk", flat=True)[: self.size]
+        )
+
+    async def read(self) -> list[int]:
+        ids = [pk async for pk in self.ranked()]
+        self._ids, self._read_at = ids, time.monotonic()
+        return ids
+
+    async def get(self) -> list[int]:
+        if self._ids is None:
+            return await self.read()
+        stale = time.monotonic() - self._read_at >= self.interval
+        if stale and (self._refresh is None or self._refresh.done()):
+            self._refresh = run_in_background(self.read())
+        return self._ids
+
+    def clear(self) -> None:
+        self._ids = None
+        self._read_at = 0.0
+
+
+trending_posts = TrendingPosts(
+    settings.TRENDING_SIZE, settings.TRENDING_REFRESH_INTERVAL
+)
@@ -1,11 +1,13 @@
 from ninja import Query, Router
 from ninja.pagination import paginate
+from murmur.pagination import CursorPagination
 from murmur.security import AsyncTokenBasedAuth
 from reactions.schemas import (
     ReactionCreate,
     ReactionFilter,
     ReactionPublic,
     ReactionCount,
+    ReactionCountBatchQuery,
 )
 from reactions.services import ReactionService
 
@@ -41,6 +43,31 @@ async def get_list_of_reactions(request, filters: ReactionFilter = Query(...)):
     return await ReactionService.get_all(request, filters)
 
 
+@router.get("/cursor", response=list[ReactionPublic])
+@paginate(CursorPagination)
+async def get_list_of_reactions_by_cursor(
+    request,
+    filters: ReactionFilter = Query(...),  # type: ignore
+):
+    """
+    Get a list of reactions, newest first, using cursor pagination.
+    Accepts the same filters as the offset-paginated list.
+    """
+    return await ReactionService.get_all(request, filters)
+
+
+@router.get("/posts/counts", response=list[ReactionCount])
+async def get_reaction_counts_batch(
+    request,
+    query: ReactionCountBatchQuery = Query(...),  # type: ignore
+):
+    """
+    Get the count of likes and dislikes for up to 500 posts in one call.
+    Posts without reactions, or that don't exist, are returned with zeros.
+    """
+    return await ReactionService.get_reaction_counts_batch(request, query.ids)
+
+
 @router.get("/posts/{int:post_id}/count", response=ReactionCount)
 async def get_reaction_counts(request, post_id: int):
     """
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from posts.models import Post
+from reactions.models import Reaction, ReactionType
+
+
+def _count_of(reaction_type: str) -> Coalesce:
+    counts = (
+        Reaction.objects.filter(post=OuterRef("pk"), reaction_type=reaction_type)
+        .order_by()
+        .values("post")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return Coalesce(Subquery(counts), Value(0))
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the denormalized like/dislike counters on Post from the "
+        "Reaction table, in primary-key batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of posts updated per statement (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_pk = 0
+        updated = 0
+        while True:
+            pks = list(
+                Post.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            updated += Post.objects.filter(pk__in=pks).update(
+                like_count=_count_of(ReactionType.LIKE),
+                dislike_count=_count_of(ReactionType.DISLIKE),
+            )
+            last_pk = pks[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt counters for {updated} posts"))
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-17 08:46
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without locking out writes to the table
+    atomic = False
+
+    dependencies = [
+        ("posts", "0006_post_posts_post_author__691f2d_idx"),
+        ("reactions", "0002_reaction_reactions_r_created_76c11f_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="reaction",
+            index=models.Index(
+                fields=["post", "created_at", "id"],
+                name="reactions_r_post_id_383cfc_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="reaction",
+            index=models.Index(
+                fields=["user", "created_at", "id"],
+                name="reactions_r_user_id_cf5e9e_idx",
+            ),
+        ),
+    ]
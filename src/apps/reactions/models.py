@@ -32,6 +32,10 @@ class Reaction(models.Model):
         indexes = [
             models.Index(fields=["post", "reaction_type"]),
             models.Index(fields=["user", "post"]),
+            models.Index(fields=["created_at", "id"]),
+            # Newest-first lists of one post's or one user's reactions
+            models.Index(fields=["post", "created_at", "id"]),
+            models.Index(fields=["user", "created_at", "id"]),
         ]
 
     def __str__(self):
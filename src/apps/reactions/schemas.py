@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from ninja import Field, FilterSchema, ModelSchema, Schema
 from reactions.models import Reaction, ReactionType
@@ -46,3 +46,12 @@ class ReactionCount(Schema):
     post_id: int
     likes: int
     dislikes: int
+
+
+class ReactionCountBatchQuery(Schema):
+    """
+    Query schema for fetching reaction counts of many posts at once.
+    Pass the post IDs as repeated `ids` parameters.
+    """
+
+    ids: List[int] = Field(..., min_length=1, max_length=500)
@@ -1,13 +1,155 @@
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
 from django.shortcuts import aget_object_or_404
+from django.utils import timezone
 from ninja.errors import HttpError
+from murmur import live, querycache
 from posts.models import Post
 from reactions.models import Reaction, ReactionType
 from reactions.schemas import ReactionCreate, ReactionFilter, ReactionCount
 
 
+# Post column holding the denormalized total for each reaction type
+COUNTER_FIELDS = {
+    ReactionType.LIKE: "like_count",
+    ReactionType.DISLIKE: "dislike_count",
+}
+# Name of each reaction type's counter in live updates
+LIVE_COUNTERS = {
+    ReactionType.LIKE: "likes",
+    ReactionType.DISLIKE: "dislikes",
+}
+
+# Upsert the reaction and shift the post counters in a single statement.
+# INSERT ... SELECT only inserts when the post exists. The conditional
+# DO UPDATE returns a row only when the row is inserted or its type actually
+# flips; the conflicting row is locked and re-checked, so concurrent toggles
+# from the same user can neither hit the unique constraint nor double count.
+# With two reaction types a flip always takes one from the other counter.
+# Only a new reaction counts as engagement for the post's trending score.
+UPSERT_REACTION_SQL = """
+WITH upserted AS (
+    INSERT INTO {reaction_table} AS r
+        (user_id, post_id, reaction_type, created_at, updated_at)
+    SELECT %(user_id)s, p.id, %(reaction_type)s, %(now)s, %(now)s
+    FROM {post_table} p
+    WHERE p.id = %(post_id)s
+    ON CONFLICT (user_id, post_id) DO UPDATE
+        SET reaction_type = EXCLUDED.reaction_type, updated_at = EXCLUDED.updated_at
+        WHERE r.reaction_type <> EXCLUDED.reaction_type
+    RETURNING r.id, r.created_at, r.updated_at, (r.xmax = 0) AS inserted
+), counters AS (
+    UPDATE {post_table}
+    SET {gained} = {gained} + 1,
+        {lost} = {lost} - CASE WHEN upserted.inserted THEN 0 ELSE 1 END,
+        trending_score = CASE
+            WHEN upserted.inserted THEN posts_trending_add(
+                trending_score, %(weight)s, %(now)s, %(half_life)s
+            )
+            ELSE trending_score
+        END
+    FROM upserted
+    WHERE {post_table}.id = %(post_id)s
+)
+SELECT id, created_at, updated_at, inserted FROM upserted
+"""
+
+# Delete the reaction, decrement the matching counter and take the reaction
+# back out of the trending score in one statement
+DELETE_REACTION_SQL = """
+WITH deleted AS (
+    DELETE FROM {reaction_table}
+    WHERE user_id = %(user_id)s AND post_id = %(post_id)s
+    RETURNING post_id, reaction_type, created_at
+), counters AS (
+    UPDATE {post_table}
+    SET like_count = like_count - (deleted.reaction_type = %(like)s)::int,
+        dislike_count = dislike_count - (deleted.reaction_type = %(dislike)s)::int,
+        trending_score = posts_trending_remove(
+            trending_score, %(weight)s, deleted.created_at, %(half_life)s
+        )
+    FROM deleted
+    WHERE {post_table}.id = deleted.post_id
+)
+SELECT reaction_type FROM deleted
+"""
+
+
 class ReactionService:
     """Service class for managing reaction operations."""
 
+    @staticmethod
+    def _upsert_reaction(
+        user_id: int, post_id: int, reaction_type: str
+    ) -> tuple[Optional[Reaction], dict[str, int]]:
+        """
+        Create or update a reaction with UPSERT_REACTION_SQL. Returns the
+        reaction, None if the post doesn't exist, and how the post's counters
+        changed by their LIVE_COUNTERS name.
+        """
+        (other_type,) = set(COUNTER_FIELDS) - {reaction_type}
+        sql = UPSERT_REACTION_SQL.format(
+            reaction_table=Reaction._meta.db_table,
+            post_table=Post._meta.db_table,
+            gained=COUNTER_FIELDS[reaction_type],  # type: ignore
+            lost=COUNTER_FIELDS[other_type],
+        )
+        params = {
+            "user_id": user_id,
+            "post_id": post_id,
+            "reaction_type": reaction_type,
+            "now": timezone.now(),
+            "weight": settings.TRENDING_REACTION_WEIGHT,
+            "half_life": settings.TRENDING_HALF_LIFE,
+        }
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+
+        if row is None:
+            # Either the post is missing or the reaction already had this type
+            existing = Reaction.objects.filter(user_id=user_id, post_id=post_id)
+            return existing.first(), {}
+
+        pk, created_at, updated_at, inserted = row
+        changes = {LIVE_COUNTERS[reaction_type]: 1}  # type: ignore
+        if not inserted:
+            changes[LIVE_COUNTERS[other_type]] = -1
+        reaction = Reaction(
+            pk=pk,
+            user_id=user_id,
+            post_id=post_id,
+            reaction_type=reaction_type,
+            created_at=created_at,
+            updated_at=updated_at,
+        )
+        return reaction, changes
+
+    @staticmethod
+    def _delete_reaction(user_id: int, post_id: int) -> Optional[str]:
+        """
+        Delete a reaction with DELETE_REACTION_SQL. Returns the type of the
+        deleted reaction, or None if none existed.
+        """
+        sql = DELETE_REACTION_SQL.format(
+            reaction_table=Reaction._meta.db_table, post_table=Post._meta.db_table
+        )
+        params = {
+            "user_id": user_id,
+            "post_id": post_id,
+            "like": ReactionType.LIKE,
+            "dislike": ReactionType.DISLIKE,
+            "weight": settings.TRENDING_REACTION_WEIGHT,
+            "half_life": settings.TRENDING_HALF_LIFE,
+        }
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        return None if row is None else row[0]
+
     @staticmethod
     async def create_reaction(request, payload: ReactionCreate) -> Reaction:
         """
@@ -28,24 +170,14 @@ class ReactionService:
             if payload.reaction_type not in [ReactionType.LIKE, ReactionType.DISLIKE]:
                 raise HttpError(422, f"Invalid reaction type: {payload.reaction_type}")
 
-            # Check if post exists
-            post = await aget_object_or_404(Post.objects, pk=payload.post_id)
-
-            # Try to get existing reaction
-            reaction = await Reaction.objects.filter(
-                user=request.auth, post=post
-            ).afirst()
-            if reaction:
-                # Update existing reaction
-                reaction.reaction_type = payload.reaction_type
-                await reaction.asave()
-            else:
-                # Create new reaction
-                reaction = Reaction(
-                    user=request.auth, post=post, reaction_type=payload.reaction_type
-                )
-                await reaction.asave()
-
+            reaction, changes = await sync_to_async(ReactionService._upsert_reaction)(
+                request.auth.pk, payload.post_id, payload.reaction_type
+            )
+            if reaction is None:
+                raise HttpError(404, "Not Found")
+            if changes:
+                await querycache.changed(Reaction, [payload.post_id])
+                await live.publish(payload.post_id, **changes)
             return reaction
         except HttpError as e:
             raise e
@@ -64,14 +196,13 @@ class ReactionService:
         Raises:
             HttpError: If the reaction doesn't exist or deletion fails
         """
-        # Check if post exists
-        post = await aget_object_or_404(Post.objects, pk=post_id)
-
-        # Try to get and delete existing reaction
-        reaction = await aget_object_or_404(
-            Reaction.objects.select_related("post"), user=request.auth, post=post
+        reaction_type = await sync_to_async(ReactionService._delete_reaction)(
+            request.auth.pk, post_id
         )
-        await reaction.adelete()
+        if reaction_type is None:
+            raise HttpError(404, "Not Found")
+        await querycache.changed(Reaction, [post_id])
+        await live.publish(post_id, **{LIVE_COUNTERS[reaction_type]: -1})  # type: ignore
 
     @staticmethod
     async def get_all(request, filters: ReactionFilter):
@@ -83,15 +214,24 @@ class ReactionService:
             filters: Filter parameters for reactions
 
         Returns:
-            Filtered queryset of Reaction objects
+            Filtered queryset of Reaction objects, newest first, whose pages
+            are served from the queryset cache
         """
-        reactions = Reaction.objects.all()
-        return filters.filter(reactions)
+        reactions = Reaction.objects.order_by("-created_at", "-id")
+        key = ("reactions", filters.model_dump(exclude_none=True))
+        if filters.post is not None:
+            results = querycache.CachedResults(
+                key, post_models=[Reaction], post_id=filters.post
+            )
+        else:
+            results = querycache.CachedResults(key, models=[Reaction])
+        return querycache.cache_results(filters.filter(reactions), results)
 
     @staticmethod
     async def get_reaction_counts(request, post_id: int) -> ReactionCount:
         """
         Get the count of likes and dislikes for a post.
+        Reads the denormalized counters, so this is a single primary-key lookup.
 
         Args:
             request: HTTP request object
@@ -104,20 +244,46 @@ class ReactionService:
             HttpError: If the post doesn't exist
         """
         try:
-            # Check if post exists
-            post = await aget_object_or_404(Post.objects, pk=post_id)
-
-            likes = await Reaction.objects.filter(
-                post=post, reaction_type=ReactionType.LIKE
-            ).acount()
-            dislikes = await Reaction.objects.filter(
-                post=post, reaction_type=ReactionType.DISLIKE
-            ).acount()
-
-            return ReactionCount(post_id=post.pk, likes=likes, dislikes=dislikes)
+            post = await aget_object_or_404(
+                Post.objects.only("like_count", "dislike_count"), pk=post_id
+            )
+            return ReactionCount(
+                post_id=post.pk, likes=post.like_count, dislikes=post.dislike_count
+            )
         except Exception as e:
             raise HttpError(500, f"Failed to get reaction counts: {e}")
 
+    @staticmethod
+    async def get_reaction_counts_batch(
+        request, post_ids: list[int]
+    ) -> list[ReactionCount]:
+        """
+        Get the count of likes and dislikes for many posts with one query.
+
+        Args:
+            request: HTTP request object
+            post_ids: The IDs of the posts to get counts for
+
+        Returns:
+            One ReactionCount per distinct ID, in request order. Missing
+            posts are reported with zero likes and dislikes.
+        """
+        post_ids = list(dict.fromkeys(post_ids))
+        counts = {
+            pk: (likes, dislikes)
+            async for pk, likes, dislikes in Post.objects.filter(
+                pk__in=post_ids
+            ).values_list("pk", "like_count", "dislike_count")
+        }
+        return [
+            ReactionCount(
+                post_id=pk,
+                likes=counts.get(pk, (0, 0))[0],
+                dislikes=counts.get(pk, (0, 0))[1],
+            )
+            for pk in post_ids
+        ]
+
     @staticmethod
     async def get_user_reaction(request, post_id: int) -> Reaction:
         """
@@ -1,15 +1,26 @@
-from django.test import TestCase
+import random
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
 from ninja.testing import TestAsyncClient
 from django.contrib.auth.models import User
 
 from ninja_jwt.tokens import RefreshToken
+from accounts.cache import user_cache
+from murmur import querycache
+from murmur.testing import query_budget
 from posts.models import Post
 from reactions.models import Reaction, ReactionType
 from reactions.apis import router
+from reactions.services import ReactionService
 
 
 class ReactionsTest(TestCase):
     def setUp(self) -> None:
+        querycache.clear()
         # Create test users
         self.user1 = User.objects.create_user(
             username="testuser1", password="password123"
@@ -35,6 +46,9 @@ class ReactionsTest(TestCase):
         )
         self.reaction2.save()
 
+        # Fixtures bypass ReactionService, so sync the post counters once
+        call_command("rebuild_reaction_counts", stdout=StringIO())
+
         self.tclient = TestAsyncClient(router)
 
         # Get JWT token for authentication tests
@@ -96,6 +110,26 @@ class ReactionsTest(TestCase):
         )  # type: ignore
         self.assertEqual(response.status_code, 422)
 
+    async def test_should_fail_react_to_missing_post(self):
+        missing_id = self.post2.pk + 1000
+        response = await self.tclient.post(
+            "/",
+            json={"post_id": missing_id, "reaction_type": ReactionType.LIKE},
+            headers={"Authorization": f"Bearer {self.token_user1}"},
+        )  # type: ignore
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(await Reaction.objects.filter(post_id=missing_id).aexists())
+
+    async def test_reacting_twice_with_same_type_is_a_noop(self):
+        headers = {"Authorization": f"Bearer {self.token_user1}"}
+        payload = {"post_id": self.post2.pk, "reaction_type": ReactionType.LIKE}
+        response = await self.tclient.post("/", json=payload, headers=headers)  # type: ignore
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["id"], self.reaction1.pk)
+
+        post = await Post.objects.aget(pk=self.post2.pk)
+        self.assertEqual((post.like_count, post.dislike_count), (1, 0))
+
     async def test_delete_reaction(self):
         # Delete user1's reaction to post2
         response = await self.tclient.delete(
@@ -111,10 +145,12 @@ class ReactionsTest(TestCase):
 
     async def test_get_reaction_counts(self):
         # Add more reactions to have interesting counts
-        reaction = Reaction(
-            user=self.user1, post=self.post, reaction_type=ReactionType.LIKE
-        )
-        await reaction.asave()
+        response = await self.tclient.post(
+            "/",
+            json={"post_id": self.post.pk, "reaction_type": ReactionType.LIKE},
+            headers={"Authorization": f"Bearer {self.token_user1}"},
+        )  # type: ignore
+        self.assertEqual(response.status_code, 201)
 
         # Get counts for post1
         response = await self.tclient.get(f"/posts/{self.post.pk}/count")  # type: ignore
@@ -124,6 +160,61 @@ class ReactionsTest(TestCase):
         self.assertEqual(json_data["likes"], 1)  # user1's like
         self.assertEqual(json_data["dislikes"], 1)  # user2's dislike
 
+    async def test_get_reaction_counts_batch(self):
+        missing_id = self.post2.pk + 1000
+        response = await self.tclient.get(
+            f"/posts/counts?ids={self.post.pk}&ids={self.post2.pk}&ids={missing_id}"
+            f"&ids={self.post.pk}"
+        )  # type: ignore
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            [
+                {"post_id": self.post.pk, "likes": 0, "dislikes": 1},
+                {"post_id": self.post2.pk, "likes": 1, "dislikes": 0},
+                {"post_id": missing_id, "likes": 0, "dislikes": 0},
+            ],
+        )
+
+    async def test_get_reaction_counts_batch_requires_ids(self):
+        response = await self.tclient.get("/posts/counts")  # type: ignore
+        self.assertEqual(response.status_code, 422)
+
+    async def test_counters_follow_create_flip_and_delete(self):
+        headers = {"Authorization": f"Bearer {self.token_user1}"}
+
+        # New like; the dislike from user2 is untouched
+        await self.tclient.post(
+            "/",
+            json={"post_id": self.post.pk, "reaction_type": ReactionType.LIKE},
+            headers=headers,
+        )  # type: ignore
+        post = await Post.objects.aget(pk=self.post.pk)
+        self.assertEqual((post.like_count, post.dislike_count), (1, 1))
+
+        # Flip the like to a dislike
+        await self.tclient.post(
+            "/",
+            json={"post_id": self.post.pk, "reaction_type": ReactionType.DISLIKE},
+            headers=headers,
+        )  # type: ignore
+        post = await Post.objects.aget(pk=self.post.pk)
+        self.assertEqual((post.like_count, post.dislike_count), (0, 2))
+
+        # Remove it again
+        await self.tclient.delete(f"/{self.post.pk}", headers=headers)  # type: ignore
+        post = await Post.objects.aget(pk=self.post.pk)
+        self.assertEqual((post.like_count, post.dislike_count), (0, 1))
+
+    def test_rebuild_reaction_counts_repairs_drift(self):
+        Post.objects.filter(pk=self.post.pk).update(like_count=42, dislike_count=-3)
+
+        call_command("rebuild_reaction_counts", batch_size=1, stdout=StringIO())
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+        self.assertEqual(self.post.dislike_count, 1)
+
     async def test_get_user_reaction(self):
         # Get user2's reaction to post1
         response = await self.tclient.get(
@@ -177,3 +268,87 @@ class ReactionsTest(TestCase):
 
         # We should have retrieved all reactions
         self.assertEqual(len(all_reactions), total_reactions)
+
+    async def test_get_reactions_with_cursor_pagination(self):
+        total_reactions = await Reaction.objects.acount()
+        all_reactions = []
+
+        response = await self.tclient.get("/cursor?limit=1")  # type: ignore
+        while True:
+            self.assertEqual(response.status_code, 200)
+            json_data = response.json()
+            all_reactions.extend(json_data["items"])
+            if json_data["next"] is None:
+                break
+            response = await self.tclient.get(
+                f"/cursor?limit=1&cursor={json_data['next']}"
+            )  # type: ignore
+
+        self.assertEqual(len(all_reactions), total_reactions)
+        self.assertEqual(
+            [item["id"] for item in all_reactions],
+            [self.reaction2.pk, self.reaction1.pk],
+        )
+
+    async def test_query_budgets(self):
+        auth = {"Authorization": f"Bearer {self.token_user1}"}
+        payload = {"post_id": self.post.pk, "reaction_type": ReactionType.LIKE}
+        routes = [
+            ("get", f"/?post={self.post.pk}", {}, 2),
+            ("get", f"/cursor?post={self.post.pk}", {}, 1),
+            ("get", f"/posts/counts?ids={self.post.pk}&ids={self.post2.pk}", {}, 1),
+            ("get", f"/posts/{self.post.pk}/count", {}, 1),
+            ("post", "/", {"headers": auth, "json": payload}, 2),
+            ("get", f"/posts/{self.post.pk}/my-reaction", {"headers": auth}, 3),
+            ("delete", f"/{self.post.pk}", {"headers": auth}, 2),
+        ]
+        for method, path, kwargs, budget in routes:
+            # Worst case: the token's user isn't cached yet
+            user_cache.clear()
+            with self.subTest(f"{method.upper()} {path}"), query_budget(budget):
+                response = await getattr(self.tclient, method)(path, **kwargs)
+                self.assertLess(response.status_code, 400)
+
+
+class ReactionConcurrencyTest(TransactionTestCase):
+    """
+    Hammers a single post with simultaneous toggles from a handful of users,
+    each worker thread on its own database connection.
+    """
+
+    def setUp(self) -> None:
+        self.users = [
+            User.objects.create_user(username=f"racer{i}", password="password123")
+            for i in range(10)
+        ]
+        author = User.objects.create_user(username="author", password="password123")
+        self.post = Post.objects.create(content="Hot post", author=author)
+
+    def _toggle(self, seed: int) -> None:
+        rng = random.Random(seed)
+        user = rng.choice(self.users)
+        try:
+            if rng.random() < 0.2:
+                ReactionService._delete_reaction(user.pk, self.post.pk)
+            else:
+                reaction_type = rng.choice([ReactionType.LIKE, ReactionType.DISLIKE])
+                ReactionService._upsert_reaction(user.pk, self.post.pk, reaction_type)
+        finally:
+            connection.close()
+
+    def test_concurrent_toggles_keep_counters_exact(self):
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            # list() re-raises any exception from the workers
+            list(pool.map(self._toggle, range(400)))
+
+        self.post.refresh_from_db()
+        reactions = Reaction.objects.filter(post=self.post)
+        self.assertLessEqual(reactions.count(), len(self.users))
+        self.assertEqual(
+            self.post.like_count,
+            reactions.filter(reaction_type=ReactionType.LIKE).count(),
+        )
+        self.assertEqual(
+            self.post.dislike_count,
+            reactions.filter(reaction_type=ReactionType.DISLIKE).count(),
+        )
@@ -0,0 +1,258 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+
+from murmur.metrics import Collected, Counter, operation_id
+
+# Why a request was turned away: the line it would wait in was full, or it
+# waited longer than its deadline
+QUEUE_FULL, TIMED_OUT = "queue_full", "timeout"
+
+# Waiting requests of a lower priority value are let in first
+CRITICAL, NORMAL = 0, 1
+
+
+class Gate:
+    """
+    Lets at most `limit` requests in at once. The rest wait in line, at most
+    `limit` of them, by priority and then arrival, each until its deadline.
+    """
+
+    def __init__(self, limit: float) -> None:
+        self.limit = limit
+        self.in_flight = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._arrivals = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: float, priority: int = NORMAL) -> Optional[str]:
+        """
+        Take a slot, waiting up to `timeout` seconds for one. Returns None
+        once taken, or why the request should be rejected.
+        """
+        if not self._waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return None
+        if timeout <= 0 or len(self._waiters) >= max(int(self.limit), 1):
+            return QUEUE_FULL
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._arrivals), waiter)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot just as the deadline passed
+                return None
+            self._forget(entry)
+            return TIMED_OUT
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot just as the client went away
+                Gate.release(self)
+            else:
+                self._forget(entry)
+            raise
+        return None
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        # Hand freed slots straight to the next in line
+        while self._waiters and self.in_flight < int(self.limit):
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _forget(self, entry: tuple) -> None:
+        # Unless release() already dropped it while handing out a slot
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+
+
+class AdaptiveLimit(Gate):
+    """
+    A Gate whose limit is adjusted AIMD-style from the latency of the
+    requests it lets in. A request slower than `tolerance` times the
+    baseline (the fastest recent request, i.e. the latency without load) or
+    failing with a 5xx cuts the limit by `backoff`, at most once per such
+    latency so one congested moment isn't punished by every request it
+    slowed. Requests that are fast enough while the limit is at least half
+    used raise it by about one per limit's worth of requests.
+    """
+
+    # Samples after which the baseline is reset to the window's fastest, so
+    # it follows lasting changes, e.g. a bigger database
+    window = 500
+
+    def __init__(
+        self,
+        initial: float,
+        minimum: float,
+        maximum: float,
+        tolerance: float,
+        backoff: float,
+    ) -> None:
+        super().__init__(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self._baseline: Optional[float] = None
+        self._window_min = float("inf")
+        self._samples = 0
+        self._decreased_at = 0.0
+
+    def release(self, latency: Optional[float] = None, failed: bool = False) -> None:
+        """Free a slot, learning from the request's `latency` when given."""
+        if latency is not None:
+            self._adjust(latency, failed)
+        super().release()
+
+    def _adjust(self, latency: float, failed: bool) -> None:
+        self._samples += 1
+        self._window_min = min(self._window_min, latency)
+        if self._baseline is None or self._samples >= self.window:
+            self._baseline = self._window_min
+            self._window_min = float("inf")
+            self._samples = 0
+        self._baseline = min(self._baseline, latency)
+
+        now = time.monotonic()
+        if failed or latency > self._baseline * self.tolerance:
+            if now - self._decreased_at >= latency:
+                self.limit = max(self.minimum, self.limit * self.backoff)
+                self._decreased_at = now
+        elif self.in_flight >= self.limit / 2:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+
+_limits: dict[str, AdaptiveLimit] = {}
+_in_flight: Optional[Gate] = None
+
+
+def limit_for(operation: str) -> AdaptiveLimit:
+    limit = _limits.get(operation)
+    if limit is None:
+        limit = _limits[operation] = AdaptiveLimit(
+            settings.ADMISSION_INITIAL_LIMIT,
+            settings.ADMISSION_MIN_LIMIT,
+            settings.ADMISSION_MAX_LIMIT,
+            settings.ADMISSION_LATENCY_TOLERANCE,
+            settings.ADMISSION_BACKOFF,
+        )
+    return limit
+
+
+def in_flight_gate() -> Gate:
+    """The limit of requests running at once across every route."""
+    global _in_flight
+    if _in_flight is None:
+        _in_flight = Gate(settings.ADMISSION_MAX_IN_FLIGHT)
+    return _in_flight
+
+
+def reset() -> None:
+    """Forget every limit, e.g. between tests."""
+    global _in_flight
+    _limits.clear()
+    _in_flight = None
+
+
+rejected_total = Counter(
+    "murmur_admission_rejected_total",
+    "Requests answered 503 by admission control, by ninja operation and reason.",
+    ["operation", "reason"],
+)
+concurrency_limit = Collected(
+    "murmur_admission_limit",
+    "Current adaptive concurrency limit, by ninja operation.",
+    ["operation"],
+    lambda: [((operation,), limit.limit) for operation, limit in _limits.items()],
+)
+
+
+class AdmissionControlMiddleware:
+    """
+    Admit a request only while both its route's AdaptiveLimit and the
+    process-wide ADMISSION_MAX_IN_FLIGHT have room, and answer the rest with
+    a fast 503 and Retry-After instead of letting them pile up on the
+    database. Requests for ADMISSION_CRITICAL_OPERATIONS (the health check
+    and single-item reads) go first when slots free up and wait up to
+    ADMISSION_CRITICAL_QUEUE_TIMEOUT seconds; others only
+    ADMISSION_QUEUE_TIMEOUT. Limits are per process and only enforced under
+    ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            self._release(request, failed=True)
+            raise
+        self._release(request, failed=response.status_code >= 500)
+        return response
+
+    async def process_view(self, request, view_func, view_args, view_kwargs):
+        if not (settings.ADMISSION_CONTROL and self.async_mode):
+            return None
+        operation = getattr(request, "metrics_operation", None) or operation_id(
+            request, view_func
+        )
+        if operation in settings.ADMISSION_CRITICAL_OPERATIONS:
+            priority, timeout = CRITICAL, settings.ADMISSION_CRITICAL_QUEUE_TIMEOUT
+        else:
+            priority, timeout = NORMAL, settings.ADMISSION_QUEUE_TIMEOUT
+
+        start = time.perf_counter()
+        limit = limit_for(operation)
+        reason = await limit.acquire(timeout, priority)
+        if reason is None:
+            waited = time.perf_counter() - start
+            reason = await in_flight_gate().acquire(timeout - waited, priority)
+            if reason is not None:
+                limit.release()
+        if reason is not None:
+            return self._reject(operation, reason)
+        request.admission = (limit, time.perf_counter())
+        return None
+
+    def _release(self, request, failed: bool) -> None:
+        admission = getattr(request, "admission", None)
+        if admission is not None:
+            limit, start = admission
+            del request.admission
+            in_flight_gate().release()
+            limit.release(time.perf_counter() - start, failed)
+
+    def _reject(self, operation: str, reason: str) -> JsonResponse:
+        rejected_total.inc(operation, reason)
+        response = JsonResponse(
+            {"detail": "The server is overloaded, retry later"}, status=503
+        )
+        response["Retry-After"] = str(settings.ADMISSION_RETRY_AFTER)
+        return response
@@ -0,0 +1,32 @@
+import hashlib
+from typing import Any, Optional
+
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Strong ETag derived from the parts that identify a representation, e.g.
+    the resource kind, its primary key and its row version.
+    """
+    raw = ":".join(str(part) for part in parts).encode()
+    return quote_etag(hashlib.md5(raw, usedforsecurity=False).hexdigest())
+
+
+def not_modified(
+    request: HttpRequest, response: HttpResponse, etag: str
+) -> Optional[HttpResponseNotModified]:
+    """
+    Tag ninja's temporal `response` with `etag`. If the request's
+    If-None-Match already matches it, return the 304 to send back instead
+    of serializing the body, otherwise None.
+    """
+    response["ETag"] = etag
+    # If-None-Match uses the weak comparison (RFC 9110, section 13.1.2)
+    candidates = parse_etags(request.headers.get("If-None-Match", ""))
+    if "*" in candidates or etag in (tag.removeprefix("W/") for tag in candidates):
+        cached = HttpResponseNotModified()
+        cached["ETag"] = etag
+        return cached
+    return None
@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger("murmur.requests")
+
+
+class QueryStats:
+    """Queries executed, and time spent in the database, within a scope."""
+
+    def __init__(self, capture: bool = False) -> None:
+        self.count = 0
+        self.duration = 0.0
+        # SQL of each query, only kept when asked for (e.g. by query_budget)
+        self.queries: Optional[list[str]] = [] if capture else None
+        self._lock = threading.Lock()
+
+    def add(self, sql: str, duration: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.duration += duration
+            if self.queries is not None:
+                self.queries.append(sql)
+
+
+# Scopes being tracked in the current context. Context variables are copied
+# into sync_to_async threads, so async ORM queries are attributed correctly.
+_active: ContextVar[tuple[QueryStats, ...]] = ContextVar(
+    "murmur_query_stats", default=()
+)
+
+
+def _record(execute, sql, params, many, context):
+    active = _active.get()
+    if not active:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        for stats in active:
+            stats.add(sql, elapsed)
+
+
+def instrument(connection, **kwargs) -> None:
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+# Connected on import, which CoreConfig.ready() does before any connection
+connection_created.connect(instrument)
+
+
+@contextmanager
+def track_queries(capture: bool = False) -> Iterator[QueryStats]:
+    """
+    Count the queries run in this context (including its sync_to_async
+    calls) until the block exits. Scopes nest.
+    """
+    stats = QueryStats(capture)
+    token = _active.set(_active.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
+
+
+def _report(request, response, stats: QueryStats, elapsed: float) -> None:
+    db_ms = stats.duration * 1000
+    total_ms = elapsed * 1000
+    if settings.SERVER_TIMING_HEADER:
+        response["Server-Timing"] = (
+            f'db;dur={db_ms:.1f};desc="{stats.count} queries", total;dur={total_ms:.1f}'
+        )
+    level = (
+        logging.WARNING
+        if stats.count > settings.QUERY_COUNT_WARNING_THRESHOLD
+        else logging.INFO
+    )
+    logger.log(
+        level,
+        "method=%s path=%s status=%s queries=%d db_ms=%.1f total_ms=%.1f",
+        request.method,
+        request.path,
+        response.status_code,
+        stats.count,
+        db_ms,
+        total_ms,
+        extra={
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "queries": stats.count,
+            "db_ms": round(db_ms, 1),
+            "total_ms": round(total_ms, 1),
+        },
+    )
+
+
+@sync_and_async_middleware
+def query_instrumentation_middleware(get_response):
+    """
+    Count the queries and database time of every request. They are sent
+    back in a Server-Timing header and logged to `murmur.requests`, at
+    WARNING level above QUERY_COUNT_WARNING_THRESHOLD queries.
+    """
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            start = time.perf_counter()
+            with track_queries() as stats:
+                response = await get_response(request)
+            _report(request, response, stats, time.perf_counter() - start)
+            return response
+
+    else:
+
+        def middleware(request):
+            start = time.perf_counter()
+            with track_queries() as stats:
+                response = get_response(request)
+            _report(request, response, stats, time.perf_counter() - start)
+            return response
+
+    return middleware
@@ -0,0 +1,246 @@
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Iterable, Optional
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Live updates of posts, e.g. reactions and comments as they are made. Writes
+# publish one small event per change through the broadcast backend, which
+# hands it to the hub of every worker; each hub fans it out in memory to the
+# subscriptions of that post. A subscription merges whatever arrived since
+# its stream last wrote, so a slow client gets fewer, larger events instead
+# of a growing backlog. Events are hints sent at most once: a client that
+# reconnects should re-read what it shows.
+
+# Counters an event may shift, and the list new comment IDs are added to
+DELTAS = ("likes", "dislikes", "comments")
+NEW_COMMENTS = "comment_ids"
+
+
+class Subscription:
+    """Pending changes of some posts, merged until the stream takes them."""
+
+    def __init__(self, post_ids: Iterable[int]) -> None:
+        self.post_ids = frozenset(post_ids)
+        self._pending: dict[int, dict] = {}
+        self._ready = asyncio.Event()
+
+    def push(self, event: dict) -> None:
+        post_id = event["post_id"]
+        pending = self._pending.get(post_id)
+        if pending is None:
+            pending = self._pending[post_id] = {
+                "post_id": post_id,
+                **dict.fromkeys(DELTAS, 0),
+                NEW_COMMENTS: [],
+            }
+        for name in DELTAS:
+            pending[name] += event.get(name, 0)
+        pending[NEW_COMMENTS].extend(event.get(NEW_COMMENTS, ()))
+        self._ready.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for changes; returns whether any came."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except TimeoutError:
+            return False
+        return True
+
+    def take(self) -> list[dict]:
+        """The merged changes since the last call, leaving out no-ops."""
+        pending, self._pending = self._pending, {}
+        self._ready.clear()
+        return [
+            event
+            for event in pending.values()
+            if event[NEW_COMMENTS] or any(event[name] for name in DELTAS)
+        ]
+
+
+class Hub:
+    """Subscriptions of this process, indexed by post."""
+
+    def __init__(self) -> None:
+        self._subscriptions: dict[int, set[Subscription]] = {}
+        self._count = 0
+
+    def subscribe(self, post_ids: Iterable[int]) -> Subscription:
+        subscription = Subscription(post_ids)
+        for post_id in subscription.post_ids:
+            self._subscriptions.setdefault(post_id, set()).add(subscription)
+        self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for post_id in subscription.post_ids:
+            subscriptions = self._subscriptions.get(post_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[post_id]
+        self._count -= 1
+
+    def deliver(self, event: dict) -> None:
+        """Hand an event to every subscription of its post, on the event loop."""
+        for subscription in self._subscriptions.get(event["post_id"], ()):
+            subscription.push(event)
+
+    def subscription_count(self) -> int:
+        return self._count
+
+
+class LocalBroadcast:
+    """Delivers events to the subscriptions of this process only."""
+
+    def __init__(self, hub: Hub) -> None:
+        self.hub = hub
+
+    async def start(self) -> None:
+        pass
+
+    async def publish(self, event: dict) -> None:
+        self.hub.deliver(event)
+
+
+class PostgresBroadcast:
+    """
+    Delivers events to every process through Postgres LISTEN/NOTIFY on the
+    LIVE_CHANNEL channel, including this one, so all hubs see events in the
+    same order. Each process keeps two connections outside the pool, one
+    listening and one notifying. Events published while the listener is
+    reconnecting are lost.
+    """
+
+    # Seconds to wait before reconnecting a connection that failed
+    retry_interval = 1.0
+
+    def __init__(self, hub: Hub) -> None:
+        self.hub = hub
+        self.channel = settings.LIVE_CHANNEL
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._notifier = None
+        self._notify_lock = asyncio.Lock()
+
+    def _conninfo(self) -> str:
+        from psycopg.conninfo import make_conninfo
+
+        database = settings.DATABASES["default"]
+        params = {
+            "dbname": database["NAME"],
+            "user": database["USER"],
+            "password": database["PASSWORD"],
+            "host": database["HOST"],
+            "port": database["PORT"],
+        }
+        return make_conninfo(**{key: value for key, value in params.items() if value})
+
+    async def _connect(self):
+        import psycopg
+
+        return await psycopg.AsyncConnection.connect(self._conninfo(), autocommit=True)
+
+    def _bind(self) -> None:
+        # Tasks and connections belong to the loop that made them, e.g. one
+        # per test, so start over on another loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._listener = None
+            self._notifier = None
+            self._notify_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        self._bind()
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        from psycopg import sql
+
+        while True:
+            try:
+                async with await self._connect() as connection:
+                    await connection.execute(
+                        sql.SQL("LISTEN {}").format(sql.Identifier(self.channel))
+                    )
+                    async for notify in connection.notifies():
+                        self.hub.deliver(json.loads(notify.payload))
+            except Exception:
+                logger.warning("Live update listener disconnected", exc_info=True)
+                await asyncio.sleep(self.retry_interval)
+
+    async def publish(self, event: dict) -> None:
+        self._bind()
+        payload = json.dumps(event)
+        async with self._notify_lock:
+            for attempt in (1, 2):
+                try:
+                    if self._notifier is None or self._notifier.closed:
+                        self._notifier = await self._connect()
+                    await self._notifier.execute(
+                        "SELECT pg_notify(%s, %s)", (self.channel, payload)
+                    )
+                    return
+                except Exception:
+                    # A connection dropped since the last event; retry once
+                    self._notifier = None
+                    if attempt == 2:
+                        raise
+
+
+hub = Hub()
+_broadcast = None
+
+
+def broadcast():
+    """The backend named by LIVE_BROADCAST_BACKEND, created on first use."""
+    global _broadcast
+    if _broadcast is None:
+        _broadcast = import_string(settings.LIVE_BROADCAST_BACKEND)(hub)
+    return _broadcast
+
+
+async def publish(post_id: int, **changes) -> None:
+    """
+    Publish changes of a post, e.g. `likes=1, dislikes=-1` when a dislike
+    turns into a like, or `comments=1, comment_ids=[id]`. Call it once the
+    write has committed. Failures are logged, never raised to the writer.
+    """
+    try:
+        await broadcast().publish({"post_id": post_id, **changes})
+    except Exception:
+        logger.exception("Failed to publish a live update of post %s", post_id)
+
+
+def _format(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+async def stream(post_ids: Iterable[int]) -> AsyncIterator[bytes]:
+    """
+    Server-sent events of the changes to `post_ids`: one `post` event per
+    changed post every LIVE_COALESCE_INTERVAL seconds at most, and a comment
+    line every LIVE_HEARTBEAT_INTERVAL seconds without changes so proxies
+    keep the connection open. Ends when the client disconnects.
+    """
+    await broadcast().start()
+    subscription = hub.subscribe(post_ids)
+    try:
+        # Clients reconnect after this many milliseconds when cut off
+        yield f"retry: {int(settings.LIVE_RETRY_INTERVAL * 1000)}\n\n".encode()
+        while True:
+            if not await subscription.wait(settings.LIVE_HEARTBEAT_INTERVAL):
+                yield b": keep-alive\n\n"
+                continue
+            # Let changes made in quick succession arrive and be merged
+            await asyncio.sleep(settings.LIVE_COALESCE_INTERVAL)
+            for event in subscription.take():
+                yield _format("post", event)
+    finally:
+        hub.unsubscribe(subscription)
@@ -0,0 +1,346 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Iterable, Iterator, Sequence
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from murmur import live
+from murmur.instrumentation import track_queries
+
+# Default Prometheus latency buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+class _Metric:
+    """
+    Base of the metric types. Every thread records into its own shard (a
+    dict of label values -> cells), so recording never takes a lock or
+    contends with other threads; a scrape sums the shards.
+    """
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: list[dict[tuple, list]] = []
+        # Only taken the first time a thread records
+        self._shards_lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _new_cells(self) -> list:
+        return [0]
+
+    def _cells(self, labels: tuple) -> list:
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        cells = shard.get(labels)
+        if cells is None:
+            cells = shard[labels] = self._new_cells()
+        return cells
+
+    def _totals(self) -> dict[tuple, list]:
+        totals: dict[tuple, list] = {}
+        for shard in list(self._shards):
+            for labels, cells in list(shard.items()):
+                total = totals.setdefault(labels, self._new_cells())
+                for i, value in enumerate(cells):
+                    total[i] += value
+        return totals
+
+    def _labels(self, labels: tuple, **extra: Any) -> str:
+        pairs = list(zip(self.labelnames, labels)) + list(extra.items())
+        if not pairs:
+            return ""
+        escaped = (
+            (
+                name,
+                str(value)
+                .replace("\\", r"\\")
+                .replace('"', r"\"")
+                .replace("\n", r"\n"),
+            )
+            for name, value in pairs
+        )
+        return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+    def _samples(self) -> Iterator[str]:
+        for labels, (value,) in sorted(self._totals().items()):
+            yield f"{self.name}{self._labels(labels)} {value}"
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._cells(labels)[0] += amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._cells(labels)[0] += amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        # Shards hold deltas, so a thread may go negative; the sum is exact
+        self._cells(labels)[0] -= amount
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_cells(self) -> list:
+        # One count per bucket plus +Inf, then the sum of observations
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observe(self, value: float, *labels: str) -> None:
+        cells = self._cells(labels)
+        cells[bisect_left(self.buckets, value)] += 1
+        cells[-1] += value
+
+    def _samples(self) -> Iterator[str]:
+        for labels, cells in sorted(self._totals().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), cells):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                yield f"{self.name}_bucket{self._labels(labels, le=le)} {cumulative}"
+            yield f"{self.name}_sum{self._labels(labels)} {cells[-1]}"
+            yield f"{self.name}_count{self._labels(labels)} {cumulative}"
+
+
+class Collected(_Metric):
+    """
+    Values read from elsewhere when scraped, e.g. a connection pool's own
+    statistics. `collect` returns (label values, value) pairs.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Iterable[tuple[tuple, float]]],
+        type: str = "gauge",
+    ):
+        self.type = type
+        self.collect = collect
+        super().__init__(name, documentation, labelnames)
+
+    def _samples(self) -> Iterator[str]:
+        for labels, value in sorted(self.collect()):
+            yield f"{self.name}{self._labels(labels)} {value}"
+
+
+REGISTRY: list[_Metric] = []
+
+
+def render() -> str:
+    """All metrics of this process in the Prometheus text format (0.0.4)."""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+requests_total = Counter(
+    "murmur_http_requests_total",
+    "HTTP requests handled, by ninja operation and status.",
+    ["operation", "status"],
+)
+request_duration = Histogram(
+    "murmur_http_request_duration_seconds",
+    "Time to produce a response, by ninja operation and status.",
+    ["operation", "status"],
+)
+requests_in_flight = Gauge(
+    "murmur_http_requests_in_flight",
+    "Requests currently being handled, by ninja operation.",
+    ["operation"],
+)
+db_queries = Histogram(
+    "murmur_db_queries_per_request",
+    "Database queries run per request, by ninja operation.",
+    ["operation"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+db_duration = Histogram(
+    "murmur_db_duration_seconds",
+    "Time spent in the database per request, by ninja operation.",
+    ["operation"],
+)
+
+
+def _pool_samples(names: dict[str, tuple], scale: float = 1):
+    """Read stats of the default database's pool, mapped to label values."""
+
+    def collect() -> list[tuple[tuple, float]]:
+        pool = connections["default"].pool if settings.DATABASE_POOL else None
+        if pool is None:
+            return []
+        # psycopg_pool leaves out counters that are still zero
+        stats = pool.get_stats()
+        return [(labels, stats.get(key, 0) * scale) for key, labels in names.items()]
+
+    return collect
+
+
+db_pool_connections = Collected(
+    "murmur_db_pool_connections",
+    "Database pool connections: configured min/max, open, and idle in the pool.",
+    ["state"],
+    _pool_samples(
+        {
+            "pool_min": ("min",),
+            "pool_max": ("max",),
+            "pool_size": ("open",),
+            "pool_available": ("idle",),
+        }
+    ),
+)
+db_pool_waiting = Collected(
+    "murmur_db_pool_requests_waiting",
+    "Requests currently waiting for a database connection.",
+    [],
+    _pool_samples({"requests_waiting": ()}),
+)
+db_pool_events = Collected(
+    "murmur_db_pool_events_total",
+    "Database pool events: connection requests, requests that had to queue "
+    "or timed out, connections opened, failed to open, found broken by the "
+    "health check or returned in a bad state.",
+    ["event"],
+    _pool_samples(
+        {
+            "requests_num": ("requests",),
+            "requests_queued": ("queued",),
+            "requests_errors": ("timeouts",),
+            "connections_num": ("connects",),
+            "connections_errors": ("connect_errors",),
+            "connections_lost": ("lost",),
+            "returns_bad": ("returned_bad",),
+        }
+    ),
+    type="counter",
+)
+db_pool_wait = Collected(
+    "murmur_db_pool_wait_seconds_total",
+    "Time requests spent waiting for a database connection.",
+    [],
+    _pool_samples({"requests_wait_ms": ()}, scale=0.001),
+    type="counter",
+)
+live_subscriptions = Collected(
+    "murmur_live_subscriptions",
+    "Open live update streams of this process.",
+    [],
+    lambda: [((), live.hub.subscription_count())],
+)
+
+# Requests that didn't resolve to a view (e.g. 404s)
+UNMATCHED = "unmatched"
+
+_operation_ids: dict[Any, str] = {}
+
+
+def operation_id(request, view_func) -> str:
+    """
+    OpenAPI operation ID of the ninja operation `view_func` dispatches the
+    request to, or the Django view name for anything else.
+    """
+    path_view = getattr(view_func, "__self__", None)
+    find_operation = getattr(path_view, "_find_operation", None)
+    operation = find_operation(request) if find_operation else None
+    if operation is None:
+        match = request.resolver_match
+        return match.view_name if match else UNMATCHED
+    try:
+        return _operation_ids[operation]
+    except KeyError:
+        op_id = operation.operation_id or operation.api.get_openapi_operation_id(
+            operation
+        )
+        _operation_ids[operation] = op_id
+        return op_id
+
+
+class MetricsMiddleware:
+    """
+    Record request count, latency, in-flight requests and database usage
+    per ninja operation. Metrics are per process; scrape every worker.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        with track_queries() as stats:
+            try:
+                response = self.get_response(request)
+            finally:
+                self._finish(request)
+        self._record(request, response, stats, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with track_queries() as stats:
+            try:
+                response = await self.get_response(request)
+            finally:
+                self._finish(request)
+        self._record(request, response, stats, time.perf_counter() - start)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_operation = operation_id(request, view_func)
+        requests_in_flight.inc(request.metrics_operation)
+        return None
+
+    def _finish(self, request) -> None:
+        operation = getattr(request, "metrics_operation", None)
+        if operation is not None:
+            requests_in_flight.dec(operation)
+
+    def _record(self, request, response, stats, elapsed: float) -> None:
+        operation = getattr(request, "metrics_operation", UNMATCHED)
+        status = str(response.status_code)
+        requests_total.inc(operation, status)
+        request_duration.observe(elapsed, operation, status)
+        db_queries.observe(stats.count, operation)
+        db_duration.observe(stats.duration, operation)
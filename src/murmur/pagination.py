@@ -0,0 +1,192 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from math import inf
+from operator import attrgetter
+from typing import Any, List, Optional, Sequence
+
+from django.db.models import Q, QuerySet
+from ninja import Field, Schema
+from ninja.conf import settings
+from ninja.errors import HttpError
+from ninja.pagination import AsyncPaginationBase
+from ninja.pagination import LimitOffsetPagination as BaseLimitOffsetPagination
+
+from murmur.querycache import CachedPaginationMixin
+
+
+class LimitOffsetPagination(CachedPaginationMixin, BaseLimitOffsetPagination):
+    """
+    ninja's limit/offset pagination, serving pages from the queryset cache
+    when the view's queryset allows it. The default `@paginate` class.
+    """
+
+
+class CursorPagination(CachedPaginationMixin, AsyncPaginationBase):
+    """
+    Keyset pagination over a fixed, unique ordering (newest first by default).
+
+    Instead of skipping `offset` rows, each page filters on the position of the
+    last row it returned, so every page costs the same index range scan and no
+    COUNT(*) is issued. Positions are handed to clients as opaque `next`/`prev`
+    tokens. The ordering must end with a unique, non-null column (e.g. `id`).
+
+    A view may also return a list of querysets over the same model (e.g. a
+    materialized timeline plus posts pulled on read). Each one is windowed on
+    its own, the windows are read in one UNION ALL statement and the rows are
+    merged, dropping rows with identical positions.
+
+    Pages of querysets marked with `murmur.querycache.cache_results` are
+    served from the queryset cache.
+    """
+
+    class Input(Schema):
+        cursor: Optional[str] = Field(
+            None, description="Opaque token taken from a previous page's next/prev"
+        )
+        limit: int = Field(
+            settings.PAGINATION_PER_PAGE,
+            ge=1,
+            le=(
+                settings.PAGINATION_MAX_LIMIT
+                if settings.PAGINATION_MAX_LIMIT != inf
+                else None
+            ),
+        )
+
+    class Output(Schema):
+        items: List[Any]
+        next: Optional[str] = None
+        prev: Optional[str] = None
+
+    def __init__(
+        self, ordering: Sequence[str] = ("-created_at", "-id"), **kwargs: Any
+    ) -> None:
+        self.ordering = tuple(ordering)
+        self.reversed_ordering = tuple(
+            field[1:] if field.startswith("-") else f"-{field}"
+            for field in self.ordering
+        )
+        super().__init__(**kwargs)
+
+    # Cursor encoding
+
+    def position_of(self, obj: Any) -> list:
+        return [getattr(obj, field.lstrip("-")) for field in self.ordering]
+
+    def encode_cursor(self, obj: Any, backwards: bool) -> str:
+        position = [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in self.position_of(obj)
+        ]
+        raw = json.dumps({"p": position, "b": backwards}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor: str) -> tuple[list, bool]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            data = json.loads(raw)
+            position, backwards = data["p"], bool(data["b"])
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise HttpError(400, "Invalid pagination cursor")
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise HttpError(400, "Invalid pagination cursor")
+        return position, backwards
+
+    # Page selection
+
+    @staticmethod
+    def _after(position: list, ordering: Sequence[str]) -> Q:
+        """
+        Rows strictly after `position` in `ordering`, expanded as
+        `a < x OR (a = x AND b < y) ...`. The leading `a <= x` bound is
+        redundant but lets the planner turn it into an index range condition.
+        """
+        names = [field.lstrip("-") for field in ordering]
+        ops = ["lt" if field.startswith("-") else "gt" for field in ordering]
+
+        condition = Q()
+        for i, name in enumerate(names):
+            clause = Q(**{f"{name}__{ops[i]}": position[i]})
+            for prev_name, prev_value in zip(names[:i], position):
+                clause &= Q(**{prev_name: prev_value})
+            condition |= clause
+        bound = "lte" if ordering[0].startswith("-") else "gte"
+        return Q(**{f"{names[0]}__{bound}": position[0]}) & condition
+
+    def _window(self, queryset: QuerySet, pagination: Input) -> tuple[QuerySet, bool]:
+        backwards = False
+        ordering = self.ordering
+        if pagination.cursor:
+            position, backwards = self.decode_cursor(pagination.cursor)
+            if backwards:
+                ordering = self.reversed_ordering
+            queryset = queryset.filter(self._after(position, ordering))
+        # One extra row tells us whether another page exists
+        return queryset.order_by(*ordering)[: pagination.limit + 1], backwards
+
+    def _windows(self, queryset: Any, pagination: Input) -> tuple[QuerySet, bool]:
+        sources = queryset if isinstance(queryset, (list, tuple)) else [queryset]
+        windows = []
+        backwards = False
+        for source in sources:
+            window, backwards = self._window(source, pagination)
+            windows.append(window)
+        if len(windows) == 1:
+            return windows[0], backwards
+        # One query however many sources, each window still its own ordered,
+        # limited index range scan
+        return windows[0].union(*windows[1:], all=True), backwards
+
+    def _merge(self, rows: List[Any], backwards: bool) -> List[Any]:
+        ordering = self.reversed_ordering if backwards else self.ordering
+        # Stable sorts from the last key to the first give a multi-key order
+        for field in reversed(ordering):
+            rows.sort(key=attrgetter(field.lstrip("-")), reverse=field.startswith("-"))
+
+        merged: List[Any] = []
+        for row in rows:
+            if merged and self.position_of(merged[-1]) == self.position_of(row):
+                continue
+            merged.append(row)
+        return merged
+
+    def _page(self, rows: List[Any], pagination: Input, backwards: bool) -> dict:
+        has_more = len(rows) > pagination.limit
+        rows = rows[: pagination.limit]
+        if backwards:
+            rows.reverse()
+            has_next, has_prev = True, has_more
+        else:
+            has_next, has_prev = has_more, pagination.cursor is not None
+
+        return {
+            "items": rows,
+            "next": self.encode_cursor(rows[-1], False) if rows and has_next else None,
+            "prev": self.encode_cursor(rows[0], True) if rows and has_prev else None,
+        }
+
+    def paginate_queryset(
+        self,
+        queryset: QuerySet,
+        pagination: Input,
+        **params: Any,
+    ) -> Any:
+        windows, backwards = self._windows(queryset, pagination)
+        rows = list(windows)
+        if windows.query.combinator:
+            rows = self._merge(rows, backwards)
+        return self._page(rows, pagination, backwards)
+
+    async def apaginate_queryset(
+        self,
+        queryset: QuerySet,
+        pagination: Input,
+        **params: Any,
+    ) -> Any:
+        windows, backwards = self._windows(queryset, pagination)
+        rows = [obj async for obj in windows]
+        if windows.query.combinator:
+            rows = self._merge(rows, backwards)
+        return self._page(rows, pagination, backwards)
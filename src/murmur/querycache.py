@@ -0,0 +1,122 @@
+import hashlib
+import json
+import time
+from typing import Any, Iterable, Optional
+
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Model, QuerySet
+
+# Pages of list endpoints are cached under a key that includes the current
+# version of everything they were read from: a model as a whole, or the
+# rows of one model belonging to one post. Writes bump those versions after
+# they commit, so cached pages are never invalidated one by one; they stop
+# being looked up and expire after QUERYSET_CACHE_TTL seconds. The backend
+# is the `querysets` entry of CACHES.
+CACHE_ALIAS = "querysets"
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _version_key(model: type[Model], post_id: Optional[int] = None) -> str:
+    label = model._meta.label_lower
+    return f"qc:v:{label}" if post_id is None else f"qc:v:{label}:post:{post_id}"
+
+
+def _generation_key(model: type[Model]) -> str:
+    return f"qc:g:{model._meta.label_lower}"
+
+
+async def _versions(keys: list[str]) -> list:
+    found = await _cache().aget_many(keys)
+    for key in keys:
+        if key not in found:
+            # A fresh value rather than 1, so a version that was evicted
+            # can't come back and match pages cached before it was
+            await _cache().aadd(key, time.time_ns(), timeout=None)
+            found[key] = await _cache().aget(key)
+    return [found[key] for key in keys]
+
+
+async def changed(model: type[Model], post_ids: Optional[Iterable[int]] = None) -> None:
+    """
+    Invalidate the cached pages read from `model`: every list of it and,
+    given `post_ids`, the lists of it filtered by one of those posts. Without
+    `post_ids` all of the model's per-post lists are invalidated too. Call
+    it once the write has committed.
+    """
+    keys = [_version_key(model)]
+    if post_ids is None:
+        keys.append(_generation_key(model))
+    else:
+        keys.extend(_version_key(model, post_id) for post_id in set(post_ids))
+    for key in keys:
+        try:
+            await _cache().aincr(key)
+        except ValueError:
+            # Not cached yet, no page can depend on it
+            pass
+
+
+def clear() -> None:
+    """Drop every cached page and version, e.g. between tests."""
+    _cache().clear()
+
+
+class CachedResults:
+    """
+    What a list queryset's pages depend on: `key` identifies the request
+    (e.g. the normalized filters), `models` are read as a whole and
+    `post_models` only for the post in `post_id`.
+    """
+
+    def __init__(
+        self,
+        key: Any,
+        models: Iterable[type[Model]] = (),
+        post_models: Iterable[type[Model]] = (),
+        post_id: Optional[int] = None,
+    ) -> None:
+        self.key = key
+        self.version_keys = [_version_key(model) for model in models]
+        for model in post_models:
+            self.version_keys.append(_generation_key(model))
+            self.version_keys.append(_version_key(model, post_id))
+
+    async def page_key(self, paginator: Any, pagination: dict) -> str:
+        versions = await _versions(self.version_keys)
+        raw = json.dumps(
+            [self.key, paginator, pagination, versions],
+            cls=DjangoJSONEncoder,
+            sort_keys=True,
+        )
+        return "qc:page:" + hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+
+def cache_results(queryset: QuerySet, results: CachedResults) -> QuerySet:
+    """Let the paginator serve `queryset`'s pages from the queryset cache."""
+    queryset.cached_results = results  # type: ignore[attr-defined]
+    return queryset
+
+
+class CachedPaginationMixin:
+    """
+    Serves pages of querysets marked with `cache_results` from the queryset
+    cache. Anything else is paginated as usual.
+    """
+
+    async def apaginate_queryset(self, queryset, pagination, **params: Any) -> Any:
+        results: Optional[CachedResults] = getattr(queryset, "cached_results", None)
+        if results is None:
+            return await super().apaginate_queryset(queryset, pagination, **params)  # type: ignore[misc]
+
+        # The cursor paginator's ordering changes what a page holds
+        paginator = [type(self).__name__, getattr(self, "ordering", None)]
+        key = await results.page_key(paginator, pagination.model_dump())
+        page = await _cache().aget(key)
+        if page is None:
+            page = await super().apaginate_queryset(queryset, pagination, **params)  # type: ignore[misc]
+            await _cache().aset(key, page)
+        return page
@@ -0,0 +1,34 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField, Manager, QuerySet
+from django.db.models.functions import Cast
+
+# Text search configuration of the models' generated `search_vector` columns.
+# Changing it needs a migration, since it is baked into the column expression.
+SEARCH_CONFIG = "english"
+
+# Keyset order of ranked results, see murmur.pagination.CursorPagination
+SEARCH_ORDERING = ("-rank", "-id")
+
+
+class SearchableManager(Manager):
+    """
+    Default manager of models with a `search_vector` column. The vector is
+    only ever used inside queries, so it's never loaded into instances.
+    """
+
+    def get_queryset(self) -> QuerySet:
+        return super().get_queryset().defer("search_vector")
+
+
+def ranked_search(queryset: QuerySet, terms: str) -> QuerySet:
+    """
+    Rows of `queryset` whose `search_vector` matches `terms`, annotated with
+    their `rank`. Terms use the web search syntax ("quoted phrases", `or`,
+    `-excluded`). The match is answered by the column's GIN index; only the
+    matching rows are ranked.
+    """
+    query = SearchQuery(terms, config=SEARCH_CONFIG, search_type="websearch")
+    # ts_rank returns a real, whose text form is rounded; as a double the
+    # rank survives the round trip through a pagination cursor exactly
+    rank = Cast(SearchRank(F("search_vector"), query), FloatField())
+    return queryset.filter(search_vector=query).annotate(rank=rank)
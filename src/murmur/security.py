@@ -1,5 +1,9 @@
+from django.contrib.auth.models import AnonymousUser
 from ninja.security.http import HttpBearer
 from ninja_jwt.authentication import JWTAuth, AsyncJWTAuth
+from ninja_jwt.settings import api_settings
+
+from accounts.cache import user_cache
 
 
 class TokenBasedAuth(JWTAuth, HttpBearer):
@@ -7,4 +11,26 @@ class TokenBasedAuth(JWTAuth, HttpBearer):
 
 
 class AsyncTokenBasedAuth(AsyncJWTAuth, HttpBearer):
-    pass
+    def get_user(self, validated_token):
+        """
+        Resolve the token's user through the in-process user cache, only
+        hitting the database on a miss.
+        """
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = user_cache.get(user_id) if user_id is not None else None
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+        return user
+
+
+class OptionalAsyncTokenBasedAuth(AsyncTokenBasedAuth):
+    """
+    Authenticates the bearer token when one is sent, otherwise lets the request
+    through anonymously with `request.auth` set to an AnonymousUser.
+    """
+
+    async def __call__(self, request):
+        if not request.headers.get(self.header):
+            return AnonymousUser()
+        return await super().__call__(request)
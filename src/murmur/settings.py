@@ -28,6 +28,9 @@ sys.path.insert(0, os.path.join(BASE_DIR, 'apps'))
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv("SECRET_KEY")
 
+# Views decorated with a bare `@paginate` use the queryset cache aware one
+NINJA_PAGINATION_CLASS = "murmur.pagination.LimitOffsetPagination"
+
 NINJA_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(
         minutes=int(os.environ["ACCESS_TOKEN_LIFETIME"])
@@ -71,6 +74,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "murmur.metrics.MetricsMiddleware",
+    "murmur.admission.AdmissionControlMiddleware",
+    "murmur.instrumentation.query_instrumentation_middleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -114,6 +120,57 @@ DATABASES = {
     }
 }
 
+# Connection pool (psycopg 3)
+# Each worker process keeps DATABASE_POOL_MIN_SIZE to DATABASE_POOL_MAX_SIZE
+# connections open instead of connecting on every request. Connections are
+# checked before being handed out and replaced after MAX_LIFETIME seconds, or
+# closed after MAX_IDLE idle seconds above the minimum. Requests wait up to
+# DATABASE_POOL_TIMEOUT seconds for a free connection.
+
+DATABASE_POOL = os.getenv("DATABASE_POOL", "true").lower() == "true"
+if DATABASE_POOL:
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.getenv("DATABASE_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.getenv("DATABASE_POOL_MAX_SIZE", "20")),
+            "max_lifetime": float(os.getenv("DATABASE_POOL_MAX_LIFETIME", "1800")),
+            "max_idle": float(os.getenv("DATABASE_POOL_MAX_IDLE", "300")),
+            "timeout": float(os.getenv("DATABASE_POOL_TIMEOUT", "10")),
+        }
+    }
+    # Makes the pool check each connection before handing it out
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
+# Background tasks
+# Work moved off the request path (fan-out, backfills, purges, the trending
+# refresh) runs in tasks, see murmur.tasks, each on a thread and database
+# connection of its own. At most BACKGROUND_TASK_MAX_CONCURRENCY of them run
+# at once per process; the others wait for one to finish.
+
+BACKGROUND_TASK_MAX_CONCURRENCY = int(os.getenv("BACKGROUND_TASK_MAX_CONCURRENCY", "4"))
+
+
+# Caches
+# `querysets` holds pages of the list endpoints, see murmur.querycache. The
+# in-memory default is per process: with several workers, point it at a
+# shared backend (e.g. django.core.cache.backends.redis.RedisCache) so a
+# write in one invalidates the pages cached by all.
+
+QUERYSET_CACHE_TTL = float(os.getenv("QUERYSET_CACHE_TTL", "300"))
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "querysets": {
+        "BACKEND": os.getenv(
+            "QUERYSET_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("QUERYSET_CACHE_LOCATION", "querysets"),
+        "TIMEOUT": QUERYSET_CACHE_TTL,
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("QUERYSET_CACHE_MAX_ENTRIES", "10000"))
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -133,6 +190,28 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# Passwords are hashed and checked by a pool of PASSWORD_HASHING_WORKERS
+# processes per worker, see accounts.passwords, so logins and registrations
+# don't stall the event loop; 0 hashes on the event loop instead. The first
+# of PASSWORD_HASHERS hashes new passwords, the others still check existing
+# hashes, which are rehashed with the first at the next login. The Argon2
+# hasher (needs argon2-cffi) takes its costs from PASSWORD_ARGON2_*.
+
+PASSWORD_HASHERS = os.getenv(
+    "PASSWORD_HASHERS",
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher,"
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher,"
+    "accounts.hashers.Argon2PasswordHasher,"
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher,"
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+).split(",")
+PASSWORD_HASHING_WORKERS = int(os.getenv("PASSWORD_HASHING_WORKERS", "2"))
+# Passes over memory, KiB of memory and lanes per hash
+PASSWORD_ARGON2_TIME_COST = int(os.getenv("PASSWORD_ARGON2_TIME_COST", "2"))
+PASSWORD_ARGON2_MEMORY_COST = int(os.getenv("PASSWORD_ARGON2_MEMORY_COST", "19456"))
+PASSWORD_ARGON2_PARALLELISM = int(os.getenv("PASSWORD_ARGON2_PARALLELISM", "1"))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -155,6 +234,136 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "mediafiles"
 
+# Profile photos
+# Uploads are re-encoded into square WebP variants of these sizes (pixels)
+# by a pool of PROFILE_PHOTO_WORKERS processes. The original is not kept.
+
+PROFILE_PHOTO_SIZES = [
+    int(size) for size in os.getenv("PROFILE_PHOTO_SIZES", "48,128,512").split(",")
+]
+PROFILE_PHOTO_QUALITY = int(os.getenv("PROFILE_PHOTO_QUALITY", "80"))
+PROFILE_PHOTO_WORKERS = int(os.getenv("PROFILE_PHOTO_WORKERS", "2"))
+# Uploads decoding to more pixels than this are rejected
+PROFILE_PHOTO_MAX_PIXELS = int(os.getenv("PROFILE_PHOTO_MAX_PIXELS", "40000000"))
+
+# Streaming responses
+# Streamed bodies (e.g. account exports) are sent in writes of this many bytes
+
+STREAMING_CHUNK_SIZE = int(os.getenv("STREAMING_CHUNK_SIZE", "65536"))
+# Rows fetched per round trip from the server-side cursors of an export
+ACCOUNT_EXPORT_CHUNK_SIZE = int(os.getenv("ACCOUNT_EXPORT_CHUNK_SIZE", "2000"))
+
+# Request instrumentation
+# Query count and database time of each request are logged to
+# `murmur.requests` and, unless disabled, sent in a Server-Timing header
+
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "true").lower() == "true"
+# Requests running more queries than this are logged as warnings
+QUERY_COUNT_WARNING_THRESHOLD = int(os.getenv("QUERY_COUNT_WARNING_THRESHOLD", "20"))
+
+# Authenticated user cache
+# Users resolved from JWTs are kept in-process for AUTH_USER_CACHE_TTL seconds
+
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+
+# Home timeline
+# Posts from authors with more followers than this are not fanned out on
+# write; followers pull them when they read their timeline instead.
+
+TIMELINE_FANOUT_MAX_FOLLOWERS = int(
+    os.getenv("TIMELINE_FANOUT_MAX_FOLLOWERS", "10000")
+)
+TIMELINE_FANOUT_BATCH_SIZE = int(os.getenv("TIMELINE_FANOUT_BATCH_SIZE", "1000"))
+# Recent posts copied into a timeline when its owner follows someone new
+TIMELINE_BACKFILL_SIZE = int(os.getenv("TIMELINE_BACKFILL_SIZE", "50"))
+
+# Bulk post creation
+# Most posts one POST /api/posts/bulk request may create, and rows per INSERT
+
+POST_BULK_CREATE_MAX_ITEMS = int(os.getenv("POST_BULK_CREATE_MAX_ITEMS", "1000"))
+POST_BULK_CREATE_BATCH_SIZE = int(os.getenv("POST_BULK_CREATE_BATCH_SIZE", "500"))
+
+# Trending posts
+# Engagement counts for half as much every TRENDING_HALF_LIFE seconds. A
+# comment weighs TRENDING_COMMENT_WEIGHT reactions. GET /api/posts/trending
+# serves the TRENDING_SIZE best scored posts, re-read at most every
+# TRENDING_REFRESH_INTERVAL seconds per process.
+
+TRENDING_HALF_LIFE = float(os.getenv("TRENDING_HALF_LIFE", "21600"))
+TRENDING_REACTION_WEIGHT = float(os.getenv("TRENDING_REACTION_WEIGHT", "1"))
+TRENDING_COMMENT_WEIGHT = float(os.getenv("TRENDING_COMMENT_WEIGHT", "2"))
+TRENDING_SIZE = int(os.getenv("TRENDING_SIZE", "100"))
+TRENDING_REFRESH_INTERVAL = float(os.getenv("TRENDING_REFRESH_INTERVAL", "60"))
+
+# Account deletion
+# Deleted accounts are deactivated at once and their rows purged in the
+# background, at most this many rows of one kind per transaction
+
+ACCOUNT_PURGE_BATCH_SIZE = int(os.getenv("ACCOUNT_PURGE_BATCH_SIZE", "1000"))
+
+# Live updates
+# GET /api/posts/live streams reactions and comments of up to LIVE_MAX_POSTS
+# posts as server-sent events, merged over LIVE_COALESCE_INTERVAL seconds.
+# The default backend only reaches clients of the worker that made the
+# change: with several workers use murmur.live.PostgresBroadcast, which
+# relays events through NOTIFY on LIVE_CHANNEL.
+
+LIVE_BROADCAST_BACKEND = os.getenv(
+    "LIVE_BROADCAST_BACKEND", "murmur.live.LocalBroadcast"
+)
+LIVE_CHANNEL = os.getenv("LIVE_CHANNEL", "murmur_live")
+LIVE_MAX_POSTS = int(os.getenv("LIVE_MAX_POSTS", "100"))
+LIVE_COALESCE_INTERVAL = float(os.getenv("LIVE_COALESCE_INTERVAL", "1"))
+LIVE_HEARTBEAT_INTERVAL = float(os.getenv("LIVE_HEARTBEAT_INTERVAL", "15"))
+LIVE_RETRY_INTERVAL = float(os.getenv("LIVE_RETRY_INTERVAL", "3"))
+
+# Admission control
+# Each route runs at most an adaptive number of requests at once per process,
+# starting at ADMISSION_INITIAL_LIMIT. The limit is cut by ADMISSION_BACKOFF
+# when a request takes ADMISSION_LATENCY_TOLERANCE times the route's fastest
+# recent one, and creeps back up while requests are fast. Requests over it
+# queue for up to ADMISSION_QUEUE_TIMEOUT seconds, or
+# ADMISSION_CRITICAL_QUEUE_TIMEOUT for the critical operations, which are
+# also let in first, then get a 503 with Retry-After.
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() == "true"
+ADMISSION_INITIAL_LIMIT = float(os.getenv("ADMISSION_INITIAL_LIMIT", "20"))
+ADMISSION_MIN_LIMIT = float(os.getenv("ADMISSION_MIN_LIMIT", "2"))
+ADMISSION_MAX_LIMIT = float(os.getenv("ADMISSION_MAX_LIMIT", "200"))
+ADMISSION_LATENCY_TOLERANCE = float(os.getenv("ADMISSION_LATENCY_TOLERANCE", "2"))
+ADMISSION_BACKOFF = float(os.getenv("ADMISSION_BACKOFF", "0.9"))
+# Requests run at once across all routes. Each async request holds its own
+# database connection until it finishes, so admitting more than the pool
+# holds only makes them wait for one while blocking the ORM thread. The
+# pool's last ADMISSION_POOL_HEADROOM connections are left to work outside
+# requests: each running background task holds a connection of its own, and
+# at most BACKGROUND_TASK_MAX_CONCURRENCY of them run at once.
+ADMISSION_POOL_HEADROOM = int(
+    os.getenv("ADMISSION_POOL_HEADROOM", BACKGROUND_TASK_MAX_CONCURRENCY)
+)
+ADMISSION_MAX_IN_FLIGHT = int(
+    os.getenv(
+        "ADMISSION_MAX_IN_FLIGHT",
+        max(
+            int(os.getenv("DATABASE_POOL_MAX_SIZE", "20")) - ADMISSION_POOL_HEADROOM, 1
+        ),
+    )
+)
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "0.1"))
+ADMISSION_CRITICAL_QUEUE_TIMEOUT = float(
+    os.getenv("ADMISSION_CRITICAL_QUEUE_TIMEOUT", "1")
+)
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+# Ninja operation IDs, as in the `operation` label of /api/metrics
+ADMISSION_CRITICAL_OPERATIONS = os.getenv(
+    "ADMISSION_CRITICAL_OPERATIONS",
+    "murmur_api_checkhealth,murmur_api_get_metrics,"
+    "apps_posts_apis_get_a_single_post,apps_comments_apis_get_a_single_comment,"
+    "apps_reactions_apis_get_reaction_counts,"
+    "apps_reactions_apis_get_reaction_counts_batch",
+).split(",")
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
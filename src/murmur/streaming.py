@@ -0,0 +1,74 @@
+import re
+import zlib
+from typing import AsyncIterable, AsyncIterator, Optional
+
+from django.conf import settings
+from django.http import HttpRequest, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+
+# Same negotiation as django.middleware.gzip.GZipMiddleware
+_accepts_gzip = re.compile(r"\bgzip\b")
+
+
+def accepts_gzip(request: HttpRequest) -> bool:
+    return bool(_accepts_gzip.search(request.headers.get("Accept-Encoding", "")))
+
+
+async def buffered(chunks: AsyncIterable[bytes], size: int) -> AsyncIterator[bytes]:
+    """
+    Join small chunks (e.g. one per NDJSON line) into writes of about `size`
+    bytes, so the server isn't sent one message per row.
+    """
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer += chunk
+        if len(buffer) >= size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+async def gzipped(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """Compress a stream into a single gzip member as it is produced."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        if data := compressor.compress(chunk):
+            yield data
+    yield compressor.flush()
+
+
+def streaming_response(
+    request: HttpRequest,
+    chunks: AsyncIterable[bytes],
+    content_type: str,
+    filename: Optional[str] = None,
+) -> StreamingHttpResponse:
+    """
+    Stream `chunks` to the client in STREAMING_CHUNK_SIZE writes, gzipped on
+    the fly when the client accepts it. Nothing is buffered beyond one write.
+    """
+    stream = buffered(chunks, settings.STREAMING_CHUNK_SIZE)
+    compress = accepts_gzip(request)
+    if compress:
+        stream = gzipped(stream)
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    if compress:
+        response["Content-Encoding"] = "gzip"
+    patch_vary_headers(response, ("Accept-Encoding",))
+    if filename:
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    # Let nginx pass the stream through instead of spooling it to disk
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def event_stream_response(events: AsyncIterable[bytes]) -> StreamingHttpResponse:
+    """
+    Send server-sent events as they are produced. Unlike `streaming_response`
+    nothing is buffered or compressed, either would hold events back.
+    """
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,89 @@
+import asyncio
+import contextvars
+import logging
+import weakref
+from typing import Any, Coroutine
+
+from asgiref.sync import AsyncToSync, ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Strong references so pending tasks aren't garbage collected mid-flight
+_background_tasks: set[asyncio.Task] = set()
+
+# Per event loop, a semaphore can't be shared between loops
+_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def run_in_background(coro: Coroutine[Any, Any, Any]) -> asyncio.Task:
+    """
+    Schedule a coroutine on the running event loop without awaiting it.
+    Used to move work off the request path; failures are logged, not raised.
+
+    The task runs in an empty context rather than a copy of the caller's, so
+    its queries aren't counted against the request. Its ORM calls run on a
+    thread of its own, with a connection of its own that is closed when the
+    task ends: tasks outlive requests and each other, and a connection shared
+    with either would be closed or returned to the pool while still in use.
+    At most BACKGROUND_TASK_MAX_CONCURRENCY tasks run at once.
+    """
+    task = asyncio.get_running_loop().create_task(
+        _run(coro), context=contextvars.Context()
+    )
+    _background_tasks.add(task)
+    task.add_done_callback(_on_done)
+    return task
+
+
+def close_connections() -> None:
+    """
+    Close this thread's database connections, which returns pooled ones to
+    the pool. Those in a transaction, e.g. a test's, are left alone.
+    """
+    for connection in connections.all(initialized_only=True):
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+def _slot() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    slot = _slots.get(loop)
+    if slot is None:
+        slot = _slots[loop] = asyncio.Semaphore(
+            settings.BACKGROUND_TASK_MAX_CONCURRENCY
+        )
+    return slot
+
+
+async def _run(coro: Coroutine[Any, Any, Any]) -> Any:
+    async with _slot():
+        if asyncio.get_running_loop() in AsyncToSync.loop_thread_executors:
+            # The loop of an async_to_sync call, e.g. an async test's: ORM
+            # calls run on the thread waiting for it, whose connection (and
+            # transaction) is its own to close
+            return await coro
+        async with ThreadSensitiveContext():
+            try:
+                return await coro
+            finally:
+                # On the task's thread, before it is shut down
+                await sync_to_async(close_connections)()
+
+
+def _on_done(task: asyncio.Task) -> None:
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background task failed", exc_info=task.exception())
+
+
+async def wait_for_background_tasks() -> None:
+    """
+    Wait until every scheduled background task (including ones scheduled while
+    waiting) has finished. Meant for tests and graceful shutdown.
+    """
+    while _background_tasks:
+        await asyncio.gather(*list(_background_tasks), return_exceptions=True)
@@ -0,0 +1,139 @@
+import asyncio
+import functools
+import json
+import threading
+from typing import Any, Callable, Coroutine, Iterator
+
+from asgiref.sync import iscoroutinefunction
+from django.db import connections
+from django.db.models import QuerySet
+
+from murmur.instrumentation import track_queries
+
+
+class query_budget:
+    """
+    Fail when more than `limit` queries run inside the block or decorated
+    test, async ORM calls included (unlike `assertNumQueries`). Lock in a
+    ceiling per route so N+1 regressions break the build:
+
+        async def test_list_posts(self):
+            with query_budget(2):
+                await self.tclient.get("/")
+
+        @query_budget(3)
+        async def test_get_timeline(self): ...
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+
+    def __enter__(self) -> "query_budget":
+        self._tracking = track_queries(capture=True)
+        self.stats = self._tracking.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._tracking.__exit__(exc_type, exc, tb)
+        if exc_type is None and self.stats.count > self.limit:
+            queries = "\n".join(
+                f"{i}. {sql}" for i, sql in enumerate(self.stats.queries or [], 1)
+            )
+            raise AssertionError(
+                f"{self.stats.count} queries executed, budget is {self.limit}:\n"
+                f"{queries}"
+            )
+
+    def __call__(self, func: Callable) -> Callable:
+        if iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with query_budget(self.limit):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with query_budget(self.limit):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+
+# Scans and sorts handling at least this many rows are reported
+PLAN_ROW_LIMIT = 1000
+
+
+def _plan_nodes(plan: dict) -> Iterator[dict]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+async def query_plan_problems(
+    queryset: QuerySet, row_limit: int = PLAN_ROW_LIMIT
+) -> list[str]:
+    """
+    Run EXPLAIN ANALYZE on `queryset` and describe the plan nodes that won't
+    scale: sequential scans reading at least `row_limit` rows, index scans
+    discarding that many rows (the index doesn't match the filter), and
+    sorts of that many rows that an index should have returned in order.
+    Actual row counts are used, so a scan cut short by a LIMIT is fine.
+    """
+    explained = await queryset.aexplain(analyze=True, format="json")
+    problems = []
+    for node in _plan_nodes(json.loads(explained)[0]["Plan"]):
+        loops = node.get("Actual Loops", 1)
+        rows = node.get("Actual Rows", 0) * loops
+        removed = node.get("Rows Removed by Filter", 0) * loops
+        if node["Node Type"] == "Seq Scan" and rows + removed >= row_limit:
+            problems.append(
+                f"Seq Scan on {node['Relation Name']} read {rows + removed} rows"
+            )
+        elif "Index Name" in node and removed >= row_limit:
+            problems.append(
+                f"{node['Node Type']} using {node['Index Name']} filtered out "
+                f"{removed} rows"
+            )
+        if node["Node Type"] == "Sort":
+            # A top-N sort under a LIMIT still reads all of its input
+            sorted_rows = sum(
+                child.get("Actual Rows", 0) * child.get("Actual Loops", 1)
+                for child in node.get("Plans", [])
+            )
+            if sorted_rows >= row_limit:
+                keys = ", ".join(node["Sort Key"])
+                problems.append(f"Sort on {keys} of {sorted_rows} rows")
+    return problems
+
+
+def pooled_connections_in_use(alias: str = "default") -> int:
+    """Connections of the database pool currently handed out."""
+    stats = connections[alias].pool.get_stats()
+    return stats["pool_size"] - stats["pool_available"]
+
+
+def run_like_a_server(main: Callable[[], Coroutine]) -> None:
+    """
+    Run the coroutine function `main` on an event loop of its own in a new
+    thread, as under an ASGI server. Async tests are nested in
+    async_to_sync, which runs every ORM call on the test's connection, so
+    connection handling (e.g. pooled connections outliving a request) only
+    shows this way. Use a TransactionTestCase: the thread commits. What
+    `main` raises, failed assertions included, is raised again here.
+    """
+    errors: list[BaseException] = []
+
+    def serve() -> None:
+        try:
+            asyncio.run(main())
+        except BaseException as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+    thread.join()
+    if errors:
+        raise errors[0]
@@ -0,0 +1,100 @@
+import copy
+from typing import Any
+
+from django.db import models
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import post_init, post_save
+
+# Change tracking: instances of a tracked model remember the values of their
+# concrete fields as loaded or last saved, so a save can write only the
+# columns that changed since, or nothing at all.
+
+_LOADED = "_loaded_values"
+
+
+def _value(value: Any) -> Any:
+    if isinstance(value, FieldFile):
+        return value.name
+    if isinstance(value, (dict, list)):
+        # Mutated in place, e.g. Profile.photo_variants
+        return copy.deepcopy(value)
+    return value
+
+
+def _remember(instance: models.Model, fields) -> None:
+    # A new dict: shallow copies of the instance, e.g. cached users, share it
+    loaded = dict(instance.__dict__.get(_LOADED, ()))
+    for field in fields:
+        # Deferred fields aren't in __dict__; setting one later is a change
+        if field.attname in instance.__dict__:
+            loaded[field.attname] = _value(instance.__dict__[field.attname])
+    instance.__dict__[_LOADED] = loaded
+
+
+def _loaded(sender, instance: models.Model, **kwargs) -> None:
+    _remember(instance, instance._meta.concrete_fields)
+
+
+def _saved(sender, instance: models.Model, update_fields=None, **kwargs) -> None:
+    fields = instance._meta.concrete_fields
+    if update_fields is not None:
+        # Other changes are still unsaved
+        fields = [field for field in fields if field.name in update_fields]
+    _remember(instance, fields)
+
+
+def track(model: type[models.Model]) -> None:
+    """Track the changes of `model` instances from now on."""
+    post_init.connect(_loaded, sender=model, weak=False)
+    post_save.connect(_saved, sender=model, weak=False)
+
+
+def changed_fields(instance: models.Model) -> list[str]:
+    """
+    Names of the fields of a tracked instance whose value differs from the
+    one it was loaded or last saved with.
+    """
+    loaded = instance.__dict__.get(_LOADED, {})
+    missing = object()
+    return [
+        field.name
+        for field in instance._meta.concrete_fields
+        if not field.primary_key
+        and field.attname in instance.__dict__
+        and loaded.get(field.attname, missing)
+        != _value(instance.__dict__[field.attname])
+    ]
+
+
+def update_fields(instance: models.Model) -> list[str]:
+    """
+    The `update_fields` saving the changes of a tracked instance takes: the
+    changed fields plus the `auto_now` ones, or none when nothing changed.
+    """
+    changed = changed_fields(instance)
+    if changed:
+        changed += [
+            field.name
+            for field in instance._meta.concrete_fields
+            if getattr(field, "auto_now", False) and field.name not in changed
+        ]
+    return changed
+
+
+def save_changes(instance: models.Model) -> None:
+    """
+    Save a tracked instance with an UPDATE of its changed columns only, or
+    not at all when nothing changed. New instances are inserted as usual.
+    """
+    if instance._state.adding:
+        instance.save()
+    else:
+        # Django skips the save, signals included, when the list is empty
+        instance.save(update_fields=update_fields(instance))
+
+
+async def asave_changes(instance: models.Model) -> None:
+    if instance._state.adding:
+        await instance.asave()
+    else:
+        await instance.asave(update_fields=update_fields(instance))